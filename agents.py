@@ -2,15 +2,22 @@
 AI Agenti - Web pretraga, scraping, analiza dokumenata, vesti, API
 """
 
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import os
 import urllib.parse
 
+import httpx
+from bs4 import BeautifulSoup
+
+from config import FETCH_CACHE_TTL, RSS_FEEDS, SCRAPE_MAX_CHARS
+from extraction import iter_extract_file, iter_extract_upload
+from fetch import fetch, run_sync
+from scraper import scrape
 
-def web_search(query, num_results=3):
+
+async def web_search_async(query, num_results=3):
     """Osnovna funkcija za web pretragu koristeći Brave Search API ako je dostupan"""
     try:
-        import os
         # Proveri da li postoji Brave API ključ u okruženju
         brave_api_key = os.getenv("BRAVE_SEARCH_API_KEY")
 
@@ -27,10 +34,11 @@ def web_search(query, num_results=3):
                 "freshness": "pd"  # za pretragu samo od juče i danas
             }
 
-            response = requests.get(
+            response = await fetch(
                 "https://api.search.brave.com/res/v1/web/search",
                 headers=headers,
-                params=params
+                params=params,
+                cache_ttl=FETCH_CACHE_TTL
             )
 
             if response.status_code == 200:
@@ -47,114 +55,104 @@ def web_search(query, num_results=3):
                 return results
             else:
                 # Ako Brave API ne uspe, koristi fallback metodu
-                return web_search_fallback(query, num_results)
+                return await web_search_fallback_async(query, num_results)
         else:
             # Ako nema Brave API ključa, koristi fallback metodu
-            return web_search_fallback(query, num_results)
+            return await web_search_fallback_async(query, num_results)
 
     except Exception as e:
         # Ako sve ostalo ne uspe, koristi fallback metodu
-        return web_search_fallback(query, num_results)
+        return await web_search_fallback_async(query, num_results)
 
 
-def web_search_fallback(query, num_results=3):
+def _parse_search_results(html, num_results):
+    """Rezultati pretrage iz HTML-a"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    results = []
+    for g in soup.find_all('div', class_='g')[:num_results]:
+        anchor = g.find('a')
+        if anchor:
+            link = anchor.get('href')
+            title_elem = g.find('h3')
+            title = title_elem.text if title_elem else "Bez naslova"
+            snippet_elem = g.find('span', class_='st')
+            snippet = snippet_elem.text if snippet_elem else "Bez opisa"
+
+            results.append({
+                "title": title,
+                "link": link,
+                "snippet": snippet
+            })
+
+    return results
+
+
+async def web_search_fallback_async(query, num_results=3):
     """Fallback metoda za web pretragu koristeći web scraping"""
     try:
         # Koristi Google Custom Search API ako je dostupan, ili koristi drugi pristup
-        # Ovde implementiramo osnovnu verziju sa requests i BeautifulSoup
+        # Ovde implementiramo osnovnu verziju sa HTTP zahtevom i BeautifulSoup
         search_url = f"https://www.google.com/search?q={urllib.parse.quote(query)}"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-
-        response = requests.get(search_url, headers=headers)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        results = []
-        for g in soup.find_all('div', class_='g')[:num_results]:
-            anchor = g.find('a')
-            if anchor:
-                link = anchor.get('href')
-                title_elem = g.find('h3')
-                title = title_elem.text if title_elem else "Bez naslova"
-                snippet_elem = g.find('span', class_='st')
-                snippet = snippet_elem.text if snippet_elem else "Bez opisa"
-
-                results.append({
-                    "title": title,
-                    "link": link,
-                    "snippet": snippet
-                })
-
-        return results
+
+        response = await fetch(search_url, cache_ttl=FETCH_CACHE_TTL)
+        # Parsiranje je CPU posao - van event loop-a
+        return await asyncio.to_thread(_parse_search_results, response.text, num_results)
     except Exception as e:
         return [{"error": str(e)}]
 
 
-def web_scrape(url):
-    """Osnovna funkcija za web skrejp"""
+async def scrape_page_async(url, max_chars=None):
+    """Skrejp sa informacijom da li je tekst skraćen: (tekst, skraćeno)"""
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Ukloni skripte i stilove
-        for script in soup(["script", "style"]):
-            script.decompose()
-
-        text = soup.get_text()
-        # Očisti tekst
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
-
-        return text
+        return await scrape(url, max_chars=max_chars or SCRAPE_MAX_CHARS)
     except Exception as e:
-        return f"Greška prilikom skrejpa: {str(e)}"
+        return f"Greška prilikom skrejpa: {str(e)}", False
+
+
+async def web_scrape_async(url):
+    """Osnovna funkcija za web skrejp"""
+    text, _ = await scrape_page_async(url)
+    return text
+
+
+def web_search(query, num_results=3):
+    """Web pretraga (sinhrono, za Streamlit)"""
+    return run_sync(web_search_async(query, num_results))
+
+
+def web_search_fallback(query, num_results=3):
+    """Fallback web pretraga (sinhrono)"""
+    return run_sync(web_search_fallback_async(query, num_results))
+
+
+def web_scrape(url):
+    """Web skrejp (sinhrono, za Streamlit)"""
+    return run_sync(web_scrape_async(url))
+
+
+def analyze_document_parts(uploaded_file):
+    """Analiza dokumenta deo po deo (stranice/poglavlja) za prikaz napretka"""
+    return iter_extract_upload(uploaded_file.getbuffer(), uploaded_file.name, uploaded_file.type)
 
 
 def analyze_document(uploaded_file):
     """Osnovna funkcija za analizu dokumenata"""
     try:
-        content = ""
-        if uploaded_file.type == "application/pdf":
-            from pypdf import PdfReader
-            reader = PdfReader(uploaded_file)
-            for page in reader.pages:
-                content += page.extract_text() + "\n"
-        elif uploaded_file.name.endswith(".epub"):
-            import ebooklib
-            from ebooklib import epub
-            # Sačuvaj privremeno jer ebooklib radi sa putanjama
-            with open("temp.epub", "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
-            book = epub.read_epub("temp.epub")
-            for item in book.get_items():
-                if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                    # Očisti HTML tagove
-                    soup = BeautifulSoup(item.get_content(), 'html.parser')
-                    content += soup.get_text() + "\n"
-
-            os.remove("temp.epub")
-        elif uploaded_file.type == "text/plain":
-            content = uploaded_file.read().decode("utf-8")
-        elif uploaded_file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-            import docx
-            # Potrebno je instalirati python-docx: pip install python-docx
-            # Za sada vraćamo poruku o podršci za Word fajlove
-            return "Podrška za Word dokumente zahteva dodatnu biblioteku: python-docx"
-        else:
-            content = uploaded_file.read().decode("utf-8")
+        return "".join(part for _, _, part, _ in analyze_document_parts(uploaded_file))
+    except Exception as e:
+        return f"Greška prilikom analize dokumenta: {str(e)}"
 
-        # Vraćamo samo početak dokumenta za prikaz (limit na reči)
-        words = content.split()
-        if len(words) > 60000:
-            content = " ".join(words[:60000]) + "\n\n[...DOKUMENT JE SKRAĆEN (limit 60.000 reči)...]"
 
-        return content
+def analyze_document_file_parts(path, name, content_type):
+    """Analiza dokumenta sa diska deo po deo (bez učitavanja celog fajla u memoriju)"""
+    return iter_extract_file(path, name, content_type)
+
+
+def analyze_document_file(path, name, content_type):
+    """Analiza dokumenta sa diska"""
+    try:
+        return "".join(part for _, _, part, _ in analyze_document_file_parts(path, name, content_type))
     except Exception as e:
         return f"Greška prilikom analize dokumenta: {str(e)}"
 
@@ -219,50 +217,49 @@ def get_news_from_rss(rss_url, num_articles=5):
         return [{"error": f"Greška prilikom dohvatanja vesti: {str(e)}"}]
 
 
+async def _fetch_feed(source, url):
+    """Najnovije vesti jednog izvora"""
+    try:
+        import feedparser
+        # HTTP keš (fetch.py) radi uslovni GET (ETag/Last-Modified) za nepromenjene feedove
+        response = await fetch(url, cache_ttl=FETCH_CACHE_TTL)
+        feed = await asyncio.to_thread(feedparser.parse, response.content)
+        articles = []
+        for entry in feed.entries[:3]:  # Uzimamo po 3 najnovije vesti sa svakog izvora
+            article = {
+                "title": entry.title,
+                "summary": entry.summary if hasattr(entry, 'summary') else "Nema sažetka",
+                "link": entry.link,
+                "published": entry.published if hasattr(entry, 'published') else "Datum nije dostupan"
+            }
+            articles.append(article)
+        return source, articles
+    except:
+        return source, [{"error": f"Greška prilikom dohvatanja vesti iz {source}"}]
+
+
+async def get_top_news_async():
+    """Vesti sa svih izvora iz RSS_FEEDS - feedovi se dohvataju paralelno"""
+    return dict(await asyncio.gather(*(_fetch_feed(source, url) for source, url in RSS_FEEDS.items())))
+
+
 def get_top_news():
     """Funkcija za dohvatanje najnovijih vesti sa popularnih izvora"""
-    # Definišemo nekoliko popularnih RSS feedova
-    rss_feeds = {
-        "BBC News": "http://feeds.bbci.co.uk/news/rss.xml",
-        "TechCrunch": "https://techcrunch.com/feed/",
-        "Reuters": "http://feeds.reuters.com/reuters/topNews",
-        "Ars Technica": "http://feeds.arstechnica.com/arstechnica/index"
-    }
-
-    all_articles = {}
-    for source, url in rss_feeds.items():
-        try:
-            import feedparser
-            feed = feedparser.parse(url)
-            articles = []
-            for entry in feed.entries[:3]:  # Uzimamo po 3 najnovije vesti sa svakog izvora
-                article = {
-                    "title": entry.title,
-                    "summary": entry.summary if hasattr(entry, 'summary') else "Nema sažetka",
-                    "link": entry.link,
-                    "published": entry.published if hasattr(entry, 'published') else "Datum nije dostupan"
-                }
-                articles.append(article)
-            all_articles[source] = articles
-        except:
-            all_articles[source] = [{"error": f"Greška prilikom dohvatanja vesti iz {source}"}]
-
-    return all_articles
+    return run_sync(get_top_news_async())
 
 
-def api_caller(url, method="GET", headers=None, data=None, params=None):
+async def api_caller_async(url, method="GET", headers=None, data=None, params=None):
     """Osnovna funkcija za API pozive"""
     try:
-        if method.upper() == "GET":
-            response = requests.get(url, headers=headers, params=params)
-        elif method.upper() == "POST":
-            response = requests.post(url, headers=headers, json=data, params=params)
-        elif method.upper() == "PUT":
-            response = requests.put(url, headers=headers, json=data, params=params)
-        elif method.upper() == "DELETE":
-            response = requests.delete(url, headers=headers, params=params)
-        else:
+        if method.upper() not in ("GET", "POST", "PUT", "DELETE"):
             return f"Nepodržan metod: {method}"
+        response = await fetch(
+            url,
+            method=method,
+            headers=headers,
+            params=params,
+            json_data=data if method.upper() in ("POST", "PUT") else None
+        )
 
         # Proveravamo status kod
         if response.status_code in [200, 201, 202]:
@@ -275,11 +272,16 @@ def api_caller(url, method="GET", headers=None, data=None, params=None):
         else:
             return f"Greška u API pozivu: {response.status_code} - {response.text}"
 
-    except requests.exceptions.ConnectionError:
+    except httpx.ConnectError:
         return "Greška: Nije moguće povezivanje sa API-jem"
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         return "Greška: Vreme za odgovor API-ja je isteklo"
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         return f"Greška u API pozivu: {str(e)}"
     except Exception as e:
         return f"Greška: {str(e)}"
+
+
+def api_caller(url, method="GET", headers=None, data=None, params=None):
+    """API poziv (sinhrono, za Streamlit)"""
+    return run_sync(api_caller_async(url, method, headers, data, params))
@@ -9,6 +9,7 @@ import ollama
 import os
 import json
 import time
+import uuid
 from functools import lru_cache
 
 # Custom moduli
@@ -28,6 +29,7 @@ from session import (
     get_session_list,
     delete_session,
 )
+from autosave import autosaver
 from export import export_chat_to_text, export_chat_to_epub, export_chat_to_pdf
 from agents import (
     web_search,
@@ -40,6 +42,10 @@ from agents import (
 )
 from dialogue import run_dialogue, save_dialogue_to_file
 from ui_helpers import get_model_avatar
+from fastapi_app.core.generation import build_options
+from fastapi_app.core.history import history_budget, history_manager, summary_prompt
+from fastapi_app.core.config import HISTORY_SUMMARY_MAX_TOKENS
+from fastapi_app.core.uncertainty import UncertaintyDetector
 
 # =============================================================================
 # FUNKCIJE (ostaju u app.py)
@@ -100,12 +106,14 @@ def chat_with_model(model, messages, placeholder=None):
                 model=model,
                 messages=messages,
                 stream=True,
-                options={"num_ctx": 4096, "temperature": 0.7},
+                options=build_options(messages),
             )
 
+            uncertainty = UncertaintyDetector()
             for chunk in stream:
                 content = chunk["message"]["content"]
                 full_response += content
+                uncertainty.feed(content)
 
                 # Ažuriraj placeholder uživo ako postoji
                 if placeholder:
@@ -123,22 +131,8 @@ def chat_with_model(model, messages, placeholder=None):
         st.caption(f"Response generated in {duration:.1f}s")
 
         # Proveri da li je odgovor neizrazit ili da li model izgleda nesigurno
-        uncertainty_indicators = [
-            "nemam dovoljno informacija",
-            "nije mi poznato",
-            "ne mogu da potvrdim",
-            "ne znam tačno",
-            "nije mi poznat",
-            "ne mogu da pronađem",
-            "nemam informaciju",
-            "nije dostupno",
-            "nije poznato",
-            "nemam podatak",
-        ]
-
-        is_uncertain = any(
-            indicator in full_response.lower() for indicator in uncertainty_indicators
-        )
+        # (detektor je pregledao odgovor deo po deo dok je stizao)
+        is_uncertain = uncertainty.uncertain
 
         if is_uncertain:
             # Ekstraktuj ključne reči iz korisničkog upita za pretragu
@@ -172,7 +166,7 @@ def chat_with_model(model, messages, placeholder=None):
                             model=model,
                             messages=enhanced_messages,
                             stream=True,
-                            options={"num_ctx": 4096, "temperature": 0.7},
+                            options=build_options(enhanced_messages),
                         )
 
                         full_response = ""
@@ -206,19 +200,44 @@ def chat_with_model(model, messages, placeholder=None):
         return None
 
 
+def pack_history(model, messages):
+    """Spakuj istoriju u token budžet modela (starije poruke se sažimaju)"""
+
+    def summarize(previous, turns):
+        summary_messages = summary_prompt(previous, turns)
+        response = ollama.chat(
+            model=model,
+            messages=summary_messages,
+            options=build_options(
+                summary_messages,
+                {"num_predict": HISTORY_SUMMARY_MAX_TOKENS, "temperature": 0.2},
+            ),
+        )
+        return response["message"]["content"].strip()
+
+    if "history_key" not in st.session_state:
+        st.session_state.history_key = str(uuid.uuid4())
+
+    return history_manager.pack_sync(
+        st.session_state.history_key, messages, history_budget(model), summarize
+    )
+
+
 def auto_save_settings():
-    """Automatski sačuvaj sve važne postavke (uključujući messages)"""
-    try:
-        settings = {
+    """
+    Automatski sačuvaj sve važne postavke (uključujući messages)
+
+    Upis je odložen i radi se u pozadini (autosave.py), pa ne usporava odgovor.
+    """
+    autosaver.save(
+        {
             "system_prompt": st.session_state.get("system_prompt", ""),
             "last_model": st.session_state.get("last_model", ""),
             "file_content": st.session_state.get("file_content", ""),
             "messages": st.session_state.get("messages", []),
             "chat_document": st.session_state.get("chat_document", ""),
         }
-        save_settings(settings)
-    except:
-        pass
+    )
 
 
 # =============================================================================
@@ -1598,7 +1617,9 @@ if prompt := st.chat_input("Command..."):
         with st.chat_message("assistant", avatar=current_avatar):
             response_placeholder = st.empty()
 
-            full_response = chat_with_model(selected_model, st.session_state.messages)
+            full_response = chat_with_model(
+                selected_model, pack_history(selected_model, st.session_state.messages)
+            )
 
             if full_response:
                 response_placeholder.markdown(full_response)
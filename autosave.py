@@ -0,0 +1,263 @@
+"""
+Automatsko čuvanje postavki u pozadini
+
+Stanje se čuva kao snimak (.settings.json) i log izmena (.settings.log).
+Upis se odlaže dok ne prestanu izmene (debounce) i radi se u pozadinskom
+thread-u, pa odgovor modela ne čeka na disk. U log ide samo razlika u
+odnosu na poslednji upis: nove poruke i promenjena polja. Kada log
+preraste AUTOSAVE_COMPACT_BYTES, pravi se novi snimak preko privremenog
+fajla i os.replace, a log se briše.
+
+Snimak nosi broj generacije, a svaki zapis u logu generaciju snimka na
+koji se odnosi. Ako program padne posle zamene snimka a pre brisanja
+loga, stari zapisi se preskaču umesto da se primene dvaput. Nepotpuna
+poslednja linija loga (pad usred upisa) se odseca pri čitanju.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+
+from config import (
+    SETTINGS_FILE,
+    SETTINGS_LOG,
+    AUTOSAVE_DELAY,
+    AUTOSAVE_MAX_DELAY,
+    AUTOSAVE_COMPACT_BYTES,
+)
+
+DEFAULT_SETTINGS = {
+    "system_prompt": "",
+    "last_model": "",
+    "file_content": "",
+    "messages": [],
+    "chat_document": "",
+}
+
+
+def message_delta(old, new):
+    """
+    Zapis loga koji od starih poruka pravi nove (None ako su iste)
+
+    Poruke se samo dodaju na kraj, pa se proverava da li je poslednja
+    sačuvana poruka i dalje na svom mestu; inače se upisuje cela lista.
+    """
+    if len(new) >= len(old) and (not old or new[len(old) - 1] == old[-1]):
+        if len(new) == len(old):
+            return None
+        return {"op": "append", "messages": new[len(old):]}
+    return {"op": "reset", "messages": new}
+
+
+def apply_record(state, record):
+    """Primeni jedan zapis loga na stanje"""
+    op = record.get("op")
+    if op == "set":
+        state.update(record["fields"])
+    elif op == "append":
+        state["messages"] = state["messages"] + record["messages"]
+    elif op == "reset":
+        state["messages"] = list(record["messages"])
+
+
+class AutoSaver:
+    """Odloženo, inkrementalno čuvanje postavki u pozadinskom thread-u"""
+
+    def __init__(
+        self,
+        path=SETTINGS_FILE,
+        log_path=SETTINGS_LOG,
+        delay=AUTOSAVE_DELAY,
+        max_delay=AUTOSAVE_MAX_DELAY,
+        compact_bytes=AUTOSAVE_COMPACT_BYTES,
+    ):
+        self.path = path
+        self.log_path = log_path
+        self.delay = delay
+        self.max_delay = max_delay
+        self.compact_bytes = compact_bytes
+
+        self._cond = threading.Condition()
+        # Sve što dira disk (čitanje, upis, sažimanje loga) i _persisted,
+        # _generation, _log_size ide pod _write_lock. Ne uzima se dok se
+        # drži _cond, da thread koji upisuje ne bi čekao na onaj koji čita.
+        self._write_lock = threading.Lock()
+        self._persisted = None  # stanje koje je na disku
+        self._pending = None  # najnovije stanje koje čeka upis
+        self._writing = None  # stanje koje se upravo upisuje
+        self._first_request = 0.0
+        self._last_request = 0.0
+        self._generation = 0
+        self._log_size = 0
+        self._thread = None
+
+    def load(self):
+        """Trenutne postavke (uključujući one koje još nisu upisane)"""
+        self._loaded()
+        with self._cond:
+            current = self._current()
+            return {**current, "messages": list(current["messages"])}
+
+    def save(self, settings):
+        """Zakaži čuvanje kompletnih postavki; vraća odmah"""
+        self._schedule(settings, merge=False)
+
+    def update(self, settings):
+        """Zakaži izmenu dela postavki (ostala polja ostaju ista)"""
+        self._schedule(settings, merge=True)
+
+    def flush(self):
+        """Odmah upiši stanje koje čeka (poziva se i pri izlasku)"""
+        with self._write_lock:
+            with self._cond:
+                state, self._pending = self._pending, None
+                self._writing = state
+            if state is None:
+                return
+            try:
+                self._write(state)
+            except OSError:
+                pass
+            finally:
+                with self._cond:
+                    self._writing = None
+
+    def _schedule(self, settings, merge):
+        if merge:
+            self._loaded()
+        with self._cond:
+            base = self._current() if merge else DEFAULT_SETTINGS
+            state = {**base, **settings}
+            state["messages"] = list(state.get("messages") or [])
+            now = time.monotonic()
+            if self._pending is None:
+                self._first_request = now
+            self._pending = state
+            self._last_request = now
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="autosave", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.flush)
+            self._cond.notify()
+
+    def _run(self):
+        """Čekaj da izmene prestanu (najduže max_delay), pa upiši"""
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                while True:
+                    deadline = min(
+                        self._last_request + self.delay,
+                        self._first_request + self.max_delay,
+                    )
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            self.flush()
+
+    def _current(self):
+        """Najnovije stanje: na čekanju, u upisu ili na disku (drži se _cond)"""
+        return self._pending or self._writing or self._persisted
+
+    def _loaded(self):
+        """Stanje sa diska (čita se jednom; ne poziva se dok se drži _cond)"""
+        if self._persisted is None:
+            with self._write_lock:
+                self._load_locked()
+        return self._persisted
+
+    def _load_locked(self):
+        """Pročitaj stanje sa diska ako još nije (drži se _write_lock)"""
+        if self._persisted is None:
+            self._persisted = self._read()
+
+    def _read(self):
+        """Snimak + zapisi iz loga iste generacije"""
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self._generation = data.pop("generation", 0)
+        state = {**DEFAULT_SETTINGS, **data}
+        state["messages"] = list(state["messages"] or [])
+
+        try:
+            f = open(self.log_path, "rb+")
+        except FileNotFoundError:
+            self._log_size = 0
+            return state
+        with f:
+            good = 0
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete record")
+                    record = json.loads(line)
+                except ValueError:
+                    # Nepotpun upis pre pada: odseci ga da bi novi zapisi bili čitljivi
+                    f.truncate(good)
+                    break
+                good += len(line)
+                if record.get("generation") == self._generation:
+                    apply_record(state, record)
+            self._log_size = good
+        return state
+
+    def _write(self, state):
+        """Upiši razliku u log, ili novi snimak ako je log prevelik (drži se _write_lock)"""
+        self._load_locked()
+        old = self._persisted
+        records = []
+        fields = {
+            key: value
+            for key, value in state.items()
+            if key != "messages" and old.get(key) is not value and old.get(key) != value
+        }
+        if fields:
+            records.append({"op": "set", "fields": fields})
+        delta = message_delta(old["messages"], state["messages"])
+        if delta:
+            records.append(delta)
+        if not records:
+            return
+
+        data = "".join(
+            json.dumps({"generation": self._generation, **record}, ensure_ascii=False)
+            + "\n"
+            for record in records
+        ).encode("utf-8")
+        if self._log_size + len(data) > self.compact_bytes:
+            self._compact(state)
+        else:
+            with open(self.log_path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self._log_size += len(data)
+        self._persisted = state
+
+    def _compact(self, state):
+        """Novi snimak (privremeni fajl + os.replace), pa brisanje loga"""
+        generation = self._generation + 1
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({**state, "generation": generation}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._generation = generation
+        try:
+            os.remove(self.log_path)
+        except FileNotFoundError:
+            pass
+        self._log_size = 0
+
+
+autosaver = AutoSaver()
@@ -0,0 +1,262 @@
+"""
+Katalog sačuvanih sesija (SQLite indeks metapodataka)
+
+Lista sesija se čita iz kataloga umesto da se svaki fajl parsira. Katalog
+se ažurira pri čuvanju i brisanju, a izmene napravljene mimo aplikacije
+(ručno kopirani ili obrisani fajlovi) hvata poređenjem mtime-a foldera;
+tada se ponovo parsiraju samo fajlovi čiji su se mtime ili veličina
+promenili.
+"""
+
+import os
+import threading
+import time
+import zlib
+
+from config import SESSIONS_DIR, SESSION_CATALOG_DB, SESSION_PREVIEW_CHARS
+from fastapi_app.core.db import Database
+from search_index import message_search
+from session_file import LEGACY_EXTENSION, SESSION_EXTENSION, read_messages
+
+SESSION_EXTENSIONS = (SESSION_EXTENSION, LEGACY_EXTENSION)
+SEARCH_INDEX_VERSION = 1  # povećati kada se promeni šta se indeksira
+
+# Kolone po kojima lista sme da se sortira (ključ API-ja -> kolona)
+SORT_KEYS = {
+    'created': 'created',
+    'modified': 'modified',
+    'name': 'name',
+    'filename': 'filename',
+    'message_count': 'message_count',
+    'size': 'size',
+}
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    filename TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    created TEXT NOT NULL,
+    modified REAL NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    message_count INTEGER NOT NULL,
+    user_messages INTEGER NOT NULL,
+    assistant_messages INTEGER NOT NULL,
+    system_messages INTEGER NOT NULL,
+    preview TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_created ON sessions (created);
+CREATE INDEX IF NOT EXISTS sessions_modified ON sessions (modified);
+CREATE TABLE IF NOT EXISTS catalog_state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+COLUMNS = (
+    'filename', 'name', 'created', 'modified', 'mtime_ns', 'size', 'message_count',
+    'user_messages', 'assistant_messages', 'system_messages', 'preview',
+)
+
+
+def is_session_file(filename):
+    """Da li je fajl sačuvana sesija"""
+    return filename.endswith(SESSION_EXTENSIONS)
+
+
+def session_name(filename):
+    """Ime sesije iz imena fajla (format: timestamp__ime.jsonl)"""
+    stem = os.path.splitext(filename)[0]
+    if '__' in stem:
+        return stem.split('__', 1)[1]
+    return stem
+
+
+def session_timestamp(filename, mtime):
+    """Vreme kreiranja (epoch) iz prefiksa imena fajla, ili mtime ako ga nema"""
+    try:
+        return time.mktime(time.strptime(filename[:15], "%Y%m%d_%H%M%S"))
+    except ValueError:
+        return mtime
+
+
+def session_created(filename, mtime):
+    """Vreme kreiranja kao ISO string"""
+    created = time.localtime(session_timestamp(filename, mtime))
+    return time.strftime("%Y-%m-%dT%H:%M:%S", created)
+
+
+def index_session(filename, messages, stat, start=0):
+    """Dodaj poruke sesije (od start nadalje) u indeks za pretragu"""
+    message_search.index(
+        'session', filename, messages, start,
+        title=session_name(filename),
+        created=session_timestamp(filename, stat.st_mtime),
+    )
+
+
+def describe_session(filename, messages, stat):
+    """Red kataloga za sesiju"""
+    roles = {'user': 0, 'assistant': 0}
+    preview = ''
+    for message in messages:
+        role = message.get('role')
+        if role in roles:
+            roles[role] += 1
+        if role == 'user' and not preview:
+            preview = str(message.get('content', ''))[:SESSION_PREVIEW_CHARS]
+    return {
+        'filename': filename,
+        'name': session_name(filename),
+        'created': session_created(filename, stat.st_mtime),
+        'modified': stat.st_mtime,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'message_count': len(messages),
+        'user_messages': roles['user'],
+        'assistant_messages': roles['assistant'],
+        'system_messages': len(messages) - roles['user'] - roles['assistant'],
+        'preview': preview,
+    }
+
+
+def read_session_file(path):
+    """Poruke iz fajla sesije ([] ako fajl nije ispravan)"""
+    try:
+        return read_messages(path)
+    except (OSError, ValueError, zlib.error):
+        return []
+
+
+class SessionCatalog:
+    """Metapodaci svih sesija u SESSIONS_DIR, u jednoj SQLite bazi"""
+
+    def __init__(self, path=SESSION_CATALOG_DB, directory=SESSIONS_DIR):
+        # Konekcija po thread-u (Streamlit i FastAPI rade u više thread-ova)
+        self.db = Database(path, CATALOG_SCHEMA)
+        self.directory = directory
+        self._refresh_lock = threading.Lock()
+
+    def update(self, filename, messages, start=0):
+        """
+        Upiši (ili zameni) metapodatke sesije posle čuvanja
+
+        start je broj poruka koje su ostale iste (dopisivanje), pa se u
+        indeks za pretragu dodaju samo nove.
+        """
+        stat = os.stat(self.directory / filename)
+        self._upsert([describe_session(filename, messages, stat)])
+        index_session(filename, messages, stat, start)
+
+    def remove(self, filename):
+        """Izbaci sesiju iz kataloga posle brisanja"""
+        self.db.execute("DELETE FROM sessions WHERE filename = ?", (filename,))
+        message_search.remove('session', filename)
+
+    def get(self, filename):
+        """Metapodaci jedne sesije ili None"""
+        self.refresh()
+        row = self.db.execute(
+            "SELECT * FROM sessions WHERE filename = ?", (filename,)
+        ).fetchone()
+        return self._entry(row) if row else None
+
+    def list(self, offset=0, limit=None, sort='created', descending=True):
+        """Strana kataloga: (lista metapodataka, ukupan broj sesija)"""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        self.refresh()
+        order = 'DESC' if descending else 'ASC'
+        rows = self.db.execute(
+            f"SELECT * FROM sessions ORDER BY {SORT_KEYS[sort]} {order}, filename {order} "
+            "LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        ).fetchall()
+        total = self.db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return [self._entry(row) for row in rows], total
+
+    def refresh(self, force=False):
+        """
+        Uskladi katalog sa folderom ako se folder promenio
+
+        Dodavanje i brisanje fajla menja mtime foldera, pa je uobičajena
+        provera jedan stat(). Sa force=True se proveravaju svi fajlovi
+        (hvata i fajlove izmenjene na licu mesta). Ako je indeks za
+        pretragu stariji od SEARCH_INDEX_VERSION, sve sesije se indeksiraju
+        ponovo.
+        """
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            dir_mtime = 0
+        reindex = self._state('search_version') != SEARCH_INDEX_VERSION
+        if not force and not reindex and dir_mtime == self._state('dir_mtime_ns'):
+            return 0
+
+        with self._refresh_lock:
+            known = {
+                row['filename']: (row['mtime_ns'], row['size'])
+                for row in self.db.execute("SELECT filename, mtime_ns, size FROM sessions")
+            }
+            changed = []
+            present = set()
+            if dir_mtime:
+                with os.scandir(self.directory) as entries:
+                    for entry in entries:
+                        if not entry.is_file() or not is_session_file(entry.name):
+                            continue
+                        present.add(entry.name)
+                        stat = entry.stat()
+                        if reindex or known.get(entry.name) != (stat.st_mtime_ns, stat.st_size):
+                            messages = read_session_file(entry.path)
+                            changed.append(describe_session(entry.name, messages, stat))
+                            index_session(entry.name, messages, stat)
+            removed = [name for name in known if name not in present]
+            for name in removed:
+                message_search.remove('session', name)
+
+            with self.db.transaction() as conn:
+                conn.executemany(
+                    "DELETE FROM sessions WHERE filename = ?", [(n,) for n in removed]
+                )
+                self._upsert(changed, conn)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO catalog_state (key, value) VALUES (?, ?)",
+                    [('dir_mtime_ns', dir_mtime), ('search_version', SEARCH_INDEX_VERSION)],
+                )
+        return len(changed) + len(removed)
+
+    def rebuild(self):
+        """Napravi katalog iznova iz fajlova na disku"""
+        with self._refresh_lock:
+            self.db.execute("DELETE FROM sessions")
+            self.db.execute("DELETE FROM catalog_state")
+            message_search.remove('session')
+        return self.refresh(force=True)
+
+    def _upsert(self, entries, conn=None):
+        """INSERT OR REPLACE redova kataloga"""
+        if not entries:
+            return
+        placeholders = ', '.join('?' for _ in COLUMNS)
+        (conn or self.db.conn).executemany(
+            f"INSERT OR REPLACE INTO sessions ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+            [tuple(entry[column] for column in COLUMNS) for entry in entries],
+        )
+
+    def _state(self, key):
+        """Vrednost iz catalog_state tabele"""
+        row = self.db.execute(
+            "SELECT value FROM catalog_state WHERE key = ?", (key,)
+        ).fetchone()
+        return row['value'] if row else None
+
+    @staticmethod
+    def _entry(row):
+        """Red baze kao rečnik (bez internih kolona)"""
+        entry = dict(row)
+        entry.pop('mtime_ns', None)
+        return entry
+
+
+session_catalog = SessionCatalog()
@@ -8,7 +8,53 @@ from pathlib import Path
 # Paths
 BASE_DIR = Path(__file__).parent
 SETTINGS_FILE = BASE_DIR / ".settings.json"
+SETTINGS_LOG = BASE_DIR / ".settings.log"  # izmene od poslednjeg snimka (autosave.py)
 SESSIONS_DIR = BASE_DIR / "sessions"
+DATA_DIR = Path(os.getenv("OLLAMA_CORE_DATA_DIR", BASE_DIR / ".data"))
+SESSION_CATALOG_DB = DATA_DIR / "session_catalog.sqlite3"
+SEARCH_DB = DATA_DIR / "search.sqlite3"
+
+# Katalog sesija (catalog.py)
+SESSION_PREVIEW_CHARS = 120  # dužina pregleda prve korisničke poruke
+SESSION_PAGE_SIZE = 100  # podrazumevana veličina strane u listi sesija
+SESSION_COMPRESS_MIN_CHARS = 4096  # duže poruke se u fajlu čuvaju kompresovane
+
+# Pretraga poruka iz sesija i dijaloga (search_index.py)
+SEARCH_PAGE_SIZE = 20
+SEARCH_SNIPPET_TOKENS = 16  # broj reči u isečku oko pogotka
+
+# Automatsko čuvanje postavki (autosave.py)
+AUTOSAVE_DELAY = 1.0  # sekundi mirovanja pre upisa
+AUTOSAVE_MAX_DELAY = 5.0  # najduže odlaganje upisa pri stalnim izmenama
+AUTOSAVE_COMPACT_BYTES = 8 * 1024 * 1024  # veći log se sažima u novi snimak
+
+# Ekstrakcija teksta iz dokumenata
+DOCUMENT_MAX_WORDS = 60000
+PDF_PAGES_PER_TASK = 8  # stranice koje jedan proces obrađuje odjednom
+EXTRACTION_WORKERS = min(4, os.cpu_count() or 1)
+TEXT_READ_CHUNK = 1024 * 1024  # tekstualni fajlovi se čitaju u delovima
+TEXT_MAX_CARRY = 64 * 1024  # duži tekst bez razmaka se ne prenosi u sledeći deo
+
+# HTTP pozivi web agenata (fetch.py)
+FETCH_CONNECT_TIMEOUT = 5.0  # sekundi
+FETCH_READ_TIMEOUT = 15.0  # sekundi
+FETCH_MAX_BYTES = 5 * 1024 * 1024  # veći odgovori se seku
+FETCH_MAX_CONNECTIONS = 50
+FETCH_MAX_KEEPALIVE = 10
+FETCH_CACHE_TTL = 300  # podrazumevani TTL za pretragu i skrejp (sekundi)
+FETCH_CACHE_MAX_ENTRIES = 256
+FETCH_CACHE_MAX_BYTES = 32 * 1024 * 1024
+SCRAPE_MAX_BYTES = 2 * 1024 * 1024  # skrejp ne preuzima više od ovoga
+SCRAPE_MAX_CHARS = 20000  # skrejp staje kad skupi ovoliko teksta
+FETCH_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# RSS izvori za vesti (agents.get_top_news)
+RSS_FEEDS = {
+    "BBC News": "http://feeds.bbci.co.uk/news/rss.xml",
+    "TechCrunch": "https://techcrunch.com/feed/",
+    "Reuters": "http://feeds.reuters.com/reuters/topNews",
+    "Ars Technica": "http://feeds.arstechnica.com/arstechnica/index"
+}
 
 # Model sources
 MODEL_SOURCES = ["Ollama (11434)"]
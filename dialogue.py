@@ -5,6 +5,7 @@ Dijalog sistem - AI debate između dva modela
 import ollama
 import time
 from config import MBTI_PERSONAS
+from fastapi_app.core.generation import build_options
 
 
 def run_dialogue(model1, model2, initial_prompt, max_rounds=5):
@@ -16,7 +17,7 @@ def run_dialogue(model1, model2, initial_prompt, max_rounds=5):
 
         for i in range(max_rounds):
             # Prvi model odgovara
-            response1 = ollama.chat(model=model1, messages=messages, options={'num_ctx': 4096, 'temperature': 0.7})
+            response1 = ollama.chat(model=model1, messages=messages, options=build_options(messages))
             response1_text = response1['message']['content']
 
             dialogue_history.append({"model": model1, "response": response1_text})
@@ -25,7 +26,7 @@ def run_dialogue(model1, model2, initial_prompt, max_rounds=5):
             messages.append({"role": "assistant", "content": response1_text})
 
             # Drugi model odgovara na osnovu prethodne diskusije
-            response2 = ollama.chat(model=model2, messages=messages, options={'num_ctx': 4096, 'temperature': 0.7})
+            response2 = ollama.chat(model=model2, messages=messages, options=build_options(messages))
             response2_text = response2['message']['content']
 
             dialogue_history.append({"model": model2, "response": response2_text})
@@ -0,0 +1,217 @@
+"""
+Ekstrakcija teksta iz dokumenata (PDF, EPUB, TXT) - paralelno i postepeno
+"""
+
+import codecs
+import mmap
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from config import DOCUMENT_MAX_WORDS, PDF_PAGES_PER_TASK, EXTRACTION_WORKERS, TEXT_READ_CHUNK, TEXT_MAX_CARRY
+
+WORD_RE = re.compile(r'\S+')
+TRUNCATION_NOTE = "\n\n[...DOKUMENT JE SKRAĆEN (limit 60.000 reči)...]"
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+_pool = None
+
+
+def get_pool():
+    """Zajednički pool procesa za PDF stranice (pravi se pri prvoj upotrebi)"""
+    global _pool
+    if _pool is None:
+        # spawn: fork iz procesa sa nitima (uvicorn, Streamlit) nije bezbedan
+        _pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS,
+                                    mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def document_kind(name, content_type):
+    """Vrsta dokumenta na osnovu MIME tipa i ekstenzije"""
+    name = (name or "").lower()
+    if content_type == "application/pdf" or name.endswith(".pdf"):
+        return "pdf"
+    if content_type == "application/epub+zip" or name.endswith(".epub"):
+        return "epub"
+    if content_type == DOCX_TYPE or name.endswith(".docx"):
+        return "docx"
+    return "text"
+
+
+def _open_pdf(path):
+    """PdfReader nad mmap-om fajla (pypdf inače učitava ceo fajl u memoriju)"""
+    from pypdf import PdfReader
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return PdfReader(mapped), mapped
+
+
+def _extract_pdf_pages(path, start, end):
+    """Tekst stranica [start, end) - izvršava se u posebnom procesu"""
+    reader, mapped = _open_pdf(path)
+    try:
+        return [(reader.pages[i].extract_text() or "") + "\n" for i in range(start, end)]
+    finally:
+        del reader
+        mapped.close()
+
+
+def iter_pdf_pages(path):
+    """Stranice PDF-a redom: (indeks, ukupno, tekst); grupe stranica se obrađuju paralelno"""
+    reader, mapped = _open_pdf(path)
+    total = len(reader.pages)
+    del reader
+    mapped.close()
+
+    if total <= PDF_PAGES_PER_TASK:
+        for index, text in enumerate(_extract_pdf_pages(path, 0, total)):
+            yield index, total, text
+        return
+
+    pool = get_pool()
+    futures = [pool.submit(_extract_pdf_pages, path, start, min(start + PDF_PAGES_PER_TASK, total))
+               for start in range(0, total, PDF_PAGES_PER_TASK)]
+    try:
+        index = 0
+        for future in futures:
+            for text in future.result():
+                yield index, total, text
+                index += 1
+    finally:
+        # Prekinut zahtev (ili dostignut limit reči) - ne obrađuj ostatak
+        for future in futures:
+            future.cancel()
+
+
+def iter_epub_sections(path):
+    """Poglavlja EPUB-a kao čist tekst: (indeks, ukupno, tekst)"""
+    import ebooklib
+    from ebooklib import epub
+    from bs4 import BeautifulSoup
+
+    book = epub.read_epub(path)
+    items = [item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
+    for index, item in enumerate(items):
+        # Očisti HTML tagove
+        yield index, len(items), BeautifulSoup(item.get_content(), 'html.parser').get_text() + "\n"
+
+
+def iter_text(path):
+    """Tekstualni fajl u delovima od TEXT_READ_CHUNK bajtova (delovi se seku na razmaku)"""
+    total = max(1, -(-os.path.getsize(path) // TEXT_READ_CHUNK))
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    carry = ""
+    index = 0
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(TEXT_READ_CHUNK)
+            text = carry + decoder.decode(data, final=not data)
+            if not data:
+                if text:
+                    yield index, total, text
+                return
+            # Reč na granici ide u sledeći deo, osim ako je duža od TEXT_MAX_CARRY
+            # (npr. fajl bez razmaka) - tada se ceo tekst šalje odmah
+            cut = max(text.rfind(" "), text.rfind("\n"))
+            if len(text) - cut - 1 > TEXT_MAX_CARRY:
+                cut = len(text) - 1
+            if cut < 0:
+                carry = text
+                continue
+            carry = text[cut + 1:]
+            yield index, total, text[:cut + 1]
+            index += 1
+
+
+def iter_parts(path, kind):
+    """Delovi dokumenta redom (stranice, poglavlja)"""
+    if kind == "pdf":
+        return iter_pdf_pages(path)
+    if kind == "epub":
+        return iter_epub_sections(path)
+    if kind == "docx":
+        # Potrebno je instalirati python-docx: pip install python-docx
+        raise ValueError("Podrška za Word dokumente zahteva dodatnu biblioteku: python-docx")
+    return iter_text(path)
+
+
+def limit_words(parts, max_words=DOCUMENT_MAX_WORDS):
+    """
+    Primeni limit reči na niz delova (indeks, ukupno, tekst)
+
+    Reči se broje deo po deo; kad se dostigne limit, deo se seče na kraju
+    poslednje dozvoljene reči i čitanje staje (ostale stranice se ne obrađuju).
+    Vraća (indeks, ukupno, tekst dela, skraćeno).
+    """
+    remaining = max_words
+    try:
+        for index, total, text in parts:
+            count = 0
+            cut = None
+            for match in WORD_RE.finditer(text):
+                if count == remaining:
+                    cut = match.start()
+                    break
+                count += 1
+            if cut is None:
+                remaining -= count
+                yield index, total, text, False
+                continue
+            yield index, total, text[:cut].rstrip() + TRUNCATION_NOTE, True
+            return
+    finally:
+        parts.close()
+
+
+def iter_extract(path, kind, max_words=DOCUMENT_MAX_WORDS):
+    """Postepena ekstrakcija fajla: (indeks, ukupno, tekst dela, skraćeno)"""
+    return limit_words(iter_parts(path, kind), max_words)
+
+
+def extract_text(path, kind, max_words=DOCUMENT_MAX_WORDS):
+    """Ceo tekst dokumenta (sa limitom reči)"""
+    return "".join(part for _, _, part, _ in iter_extract(path, kind, max_words))
+
+
+def _single_part(text):
+    yield 0, 1, text
+
+
+def iter_extract_upload(data, name, content_type, max_words=DOCUMENT_MAX_WORDS):
+    """Postepena ekstrakcija sadržaja uploada: (indeks, ukupno, tekst dela, skraćeno)"""
+    kind = document_kind(name, content_type)
+    if kind == "text":
+        # Tekst ne treba privremeni fajl
+        yield from limit_words(_single_part(bytes(data).decode("utf-8")), max_words)
+        return
+
+    # Privremeni fajl po zahtevu (ebooklib i procesi za PDF rade sa putanjama)
+    with TempDocument(data, name) as path:
+        yield from iter_extract(path, kind, max_words)
+
+
+def iter_extract_file(path, name, content_type, max_words=DOCUMENT_MAX_WORDS):
+    """Postepena ekstrakcija fajla koji je već na disku (npr. spool-ovan upload)"""
+    return iter_extract(path, document_kind(name, content_type), max_words)
+
+
+class TempDocument:
+    """Privremeni fajl sa sadržajem uploada (jedinstven po zahtevu, briše se na kraju)"""
+
+    def __init__(self, data, name=""):
+        suffix = os.path.splitext(name or "")[1]
+        fd, self.path = tempfile.mkstemp(suffix=suffix, prefix="document_")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+    def __enter__(self):
+        return self.path
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
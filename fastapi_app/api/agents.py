@@ -5,48 +5,67 @@ AI Agent endpoints (web search, scraping, documents, etc.)
 import sys
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 
 from fastapi_app.core.dependencies import get_current_user, optional_auth
+from fastapi_app.core.document_cache import document_cache
+from fastapi_app.core.news import news_aggregator
+from fastapi_app.core.retrieval import document_store
+from fastapi_app.core.semantic import document_prefix, index_document, semantic_index
+from fastapi_app.core.streaming import ndjson_line
+from fastapi_app.core.uploads import spool_upload
 
 # Import existing agents from parent directory
 sys.path.insert(0, str(__file__).rsplit("/", 3)[0])  # Add my-chat to path
 
 try:
     from agents import (
-        web_search,
-        web_scrape,
-        analyze_document,
+        web_search_async,
+        scrape_page_async,
+        analyze_document_file,
+        analyze_document_file_parts,
         code_helper,
-        get_top_news,
-        api_caller,
+        api_caller_async,
     )
+    from fetch import close_clients as close_fetch_clients
 except ImportError as e:
     print(f"Warning: Could not import agents: {e}")
 
     # Create dummy functions for testing
-    def web_search(*args, **kwargs):
+    async def web_search_async(*args, **kwargs):
         return [{"error": "Agents module not available"}]
 
-    def web_scrape(*args, **kwargs):
-        return "Agents module not available"
+    async def scrape_page_async(*args, **kwargs):
+        return "Agents module not available", False
 
-    def analyze_document(*args, **kwargs):
+    def analyze_document_file(*args, **kwargs):
         return "Agents module not available"
 
+    def analyze_document_file_parts(*args, **kwargs):
+        raise RuntimeError("Agents module not available")
+
     def code_helper(*args, **kwargs):
         return "Agents module not available"
 
-    def get_top_news(*args, **kwargs):
-        return {"error": "Agents module not available"}
-
-    def api_caller(*args, **kwargs):
+    async def api_caller_async(*args, **kwargs):
         return "Agents module not available"
 
+    async def close_fetch_clients():
+        pass
+
 
 router = APIRouter()
 
+# analyze_document(_file) returns these messages instead of raising
+EXTRACTION_FAILURE_PREFIXES = (
+    "Greška prilikom analize dokumenta",
+    "Podrška za Word dokumente",
+    "Agents module not available",
+)
+
 
 # Request/Response models
 class WebSearchRequest(BaseModel):
@@ -54,8 +73,16 @@ class WebSearchRequest(BaseModel):
     num_results: int = 3
 
 
+class NewsFeedRequest(BaseModel):
+    name: str
+    url: str
+
+
 class WebScrapeRequest(BaseModel):
     url: str
+    max_chars: Optional[int] = (
+        None  # text collected before stopping (default in config)
+    )
 
 
 class CodeHelperRequest(BaseModel):
@@ -63,6 +90,11 @@ class CodeHelperRequest(BaseModel):
     task: str = "analyze"  # "analyze", "debug", "explain"
 
 
+class DocumentRequest(BaseModel):
+    text: str
+    name: Optional[str] = None
+
+
 class ApiCallRequest(BaseModel):
     url: str
     method: str = "GET"
@@ -77,7 +109,7 @@ async def agent_web_search(
 ):
     """Web search using Brave API or Google fallback"""
     try:
-        results = web_search(request.query, request.num_results)
+        results = await web_search_async(request.query, request.num_results)
         return {"results": results, "query": request.query}
     except Exception as e:
         raise HTTPException(
@@ -92,11 +124,11 @@ async def agent_web_scrape(
 ):
     """Scrape webpage content"""
     try:
-        content = web_scrape(request.url)
+        content, truncated = await scrape_page_async(request.url, request.max_chars)
         return {
             "url": request.url,
             "content": content,
-            "truncated": len(content) > 10000,
+            "truncated": truncated,
         }
     except Exception as e:
         raise HTTPException(
@@ -110,41 +142,175 @@ async def agent_analyze_document(
     file: UploadFile = File(...), current_user: Dict = Depends(optional_auth)
 ):
     """Analyze uploaded document (PDF, EPUB, TXT, DOCX)"""
-    try:
-        # Read file content
-        content = await file.read()
-
-        # Create a file-like object for the existing analyze_document function
-        # The existing function expects a Streamlit UploadedFile-like object
-        # We'll create a simple object with the required attributes
-        class SimpleUploadedFile:
-            def __init__(self, content, filename, content_type):
-                self.content = content
-                self.name = filename
-                self.type = content_type
-
-            def getbuffer(self):
-                return self.content
-
-            def read(self):
-                return self.content
-
-        uploaded_file = SimpleUploadedFile(
-            content=content, filename=file.filename, content_type=file.content_type
+    # Streamed to a temp file in chunks (413/415 are raised while streaming)
+    with await spool_upload(file) as upload:
+        try:
+            # Same bytes were extracted before: skip PdfReader / EPUB parsing
+            cached = await run_in_threadpool(document_cache.get, upload.document_id)
+            if cached is not None:
+                result = cached["text"]
+            else:
+                # CPU-bound (PDF pages use a process pool): keep off the event loop
+                result = await run_in_threadpool(
+                    analyze_document_file,
+                    upload.path,
+                    upload.filename,
+                    upload.content_type,
+                )
+                # Failures are reported as text; only cache real extractions
+                if not result.startswith(EXTRACTION_FAILURE_PREFIXES):
+                    await run_in_threadpool(
+                        document_cache.put,
+                        upload.document_id,
+                        result,
+                        file.filename,
+                        file.content_type,
+                    )
+
+            # Chunking and BM25 statistics are CPU-bound as well
+            document = await run_in_threadpool(
+                document_store.add,
+                result,
+                name=file.filename,
+                document_id=upload.document_id,
+            )
+            index_document(document)
+            return {
+                "filename": file.filename,
+                "content_type": file.content_type,
+                "content": result,
+                "size": upload.size,
+                "document_id": document.id,
+                "chunks": len(document.chunks),
+                "cached": cached is not None,
+            }
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Document analysis failed: {str(e)}",
+            )
+
+
+@router.post("/analyze-document/stream")
+async def agent_analyze_document_stream(
+    file: UploadFile = File(...), current_user: Dict = Depends(optional_auth)
+):
+    """
+    Analyze uploaded document, streaming NDJSON progress per page/section
+
+    Emits {"type": "progress", ...} lines with the extracted text of each
+    part, then {"type": "done", ...} with the document id (or
+    {"type": "error", ...}).
+    """
+    upload = await spool_upload(file)
+
+    async def events():
+        try:
+            cached = await run_in_threadpool(document_cache.get, upload.document_id)
+            if cached is not None:
+                text = cached["text"]
+            else:
+                parts = []
+                try:
+                    async for index, total, part, truncated in iterate_in_threadpool(
+                        analyze_document_file_parts(
+                            upload.path, upload.filename, upload.content_type
+                        )
+                    ):
+                        parts.append(part)
+                        yield ndjson_line(
+                            {
+                                "type": "progress",
+                                "part": index + 1,
+                                "total": total,
+                                "text": part,
+                                "truncated": truncated,
+                            }
+                        )
+                except Exception as e:
+                    yield ndjson_line(
+                        {
+                            "type": "error",
+                            "detail": f"Document analysis failed: {str(e)}",
+                        }
+                    )
+                    return
+                text = "".join(parts)
+                await run_in_threadpool(
+                    document_cache.put,
+                    upload.document_id,
+                    text,
+                    file.filename,
+                    file.content_type,
+                )
+        finally:
+            upload.close()
+
+        document = await run_in_threadpool(
+            document_store.add,
+            text,
+            name=file.filename,
+            document_id=upload.document_id,
+        )
+        index_document(document)
+        yield ndjson_line(
+            {
+                "type": "done",
+                "filename": file.filename,
+                "size": upload.size,
+                "cached": cached is not None,
+                **document.info(),
+            }
         )
 
-        result = analyze_document(uploaded_file)
-        return {
-            "filename": file.filename,
-            "content_type": file.content_type,
-            "content": result,
-            "size": len(content),
-        }
-    except Exception as e:
+    # The background task also removes the temp file if the stream never started
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(upload.close),
+    )
+
+
+@router.post("/documents")
+async def add_document(
+    request: DocumentRequest, current_user: Dict = Depends(optional_auth)
+):
+    """Index document text for retrieval; chat requests can then pass document_id"""
+    document = await run_in_threadpool(
+        document_store.add, request.text, name=request.name
+    )
+    index_document(document)
+    return document.info()
+
+
+@router.get("/documents/cache/stats")
+async def document_cache_stats(current_user: Dict = Depends(optional_auth)):
+    """Get extracted-text cache hit/miss/eviction counters and size"""
+    return document_cache.stats()
+
+
+@router.get("/documents/{document_id}")
+async def get_document(document_id: str, current_user: Dict = Depends(optional_auth)):
+    """Get indexed document metadata"""
+    document = document_store.get(document_id)
+    if document is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Document analysis failed: {str(e)}",
+            status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
         )
+    return document.info()
+
+
+@router.delete("/documents/{document_id}")
+async def delete_document(
+    document_id: str, current_user: Dict = Depends(optional_auth)
+):
+    """Remove document from the retrieval index"""
+    if not document_store.remove(document_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
+        )
+    await semantic_index.remove(document_prefix(document_id))
+    return {"success": True, "message": "Document removed"}
 
 
 @router.post("/code-helper")
@@ -167,11 +333,17 @@ async def agent_code_helper(
 
 
 @router.get("/news")
-async def agent_news(current_user: Dict = Depends(optional_auth)):
-    """Get top news from RSS feeds"""
+async def agent_news(
+    refresh: bool = False, current_user: Dict = Depends(optional_auth)
+):
+    """Get top news from RSS feeds (served from the background-refreshed snapshot)"""
     try:
-        news = get_top_news()
-        return {"news": news}
+        if refresh or news_aggregator.updated_at is None:
+            await news_aggregator.refresh()
+        return {
+            "news": news_aggregator.snapshot(),
+            "updated_at": news_aggregator.updated_at,
+        }
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -179,13 +351,39 @@ async def agent_news(current_user: Dict = Depends(optional_auth)):
         )
 
 
+@router.get("/news/feeds")
+async def list_news_feeds(current_user: Dict = Depends(optional_auth)):
+    """Configured feeds and their refresh state"""
+    return news_aggregator.stats()
+
+
+@router.post("/news/feeds")
+async def add_news_feed(
+    request: NewsFeedRequest, current_user: Dict = Depends(optional_auth)
+):
+    """Add (or replace) a feed and fetch it"""
+    feed = news_aggregator.add_feed(request.name, request.url)
+    await news_aggregator.refresh()
+    return feed.info()
+
+
+@router.delete("/news/feeds/{name}")
+async def remove_news_feed(name: str, current_user: Dict = Depends(optional_auth)):
+    """Remove a feed"""
+    if not news_aggregator.remove_feed(name):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Feed not found"
+        )
+    return {"success": True, "message": "Feed removed"}
+
+
 @router.post("/api-call")
 async def agent_api_call(
     request: ApiCallRequest, current_user: Dict = Depends(optional_auth)
 ):
     """Make API calls (GET, POST, PUT, DELETE)"""
     try:
-        result = api_caller(
+        result = await api_caller_async(
             url=request.url,
             method=request.method,
             headers=request.headers,
@@ -2,10 +2,11 @@
 Chat endpoints for AI conversations
 """
 
-import json
+import asyncio
 import time
-from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional
+from fastapi import APIRouter, HTTPException, Request, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
@@ -14,15 +15,42 @@ from fastapi_app.core.ollama_client import (
     chat_with_model,
     get_cached_response,
     cache_response,
-    contains_uncertainty,
+    clear_response_cache,
+    response_cache,
     get_models,
+    get_ollama_pool,
+    OllamaClientPool,
+)
+from fastapi_app.core.cache import make_cache_key
+from fastapi_app.core.enhancement import Enhancement, grounded_messages
+from fastapi_app.core.generation import GenerationOptions, estimate_prompt_tokens
+from fastapi_app.core.history import history_budget, history_manager, model_summarizer
+from fastapi_app.core.history_store import history_store
+from fastapi_app.core.scheduler import (
+    QueueFullError,
+    Ticket,
+    get_scheduler,
+    schedulers,
+)
+from fastapi_app.core.residency import get_residency
+from fastapi_app.core.retrieval import document_store, format_excerpts, needs_retrieval
+from fastapi_app.core.semantic import index_document, rank_chunks
+from fastapi_app.core.singleflight import SingleFlight
+from fastapi_app.core.streaming import coalesce_chunks, sse_event
+from fastapi_app.api.agents import web_search_async
+from fastapi_app.core.config import (
+    MODEL_SOURCES,
+    DEFAULT_MODEL_SOURCE,
+    SCHEDULER_POSITION_INTERVAL,
+    MODEL_KEEP_ALIVE,
+    HISTORY_PAGE_SIZE,
+    HISTORY_MAX_PAGE_SIZE,
 )
-from fastapi_app.core.config import MODEL_SOURCES, DEFAULT_MODEL_SOURCE
 
 router = APIRouter()
 
-# In-memory chat storage (in production would use database)
-chat_sessions = {}
+# Identical in-flight generations share a single upstream request
+generations = SingleFlight()
 
 
 class Message(BaseModel):
@@ -38,6 +66,20 @@ class ChatRequest(BaseModel):
     use_cache: bool = True
     document_context: Optional[str] = None
     chat_document: Optional[str] = None
+    document_id: Optional[str] = None  # indexed document (see /api/agents/documents)
+    options: Optional[GenerationOptions] = None
+    session_id: Optional[str] = None  # include this chat history in the prompt
+    enhance: bool = True  # re-answer with web search results when the model is unsure
+
+    def generation_options(self) -> Optional[Dict[str, Any]]:
+        """Explicitly set generation options (None if all are automatic)"""
+        return self.options.dict(exclude_none=True) if self.options else None
+
+
+class WarmModelRequest(BaseModel):
+    model: str
+    source: str = DEFAULT_MODEL_SOURCE
+    keep_alive: str = MODEL_KEEP_ALIVE
 
 
 class ChatResponse(BaseModel):
@@ -54,9 +96,159 @@ def get_session_key(user_id: str, session_id: str = "default") -> str:
     return f"{user_id}:{session_id}"
 
 
+async def document_excerpts(document, query: str) -> str:
+    """Excerpts of document relevant to query (BM25 fused with embedding ranking)"""
+    semantic = await rank_chunks(document, query)
+    chunks = await run_in_threadpool(document.retrieve, query, semantic=semantic)
+    return format_excerpts(chunks)
+
+
+async def relevant_context(text: str, query: str) -> str:
+    """Whole text for short documents, retrieved excerpts for long ones"""
+    if not needs_retrieval(text):
+        return text
+    # Chunking and BM25 statistics of a long text are CPU-bound
+    document = await run_in_threadpool(document_store.add, text)
+    index_document(document)
+    return await document_excerpts(document, query)
+
+
+async def build_messages(request: ChatRequest) -> List[Dict[str, str]]:
+    """
+    Build model messages for a chat request, including document context
+
+    Long documents are not pasted whole: only the chunks most relevant to
+    the question are included (see core/retrieval.py, core/semantic.py).
+    """
+    if request.document_id:
+        # May load the extracted text from the on-disk document cache
+        document = await run_in_threadpool(document_store.get, request.document_id)
+        if document is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Document '{request.document_id}' not found. Upload it again.",
+            )
+        excerpts = await document_excerpts(document, request.message)
+        return [
+            {
+                "role": "system",
+                "content": f"Relevant excerpts from document '{document.name}':\n{excerpts}\n\nUser question: {request.message}",
+            }
+        ]
+    if request.document_context:
+        context = await relevant_context(request.document_context, request.message)
+        return [
+            {
+                "role": "system",
+                "content": f"Context from document:\n{context}\n\nUser question: {request.message}",
+            }
+        ]
+    if request.chat_document:
+        context = await relevant_context(request.chat_document, request.message)
+        return [
+            {
+                "role": "system",
+                "content": f"Context from chat document:\n{context}\n\nUser question: {request.message}",
+            }
+        ]
+    return [{"role": "user", "content": request.message}]
+
+
+def start_enhancement(request: ChatRequest) -> Optional[Enhancement]:
+    """Uncertainty watcher for the response (None when enhancement is off)"""
+    if not request.enhance:
+        return None
+    return Enhancement(request.message, web_search_async)
+
+
+def generate(
+    request: ChatRequest,
+    messages: List[Dict[str, str]],
+    ollama: OllamaClientPool,
+    on_ticket: Optional[Callable[[Ticket], None]] = None,
+) -> AsyncIterator[str]:
+    """
+    Response chunks for request, shared with identical in-flight requests
+
+    The scheduler ticket is taken and released inside the generation
+    itself (the shared flight task when deduplicated), so its slot is held
+    exactly as long as Ollama is generating, whoever is still listening.
+    on_ticket receives the ticket to report queue position; followers of
+    an in-flight generation get no ticket.
+    """
+
+    async def start():
+        scheduler = get_scheduler(request.source)
+        ticket = scheduler.enqueue(request.model)
+        try:
+            if on_ticket:
+                on_ticket(ticket)
+            async for chunk in chat_with_model(
+                request.model,
+                messages,
+                request.source,
+                stream=True,
+                pool=ollama,
+                ticket=ticket,
+                options=request.generation_options(),
+            ):
+                yield chunk
+        finally:
+            scheduler.release(ticket)
+
+    # Requests that bypass the cache want a fresh generation
+    if not request.use_cache:
+        return start()
+    key = make_cache_key(request.model, messages, request.generation_options())
+    return generations.stream(key, start)
+
+
+async def build_prompt(
+    request: ChatRequest, current_user: Optional[Dict], ollama: OllamaClientPool
+) -> List[Dict[str, str]]:
+    """
+    Messages for the model: packed session history followed by the new message
+
+    History beyond the model's token budget is replaced by a rolling
+    summary (see core/history.py). Turns the summary already covers are
+    not read from the history store.
+    """
+    messages = await build_messages(request)
+    if not request.session_id:
+        return messages
+
+    # History is stored by the authenticated /history endpoints (single user)
+    user_id = current_user["user_id"] if current_user else "default"
+    session_key = get_session_key(user_id, request.session_id)
+    pinned, offset = history_manager.resume_point(session_key)
+    stored = (
+        await run_in_threadpool(history_store.messages, session_key, end=pinned)
+        if pinned
+        else []
+    )
+    stored += await run_in_threadpool(
+        history_store.messages, session_key, start=pinned + offset
+    )
+    history = [{"role": m["role"], "content": m["content"]} for m in stored]
+    if not history:
+        return messages
+
+    budget = history_budget(request.model) - estimate_prompt_tokens(messages)
+    packed = await history_manager.pack(
+        session_key,
+        history,
+        budget,
+        model_summarizer(request.model, request.source, ollama),
+        offset=offset,
+    )
+    return packed + messages
+
+
 @router.get("/models")
 async def list_models(
-    source: str = DEFAULT_MODEL_SOURCE, current_user: Dict = Depends(optional_auth)
+    source: str = DEFAULT_MODEL_SOURCE,
+    current_user: Dict = Depends(optional_auth),
+    ollama: OllamaClientPool = Depends(get_ollama_pool),
 ):
     """Get list of available models"""
     if source not in MODEL_SOURCES:
@@ -65,19 +257,73 @@ async def list_models(
             detail=f"Invalid source. Available sources: {MODEL_SOURCES}",
         )
 
-    models = get_models(source)
-    return {"models": models, "source": source, "total": len(models)}
+    models = await get_models(source, ollama)
+    residency = get_residency(source, ollama)
+    hot_models = [m for m in models if residency.is_resident(m)]
+    return {
+        "models": models,
+        "hot_models": hot_models,
+        "source": source,
+        "total": len(models),
+    }
+
+
+@router.post("/models/warm")
+async def warm_model(
+    request: WarmModelRequest,
+    current_user: Dict = Depends(optional_auth),
+    ollama: OllamaClientPool = Depends(get_ollama_pool),
+):
+    """Pre-load a model into memory so the next request has no cold start"""
+    available_models = await get_models(request.source, ollama)
+    if request.model not in available_models:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Model '{request.model}' not available in source '{request.source}'. Available: {available_models}",
+        )
+
+    residency = get_residency(request.source, ollama)
+    was_resident = residency.is_resident(request.model)
+    try:
+        load_time = await residency.warm(request.model, request.keep_alive)
+    except QueueFullError:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Model warm-up failed: {str(e)}",
+        )
+    return {
+        "model": request.model,
+        "source": request.source,
+        "was_resident": was_resident,
+        "load_time": load_time,
+    }
+
+
+@router.get("/models/resident")
+async def resident_models(
+    source: str = DEFAULT_MODEL_SOURCE,
+    current_user: Dict = Depends(optional_auth),
+    ollama: OllamaClientPool = Depends(get_ollama_pool),
+):
+    """Get models currently loaded in memory and recent load/unload events"""
+    residency = get_residency(source, ollama)
+    await residency.poll()
+    return residency.info()
 
 
 @router.post("/send")
 async def send_message(
-    request: ChatRequest, current_user: Dict = Depends(optional_auth)
+    request: ChatRequest,
+    current_user: Dict = Depends(optional_auth),
+    ollama: OllamaClientPool = Depends(get_ollama_pool),
 ):
     """Send message and get immediate response (non-streaming)"""
     start_time = time.time()
 
     # Check if model is available
-    available_models = get_models(request.source)
+    available_models = await get_models(request.source, ollama)
     if request.model not in available_models:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -85,30 +331,14 @@ async def send_message(
         )
 
     # Prepare messages with context
-    messages = []
-
-    # Add document context if provided
-    if request.document_context:
-        messages.append(
-            {
-                "role": "system",
-                "content": f"Context from document:\n{request.document_context}\n\nUser question: {request.message}",
-            }
-        )
-    elif request.chat_document:
-        messages.append(
-            {
-                "role": "system",
-                "content": f"Context from chat document:\n{request.chat_document}\n\nUser question: {request.message}",
-            }
-        )
-    else:
-        messages.append({"role": "user", "content": request.message})
+    messages = await build_prompt(request, current_user, ollama)
 
     # Check cache
     cached_response = None
     if request.use_cache:
-        cached_response = get_cached_response(request.model, messages)
+        cached_response = await get_cached_response(
+            request.model, messages, request.generation_options()
+        )
 
     if cached_response:
         processing_time = time.time() - start_time
@@ -120,25 +350,46 @@ async def send_message(
             processing_time=processing_time,
         )
 
-    # Get response from model
+    # Get response from model; the web search starts as soon as it sounds unsure
+    enhancement = start_enhancement(request)
     response_chunks = []
-    for chunk in chat_with_model(request.model, messages, request.source, stream=True):
-        response_chunks.append(chunk)
-
-    full_response = "".join(response_chunks)
-
-    # Cache response
-    if request.use_cache:
-        cache_response(request.model, messages, full_response)
+    try:
+        async for chunk in generate(request, messages, ollama):
+            response_chunks.append(chunk)
+            if enhancement:
+                enhancement.feed(chunk)
+
+        full_response = "".join(response_chunks)
+
+        # Re-answer with the search results as context
+        enhanced = False
+        results = await enhancement.results() if enhancement else None
+        if results:
+            enhanced_chunks = []
+            async for chunk in generate(
+                request, grounded_messages(messages, request.message, results), ollama
+            ):
+                enhanced_chunks.append(chunk)
+            full_response = "".join(enhanced_chunks)
+            enhanced = True
+    finally:
+        if enhancement:
+            enhancement.cancel()
+
+    # Cache the answer to messages themselves; the grounded answer was
+    # generated from other messages and a cache hit could not report it
+    # as enhanced. An uncertain answer is not cached, so asking again runs
+    # the enhancement again instead of replaying it.
+    if request.use_cache and not (enhancement and enhancement.triggered):
+        await cache_response(
+            request.model,
+            messages,
+            "".join(response_chunks),
+            request.generation_options(),
+        )
 
     processing_time = time.time() - start_time
 
-    # Check for uncertainty and potentially enhance with web search
-    enhanced = False
-    if contains_uncertainty(full_response):
-        # TODO: Trigger web search and enhance response
-        enhanced = True
-
     return ChatResponse(
         response=full_response,
         model=request.model,
@@ -151,79 +402,189 @@ async def send_message(
 
 @router.post("/stream")
 async def stream_message(
-    request: ChatRequest, current_user: Dict = Depends(optional_auth)
+    request: ChatRequest,
+    http_request: Request,
+    current_user: Dict = Depends(optional_auth),
+    ollama: OllamaClientPool = Depends(get_ollama_pool),
 ):
     """Stream response via Server-Sent Events (SSE)"""
+    start_time = time.time()
 
-    async def event_generator():
-        start_time = time.time()
+    # Prepare messages
+    messages = await build_prompt(request, current_user, ollama)
 
-        # Prepare messages
-        messages = []
-        if request.document_context:
-            messages.append(
-                {
-                    "role": "system",
-                    "content": f"Context from document:\n{request.document_context}\n\nUser question: {request.message}",
-                }
-            )
-        elif request.chat_document:
-            messages.append(
-                {
-                    "role": "system",
-                    "content": f"Context from chat document:\n{request.chat_document}\n\nUser question: {request.message}",
-                }
-            )
-        else:
-            messages.append({"role": "user", "content": request.message})
+    # Check cache for non-streaming cache hit
+    cached_response = None
+    if request.use_cache:
+        cached_response = await get_cached_response(
+            request.model, messages, request.generation_options()
+        )
 
-        # Check cache for non-streaming cache hit
-        cached_response = None
-        if request.use_cache:
-            cached_response = get_cached_response(request.model, messages)
+    # Report a full queue as 429 before the response starts (followers of an
+    # identical in-flight request do not need a slot). The slot itself is
+    # taken by the generation, so nothing is held if the body never starts.
+    scheduler = get_scheduler(request.source)
+    if not cached_response and not (
+        request.use_cache
+        and generations.in_flight(
+            make_cache_key(request.model, messages, request.generation_options())
+        )
+    ):
+        scheduler.check_capacity()
+
+    enhancement = None if cached_response else start_enhancement(request)
 
+    async def event_generator():
+        try:
+            async for event in stream_events():
+                yield event
+        except Exception as e:
+            # Headers are already sent: end the stream with an explicit error
+            # frame so clients can tell a failure from a dropped connection
+            event = {"chunk": "", "done": True, "cached": False, "error": str(e)}
+            if isinstance(e, QueueFullError):
+                event["retry_after"] = e.retry_after
+            yield sse_event(event)
+        finally:
+            # Client gone or done: a pending speculative search is no longer needed
+            if enhancement:
+                enhancement.cancel()
+
+    async def stream_events():
         if cached_response:
             # Send cached response as single event
             processing_time = time.time() - start_time
-            yield f"data: {
-                json.dumps(
+            yield sse_event(
+                {
+                    "chunk": cached_response,
+                    "done": True,
+                    "cached": True,
+                    "processing_time": processing_time,
+                }
+            )
+            return
+
+        # Stream response from model; frames are coalesced and the upstream
+        # request is cancelled as soon as the client goes away
+        tickets: List[Ticket] = []
+        response_chunks = []
+        frames = coalesce_chunks(generate(request, messages, ollama, tickets.append))
+        try:
+            # Report queue position until the first frame arrives
+            first = asyncio.ensure_future(frames.__anext__())
+            try:
+                while True:
+                    done, _ = await asyncio.wait(
+                        {first}, timeout=SCHEDULER_POSITION_INTERVAL
+                    )
+                    if done:
+                        break
+                    if await http_request.is_disconnected():
+                        return
+                    if tickets and not tickets[0].granted.is_set():
+                        yield sse_event(
+                            {
+                                "chunk": "",
+                                "done": False,
+                                "queued": True,
+                                "position": scheduler.position(tickets[0]),
+                            }
+                        )
+            finally:
+                if not first.done():
+                    first.cancel()
+                    await asyncio.gather(first, return_exceptions=True)
+            try:
+                frame = first.result()
+            except StopAsyncIteration:
+                frame = None
+            while frame is not None:
+                if await http_request.is_disconnected():
+                    return
+                response_chunks.append(frame)
+                yield sse_event({"chunk": frame, "done": False, "cached": False})
+                # Uncertain answer: search the web while generation continues
+                if enhancement and enhancement.feed(frame):
+                    yield sse_event(
+                        {
+                            "chunk": "",
+                            "done": False,
+                            "phase": "searching",
+                            "uncertainty": enhancement.phrase,
+                        }
+                    )
+                frame = await anext(frames, None)
+        finally:
+            await frames.aclose()
+
+        full_response = "".join(response_chunks)
+        original_response = None
+
+        # Second, web-grounded answer over the same connection
+        try:
+            results = await enhancement.results() if enhancement else None
+            if results:
+                yield sse_event(
                     {
-                        'chunk': cached_response,
-                        'done': True,
-                        'cached': True,
-                        'processing_time': processing_time,
+                        "chunk": "",
+                        "done": False,
+                        "phase": "enhanced",
+                        "sources": [r.get("link") for r in results],
                     }
                 )
-            }\n\n"
-            return
+                enhanced_chunks = []
+                frames = coalesce_chunks(
+                    generate(
+                        request,
+                        grounded_messages(messages, request.message, results),
+                        ollama,
+                    )
+                )
+                try:
+                    async for frame in frames:
+                        if await http_request.is_disconnected():
+                            return
+                        enhanced_chunks.append(frame)
+                        yield sse_event(
+                            {
+                                "chunk": frame,
+                                "done": False,
+                                "cached": False,
+                                "phase": "enhanced",
+                            }
+                        )
+                finally:
+                    await frames.aclose()
+                original_response = full_response
+                full_response = "".join(enhanced_chunks)
+        except QueueFullError as e:
+            # Keep the first answer if there is no capacity for a second one
+            yield sse_event(
+                {"chunk": "", "done": False, "phase": "enhanced", "error": str(e)}
+            )
 
-        # Stream response from model
-        full_response = ""
-        for chunk in chat_with_model(
-            request.model, messages, request.source, stream=True
-        ):
-            full_response += chunk
-            yield f"data: {
-                json.dumps({'chunk': chunk, 'done': False, 'cached': False})
-            }\n\n"
+        # Cache a certain first answer only (see send_message)
+        if request.use_cache and not (enhancement and enhancement.triggered):
+            await cache_response(
+                request.model,
+                messages,
+                full_response,
+                request.generation_options(),
+            )
 
         # Send completion event
         processing_time = time.time() - start_time
-        yield f"data: {
-            json.dumps(
-                {
-                    'chunk': '',
-                    'done': True,
-                    'cached': False,
-                    'processing_time': processing_time,
-                    'full_response': full_response,
-                }
-            )
-        }\n\n"
-
-        # Cache the response
-        if request.use_cache:
-            cache_response(request.model, messages, full_response)
+        yield sse_event(
+            {
+                "chunk": "",
+                "done": True,
+                "cached": False,
+                "enhanced": original_response is not None,
+                "processing_time": processing_time,
+                "full_response": full_response,
+                "original_response": original_response,
+            }
+        )
 
     return StreamingResponse(
         event_generator(),
@@ -238,12 +599,31 @@ async def stream_message(
 
 @router.get("/history")
 async def get_chat_history(
-    session_id: str = "default", current_user: Dict = Depends(get_current_user)
+    session_id: str = "default",
+    limit: int = HISTORY_PAGE_SIZE,
+    before: Optional[int] = None,
+    current_user: Dict = Depends(get_current_user),
 ):
-    """Get chat history for session"""
+    """
+    Get a page of chat history for session
+
+    Returns up to `limit` messages older than `before` (a message seq),
+    newest page first; pass `next_before` back to load older messages.
+    """
+    if not 1 <= limit <= HISTORY_MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {HISTORY_MAX_PAGE_SIZE}",
+        )
     session_key = get_session_key(current_user["user_id"], session_id)
-    history = chat_sessions.get(session_key, [])
-    return {"messages": history}
+    messages = await run_in_threadpool(history_store.page, session_key, limit, before)
+    first = messages[0]["seq"] if messages else None
+    return {
+        "messages": messages,
+        "message_count": await run_in_threadpool(history_store.count, session_key),
+        "has_more": bool(first),
+        "next_before": first or None,
+    }
 
 
 @router.post("/history")
@@ -254,12 +634,14 @@ async def save_message(
 ):
     """Save message to chat history"""
     session_key = get_session_key(current_user["user_id"], session_id)
-
-    if session_key not in chat_sessions:
-        chat_sessions[session_key] = []
-
-    chat_sessions[session_key].append(message.dict())
-    return {"success": True, "message_count": len(chat_sessions[session_key])}
+    count = await run_in_threadpool(
+        history_store.append,
+        session_key,
+        message.role,
+        message.content,
+        message.model_name,
+    )
+    return {"success": True, "message_count": count}
 
 
 @router.delete("/history")
@@ -269,12 +651,31 @@ async def clear_history(
     """Clear chat history for session"""
     session_key = get_session_key(current_user["user_id"], session_id)
 
-    if session_key in chat_sessions:
-        del chat_sessions[session_key]
+    await run_in_threadpool(history_store.clear, session_key)
+    history_manager.forget(session_key)
 
     return {"success": True, "message": "Chat history cleared"}
 
 
+@router.get("/cache/stats")
+async def cache_stats(current_user: Dict = Depends(optional_auth)):
+    """Get response cache hit/miss/eviction counters"""
+    return {**response_cache.stats(), "singleflight": generations.stats()}
+
+
+@router.delete("/cache")
+async def clear_cache(current_user: Dict = Depends(get_current_user)):
+    """Clear response cache"""
+    clear_response_cache()
+    return {"success": True, "message": "Response cache cleared"}
+
+
+@router.get("/queue")
+async def queue_stats(current_user: Dict = Depends(optional_auth)):
+    """Get scheduler load and queue length per model source"""
+    return {source: scheduler.stats() for source, scheduler in schedulers.items()}
+
+
 @router.get("/sources")
 async def list_sources(current_user: Dict = Depends(get_current_user)):
     """Get available model sources"""
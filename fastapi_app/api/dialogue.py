@@ -4,27 +4,41 @@ Dialogue/debate endpoints for AI conversations
 
 import sys
 import time
+import uuid
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 from fastapi_app.core.dependencies import get_current_user, optional_auth
-from fastapi_app.core.ollama_client import chat_with_model
-from fastapi_app.core.config import MBTI_PERSONAS
+from fastapi_app.core.ollama_client import (
+    chat_with_model,
+    get_ollama_pool,
+    OllamaClientPool,
+)
+from fastapi_app.core.scheduler import QueueFullError
+from fastapi_app.core.generation import GenerationOptions
+from fastapi_app.core.history import history_budget, history_manager, model_summarizer
+from fastapi_app.core.dialogue_store import DialogueConflictError, dialogue_store
+from fastapi_app.core.config import MBTI_PERSONAS, DIALOGUE_PAGE_SIZE
 
 # Import existing dialogue module from parent directory
 sys.path.insert(0, str(__file__).rsplit("/", 3)[0])  # Add my-chat to path
 
-router = APIRouter()
+try:
+    from search_index import message_search
+except ImportError as e:
+    print(f"Warning: Could not import search index: {e}")
+    message_search = None
 
-# In-memory dialogue storage
-dialogues = {}
+router = APIRouter()
 
 
 class DialogueParticipant(BaseModel):
     model: str
     persona: Optional[str] = None
     source: str = "Ollama (11434)"
+    options: Optional[GenerationOptions] = None
 
 
 class StartDialogueRequest(BaseModel):
@@ -106,20 +120,46 @@ def get_persona_prompt(
     return persona_msg
 
 
-def get_dialogue_context(dialogue_id: str) -> Optional[Dict]:
-    """Get dialogue context from stored dialogue"""
-    if dialogue_id not in dialogues:
-        return None
-    return dialogues.get(dialogue_id, {}).get("context")
+def index_dialogue(dialogue: Dict[str, Any], start: int = 0):
+    """Add dialogue messages from start onwards to the full-text search index"""
+    if message_search is None:
+        return
+    message_search.index(
+        "dialogue",
+        dialogue["dialogue_id"],
+        dialogue["messages"],
+        start,
+        title=dialogue["topic"],
+    )
+
+
+def forget_dialogue(dialogue_id: str):
+    """Drop search entries and cached summaries of a deleted dialogue"""
+    if message_search is not None:
+        message_search.remove("dialogue", dialogue_id)
+    history_manager.forget(f"{dialogue_id}:participant1")
+    history_manager.forget(f"{dialogue_id}:participant2")
+
+
+async def load_dialogue(dialogue_id: str) -> Dict[str, Any]:
+    """Stored dialogue or 404"""
+    dialogue = await run_in_threadpool(dialogue_store.get, dialogue_id)
+    if dialogue is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Dialogue not found"
+        )
+    return dialogue
 
 
 @router.post("/dialogue/start")
 async def start_dialogue(
-    request: StartDialogueRequest, current_user: Dict = Depends(optional_auth)
+    request: StartDialogueRequest,
+    current_user: Dict = Depends(optional_auth),
+    ollama: OllamaClientPool = Depends(get_ollama_pool),
 ):
     """Start a new dialogue between two AI models"""
     user_id = current_user.get("user_id", "guest") if current_user else "guest"
-    dialogue_id = f"dialogue_{int(time.time())}_{user_id}"
+    dialogue_id = f"dialogue_{int(time.time())}_{user_id}_{uuid.uuid4().hex[:8]}"
 
     # Create dialogue context
     dialogue_context = {
@@ -139,49 +179,53 @@ async def start_dialogue(
         "moderation_context": "Initial prompt: " + request.initial_prompt,
     }
 
-    # Create initial messages
-    messages = []
-
-    # Add moderator message with initial prompt
-    messages.append(
+    # Initial moderator message with the prompt
+    messages = [
         DialogueMessage(
             role="moderator", content=request.initial_prompt, timestamp=time.time()
-        )
-    )
+        ).dict()
+    ]
 
     # Store dialogue state with context
-    dialogues[dialogue_id] = {
+    state = {
         "participant1": request.participant1.dict(),
         "participant2": request.participant2.dict(),
-        "messages": messages,
         "current_turn": "participant1",
         "max_rounds": request.max_rounds,
         "rounds_completed": 0,
         "topic": request.topic or request.initial_prompt[:100],
-        "user_id": user_id,
         "dialogue_type": request.dialogue_type or "debate",
         "context": dialogue_context,
     }
+    await run_in_threadpool(
+        dialogue_store.create, dialogue_id, user_id, state, messages
+    )
+    await run_in_threadpool(
+        index_dialogue, {"dialogue_id": dialogue_id, "messages": messages, **state}
+    )
 
     # Get first response
-    return await next_dialogue_round(dialogue_id, current_user)
+    return await next_dialogue_round(dialogue_id, current_user, ollama)
 
 
 @router.post("/dialogue/{dialogue_id}/next")
 async def next_dialogue_round(
-    dialogue_id: str, current_user: Dict = Depends(optional_auth)
+    dialogue_id: str,
+    current_user: Dict = Depends(optional_auth),
+    ollama: OllamaClientPool = Depends(get_ollama_pool),
 ):
-    """Get next response in dialogue"""
-    if dialogue_id not in dialogues:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Dialogue not found"
-        )
+    """
+    Get next response in dialogue
 
-    dialogue = dialogues[dialogue_id]
+    State is persisted after every round, so a dialogue can be resumed
+    after a restart or from another worker.
+    """
+    dialogue = await load_dialogue(dialogue_id)
 
     # Check if dialogue is completed
     if dialogue["rounds_completed"] >= dialogue["max_rounds"]:
-        dialogue["completed"] = True
+        if not dialogue["completed"]:
+            await run_in_threadpool(dialogue_store.update, dialogue_id, completed=True)
         return DialogueResponse(
             dialogue_id=dialogue_id,
             messages=dialogue["messages"],
@@ -197,7 +241,7 @@ async def next_dialogue_round(
     history_messages = []
 
     # Add persona system prompt with dialogue context
-    dialogue_context = get_dialogue_context(dialogue_id)
+    dialogue_context = dialogue["context"]
     persona_prompt = get_persona_prompt(
         participant["persona"],
         dialogue.get("dialogue_type", "debate"),
@@ -205,29 +249,40 @@ async def next_dialogue_round(
     )
     history_messages.append({"role": "system", "content": persona_prompt})
 
-    # Add conversation history (last 10 messages)
-    for msg in dialogue["messages"][-10:]:
-        if msg.role == "moderator":
-            history_messages.append({"role": "user", "content": msg.content})
-        elif msg.role in ["participant1", "participant2"]:
+    # Add conversation history
+    for msg in dialogue["messages"]:
+        if msg["role"] == "moderator":
+            history_messages.append({"role": "user", "content": msg["content"]})
+        elif msg["role"] in ["participant1", "participant2"]:
             # Convert participant messages to assistant role for context
-            history_messages.append({"role": "assistant", "content": msg.content})
-
-    # Get last message as prompt
-    last_message = (
-        dialogue["messages"][-1].content if dialogue["messages"] else "Hello!"
+            history_messages.append({"role": "assistant", "content": msg["content"]})
+
+    # Keep recent turns within the model's token budget, older ones summarised
+    # (the persona prompt is a leading system message and is always kept)
+    history_messages = await history_manager.pack(
+        f"{dialogue_id}:{current_turn}",
+        history_messages,
+        history_budget(participant["model"]),
+        model_summarizer(participant["model"], participant["source"], ollama),
     )
 
     # Get response from model
     try:
         response_chunks = []
-        for chunk in chat_with_model(
-            participant["model"], history_messages, participant["source"], stream=True
+        async for chunk in chat_with_model(
+            participant["model"],
+            history_messages,
+            participant["source"],
+            stream=True,
+            pool=ollama,
+            options=participant.get("options"),
         ):
             response_chunks.append(chunk)
 
         response = "".join(response_chunks)
 
+    except QueueFullError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -243,15 +298,32 @@ async def next_dialogue_round(
         timestamp=time.time(),
     )
 
-    dialogue["messages"].append(new_message)
-
     # Update turn
     next_turn = "participant2" if current_turn == "participant1" else "participant1"
-    dialogue["current_turn"] = next_turn
-    dialogue["rounds_completed"] += 1
+    rounds_completed = dialogue["rounds_completed"] + 1
 
     # Check if completed
-    completed = dialogue["rounds_completed"] >= dialogue["max_rounds"]
+    completed = rounds_completed >= dialogue["max_rounds"]
+
+    try:
+        count = await run_in_threadpool(
+            dialogue_store.append,
+            dialogue_id,
+            new_message.dict(),
+            expected_rounds=dialogue["rounds_completed"],
+            current_turn=next_turn,
+            rounds_completed=rounds_completed,
+            completed=completed,
+        )
+    except DialogueConflictError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Dialogue was advanced by another request",
+        )
+
+    # Moderator messages may have been added while the model was answering
+    dialogue = await load_dialogue(dialogue_id)
+    await run_in_threadpool(index_dialogue, dialogue, count - 1)
 
     return DialogueResponse(
         dialogue_id=dialogue_id,
@@ -267,22 +339,21 @@ async def add_moderator_message(
     dialogue_id: str, message: str, current_user: Dict = Depends(optional_auth)
 ):
     """Add moderator message to dialogue"""
-    if dialogue_id not in dialogues:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Dialogue not found"
-        )
-
-    dialogue = dialogues[dialogue_id]
+    dialogue = await load_dialogue(dialogue_id)
 
     moderator_message = DialogueMessage(
         role="moderator", content=message, timestamp=time.time()
     )
 
-    dialogue["messages"].append(moderator_message)
-
     # Update moderation context
-    if "context" in dialogue:
-        dialogue["context"]["moderation_context"] = message
+    context = dict(dialogue["context"], moderation_context=message)
+    count = await run_in_threadpool(
+        dialogue_store.append, dialogue_id, moderator_message.dict(), context=context
+    )
+
+    # Index by the stored position (other messages may have been appended)
+    dialogue = await load_dialogue(dialogue_id)
+    await run_in_threadpool(index_dialogue, dialogue, count - 1)
 
     return {"success": True, "message": "Moderator message added"}
 
@@ -292,14 +363,9 @@ async def save_dialogue(
     dialogue_id: str, format: str = "txt", current_user: Dict = Depends(optional_auth)
 ):
     """Save dialogue to different formats"""
-    if dialogue_id not in dialogues:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Dialogue not found"
-        )
-
-    dialogue = dialogues[dialogue_id]
+    dialogue = await load_dialogue(dialogue_id)
     topic = dialogue["topic"]
-    messages = dialogue["messages"]
+    messages = [DialogueMessage(**m) for m in dialogue["messages"]]
 
     if format == "txt":
         # Generate TXT
@@ -425,42 +491,42 @@ async def save_dialogue(
 
 @router.get("/dialogue/{dialogue_id}")
 async def get_dialogue(dialogue_id: str, current_user: Dict = Depends(optional_auth)):
-    """Get dialogue by ID"""
-    if dialogue_id not in dialogues:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Dialogue not found"
-        )
-
-    dialogue = dialogues[dialogue_id]
+    """Get dialogue by ID (also after a restart, to resume it)"""
+    dialogue = await load_dialogue(dialogue_id)
 
     return DialogueResponse(
         dialogue_id=dialogue_id,
         messages=dialogue["messages"],
         current_turn=dialogue["current_turn"],
-        completed=dialogue.get("completed", False),
+        completed=dialogue["completed"],
         topic=dialogue["topic"],
     )
 
 
 @router.get("/dialogues")
-async def list_dialogues(current_user: Dict = Depends(optional_auth)):
-    """List user's dialogues"""
-    user_dialogues = []
-
-    for dialogue_id, dialogue in dialogues.items():
-        if dialogue.get("user_id") == current_user["user_id"]:
-            user_dialogues.append(
-                {
-                    "dialogue_id": dialogue_id,
-                    "topic": dialogue.get("topic", "Untitled"),
-                    "messages_count": len(dialogue.get("messages", [])),
-                    "rounds_completed": dialogue.get("rounds_completed", 0),
-                    "max_rounds": dialogue.get("max_rounds", 5),
-                    "created_at": dialogue_id.split("_")[1]
-                    if "_" in dialogue_id
-                    else "unknown",
-                }
-            )
+async def list_dialogues(
+    limit: int = DIALOGUE_PAGE_SIZE,
+    offset: int = 0,
+    current_user: Dict = Depends(optional_auth),
+):
+    """List user's dialogues, most recently active first"""
+    user_id = current_user.get("user_id", "guest") if current_user else "guest"
+    user_dialogues = [
+        {
+            "dialogue_id": dialogue["dialogue_id"],
+            "topic": dialogue["topic"] or "Untitled",
+            "messages_count": dialogue["message_count"],
+            "rounds_completed": dialogue["rounds_completed"],
+            "max_rounds": dialogue["max_rounds"],
+            "current_turn": dialogue["current_turn"],
+            "completed": dialogue["completed"],
+            "created_at": str(int(dialogue["created_at"])),
+            "updated_at": dialogue["updated_at"],
+        }
+        for dialogue in await run_in_threadpool(
+            dialogue_store.list_for_user, user_id, limit, offset
+        )
+    ]
 
     return {"dialogues": user_dialogues}
 
@@ -470,19 +536,18 @@ async def delete_dialogue(
     dialogue_id: str, current_user: Dict = Depends(optional_auth)
 ):
     """Delete dialogue"""
-    if dialogue_id not in dialogues:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Dialogue not found"
-        )
+    dialogue = await load_dialogue(dialogue_id)
 
     # Check ownership
-    if dialogues[dialogue_id].get("user_id") != current_user["user_id"]:
+    user_id = current_user.get("user_id", "guest") if current_user else "guest"
+    if dialogue["user_id"] != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to delete this dialogue",
         )
 
-    del dialogues[dialogue_id]
+    await run_in_threadpool(dialogue_store.delete, dialogue_id)
+    await run_in_threadpool(forget_dialogue, dialogue_id)
 
     return {"success": True, "message": "Dialogue deleted"}
 
@@ -3,11 +3,19 @@ Session management endpoints (save/load/delete chat sessions)
 """
 
 import sys
+import time
+from datetime import datetime
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 from fastapi_app.core.dependencies import get_current_user
+from fastapi_app.core.semantic import (
+    semantic_index,
+    session_items,
+    session_prefix,
+)
 
 # Import existing session module from parent directory
 sys.path.insert(0, str(__file__).rsplit("/", 3)[0])  # Add my-chat to path
@@ -16,9 +24,15 @@ try:
     from session import (
         save_session as save_session_original,
         load_session as load_session_original,
+        load_session_tail as load_session_tail_original,
         get_session_list as get_session_list_original,
         delete_session as delete_session_original,
+        get_session_page as get_session_page_original,
+        get_session_info as get_session_info_original,
     )
+    from catalog import SORT_KEYS as SESSION_SORT_KEYS, session_catalog
+    from config import SESSION_PAGE_SIZE, SEARCH_PAGE_SIZE
+    from search_index import message_search
 except ImportError as e:
     print(f"Warning: Could not import session module: {e}")
 
@@ -29,12 +43,29 @@ except ImportError as e:
     def load_session_original(filename):
         return []
 
+    def load_session_tail_original(filename, count):
+        return []
+
     def get_session_list_original():
         return []
 
     def delete_session_original(filename):
         return True
 
+    def get_session_page_original(
+        offset=0, limit=None, sort="created", descending=True
+    ):
+        return [], 0
+
+    def get_session_info_original(filename):
+        return None
+
+    SESSION_SORT_KEYS = {"created": "created"}
+    SESSION_PAGE_SIZE = 100
+    SEARCH_PAGE_SIZE = 20
+    session_catalog = None
+    message_search = None
+
 
 router = APIRouter()
 
@@ -52,32 +83,35 @@ class SessionInfo(BaseModel):
 
 
 @router.get("/sessions")
-async def list_sessions(current_user: Dict = Depends(get_current_user)):
-    """Get list of saved chat sessions"""
+async def list_sessions(
+    offset: int = 0,
+    limit: int = SESSION_PAGE_SIZE,
+    sort: str = "created",
+    order: str = "desc",
+    current_user: Dict = Depends(get_current_user),
+):
+    """Get a page of saved chat sessions from the session catalogue"""
+    if sort not in SESSION_SORT_KEYS or order not in ("asc", "desc"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"sort must be one of {sorted(SESSION_SORT_KEYS)}, order asc or desc",
+        )
+    if offset < 0 or limit < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="offset must be >= 0 and limit >= 1",
+        )
     try:
-        session_files = get_session_list_original()
-        sessions = []
-
-        for filename in session_files:
-            # Extract session name from filename
-            # Format: timestamp__session_name.json
-            if "__" in filename:
-                name = filename.split("__")[1].replace(".json", "")
-            else:
-                name = filename.replace(".json", "")
-
-            # Load session to get message count
-            try:
-                messages = load_session_original(filename)
-                message_count = len(messages)
-            except:
-                message_count = 0
-
-            sessions.append(
-                {"filename": filename, "name": name, "message_count": message_count}
-            )
-
-        return {"sessions": sessions}
+        sessions, total = await run_in_threadpool(
+            get_session_page_original, offset, limit, sort, order == "desc"
+        )
+        return {
+            "sessions": sessions,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "has_more": offset + len(sessions) < total,
+        }
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -91,7 +125,16 @@ async def save_session(
 ):
     """Save current chat session"""
     try:
-        filename = save_session_original(request.messages, request.name)
+        filename = await run_in_threadpool(
+            save_session_original, request.messages, request.name
+        )
+        if filename and request.name and request.name != filename:
+            # Old .json session rewritten under its .jsonl name
+            await semantic_index.remove(session_prefix(request.name))
+        if filename:
+            semantic_index.schedule(
+                session_prefix(filename), session_items(filename, request.messages)
+            )
 
         return {
             "success": True,
@@ -106,11 +149,160 @@ async def save_session(
         )
 
 
+def parse_date(value: Optional[str], field: str) -> Optional[float]:
+    """ISO date or datetime query parameter as a timestamp"""
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{field} must be an ISO date (YYYY-MM-DD)",
+        )
+
+
+@router.get("/sessions/search")
+async def search_sessions(
+    q: str,
+    source: Optional[str] = None,
+    model: Optional[str] = None,
+    role: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = SEARCH_PAGE_SIZE,
+    offset: int = 0,
+    current_user: Dict = Depends(get_current_user),
+):
+    """
+    Full-text search over saved sessions and dialogues
+
+    All words of q must match (append * for a prefix match). Results are
+    ranked by bm25 and carry a snippet with matches in [brackets].
+    source is "session" or "dialogue"; since/until filter by date.
+    """
+    if message_search is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search index is unavailable",
+        )
+    if source not in (None, "session", "dialogue"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="source must be 'session' or 'dialogue'",
+        )
+    if offset < 0 or not 1 <= limit <= 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="offset must be >= 0 and limit between 1 and 100",
+        )
+    since_ts = parse_date(since, "since")
+    until_ts = parse_date(until, "until")
+
+    # Sessions saved outside the API (Streamlit, copied files) are picked up first
+    await run_in_threadpool(session_catalog.refresh)
+    started = time.perf_counter()
+    hits = await run_in_threadpool(
+        message_search.search,
+        q,
+        source,
+        model,
+        role,
+        since_ts,
+        until_ts,
+        limit + 1,
+        offset,
+    )
+    return {
+        "query": q,
+        "results": [
+            {
+                **hit,
+                "created": datetime.fromtimestamp(hit["created"]).isoformat()
+                if hit["created"] is not None
+                else None,
+                "score": round(-hit["score"], 4),
+            }
+            for hit in hits[:limit]
+        ],
+        "has_more": len(hits) > limit,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+@router.get("/sessions/semantic-search")
+async def semantic_search_sessions(
+    q: str, k: int = 10, current_user: Dict = Depends(get_current_user)
+):
+    """Find saved-session messages similar in meaning to q"""
+    if not semantic_index.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Semantic index is disabled",
+        )
+    hits = await semantic_index.search(q, k, prefix="session:")
+    return {
+        "query": q,
+        "results": [
+            {
+                "filename": meta["filename"],
+                "index": meta["index"],
+                "role": meta["role"],
+                "preview": meta["preview"],
+                "score": round(score, 4),
+            }
+            for _, score, meta in hits
+        ],
+        "index": semantic_index.stats(),
+    }
+
+
+@router.post("/sessions/semantic-index")
+async def reindex_sessions(current_user: Dict = Depends(get_current_user)):
+    """Embed all saved sessions (including ones saved outside the API)"""
+    if not semantic_index.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Semantic index is disabled",
+        )
+    session_files = await run_in_threadpool(get_session_list_original)
+    for filename in session_files:
+        try:
+            messages = await run_in_threadpool(load_session_original, filename)
+        except Exception:
+            continue
+        semantic_index.schedule(
+            session_prefix(filename), session_items(filename, messages)
+        )
+    return {"success": True, "scheduled": len(session_files)}
+
+
+@router.post("/sessions/catalog/rebuild")
+async def rebuild_session_catalog(current_user: Dict = Depends(get_current_user)):
+    """Rebuild the session catalogue from the files on disk"""
+    if session_catalog is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Session catalogue is unavailable",
+        )
+    updated = await run_in_threadpool(session_catalog.rebuild)
+    return {"success": True, "sessions": updated}
+
+
 @router.get("/sessions/{filename}")
-async def load_session(filename: str, current_user: Dict = Depends(get_current_user)):
-    """Load saved chat session"""
+async def load_session(
+    filename: str,
+    tail: Optional[int] = None,
+    current_user: Dict = Depends(get_current_user),
+):
+    """Load saved chat session (only the last `tail` messages if given)"""
     try:
-        messages = load_session_original(filename)
+        if tail is not None:
+            messages = await run_in_threadpool(
+                load_session_tail_original, filename, tail
+            )
+        else:
+            messages = await run_in_threadpool(load_session_original, filename)
 
         return {
             "success": True,
@@ -134,7 +326,8 @@ async def load_session(filename: str, current_user: Dict = Depends(get_current_u
 async def delete_session(filename: str, current_user: Dict = Depends(get_current_user)):
     """Delete saved chat session"""
     try:
-        delete_session_original(filename)
+        await run_in_threadpool(delete_session_original, filename)
+        await semantic_index.remove(session_prefix(filename))
 
         return {
             "success": True,
@@ -159,33 +352,25 @@ async def get_session_info(
 ):
     """Get information about a saved session"""
     try:
-        messages = load_session_original(filename)
-
-        # Extract session name from filename
-        if "__" in filename:
-            name = filename.split("__")[1].replace(".json", "")
-        else:
-            name = filename.replace(".json", "")
-
-        # Count messages by role
-        user_messages = sum(1 for m in messages if m.get("role") == "user")
-        assistant_messages = sum(1 for m in messages if m.get("role") == "assistant")
-
-        return {
-            "filename": filename,
-            "name": name,
-            "total_messages": len(messages),
-            "user_messages": user_messages,
-            "assistant_messages": assistant_messages,
-            "system_messages": len(messages) - user_messages - assistant_messages,
-        }
-    except FileNotFoundError:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Session '{filename}' not found",
-        )
+        info = await run_in_threadpool(get_session_info_original, filename)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get session info: {str(e)}",
         )
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Session '{filename}' not found",
+        )
+    return {
+        "filename": filename,
+        "name": info["name"],
+        "created": info["created"],
+        "size": info["size"],
+        "preview": info["preview"],
+        "total_messages": info["message_count"],
+        "user_messages": info["user_messages"],
+        "assistant_messages": info["assistant_messages"],
+        "system_messages": info["system_messages"],
+    }
@@ -0,0 +1,349 @@
+"""
+Response caches: bounded in-memory LRU + TTL, and a persistent SQLite backend
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import (
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_SWEEP_INTERVAL,
+    RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_COMPRESS_MIN_BYTES,
+    RESPONSE_CACHE_TOUCH_INTERVAL,
+    RESPONSE_CACHE_DB,
+)
+from .db import Database
+
+# Rough per-entry bookkeeping overhead (key, tuple, OrderedDict node)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def make_cache_key(
+    model: str,
+    messages: List[Dict[str, Any]],
+    options: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Compact cache key: SHA-256 digest of the canonical model + messages
+
+    Explicit generation options are part of the key (automatically sized
+    options are not, they do not change the answer's meaning).
+    """
+    key_data = [model, messages]
+    options = {k: v for k, v in (options or {}).items() if v is not None}
+    if options:
+        key_data.append(options)
+    canonical = json.dumps(
+        key_data, sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    In-memory LRU cache bounded by entry count and total bytes
+
+    Expired entries are dropped lazily on access and by periodic sweeps
+    (see sweep() and run_periodic_sweep()).
+    """
+
+    # Calls are cheap enough to make on the event loop
+    blocking = False
+
+    def __init__(
+        self,
+        ttl: float = RESPONSE_CACHE_TTL,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        sweep_interval: float = RESPONSE_CACHE_SWEEP_INTERVAL,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+
+        # key -> (expires_at, size, value), least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Get value for key, or None if missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, _, value = entry
+            if expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str):
+        """Store value, evicting least recently used entries to stay in bounds"""
+        size = len(key) + len(value.encode("utf-8")) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (now + self.ttl, size, value)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+        if now - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+
+    def sweep(self) -> int:
+        """Drop all expired entries, returns number removed"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                k
+                for k, (expires_at, _, _) in self._entries.items()
+                if expires_at <= now
+            ]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+            self._last_sweep = now
+        return len(expired)
+
+    def clear(self):
+        """Remove all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _remove(self, key: str):
+        """Remove entry and update byte count (caller holds the lock)"""
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+SQLITE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    compressed INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+class SQLiteResponseCache:
+    """
+    Persistent response cache shared by all worker processes
+
+    Same interface as ResponseCache. Entries live in a WAL-mode SQLite
+    database, so they survive restarts and every uvicorn worker sees the
+    others' writes. Expiry uses wall-clock time to stay consistent across
+    processes. Values larger than RESPONSE_CACHE_COMPRESS_MIN_BYTES are
+    stored zlib-compressed. Hit/miss counters are per process.
+
+    Calls do disk I/O, so async callers run them in a thread (see
+    blocking). accessed_at only drives LRU eviction, so a hit rewrites it
+    at most every touch_interval seconds instead of on every read.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: Path = RESPONSE_CACHE_DB,
+        ttl: float = RESPONSE_CACHE_TTL,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        sweep_interval: float = RESPONSE_CACHE_SWEEP_INTERVAL,
+        compress_min_bytes: int = RESPONSE_CACHE_COMPRESS_MIN_BYTES,
+        touch_interval: float = RESPONSE_CACHE_TOUCH_INTERVAL,
+    ):
+        self.db = Database(path, SQLITE_CACHE_SCHEMA)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.compress_min_bytes = compress_min_bytes
+        self.touch_interval = touch_interval
+        self._last_sweep = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Get value for key, or None if missing or expired"""
+        now = time.time()
+        row = self.db.execute(
+            "SELECT value, compressed, expires_at, accessed_at "
+            "FROM responses WHERE key = ?",
+            (key,),
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        if row["expires_at"] <= now:
+            self.db.execute(
+                "DELETE FROM responses WHERE key = ? AND expires_at <= ?", (key, now)
+            )
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        if now - row["accessed_at"] >= self.touch_interval:
+            self.db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        self.hits += 1
+        value = row["value"]
+        if row["compressed"]:
+            value = zlib.decompress(value)
+        return value.decode("utf-8")
+
+    def set(self, key: str, value: str):
+        """Store value (compressed if large)"""
+        data = value.encode("utf-8")
+        compressed = len(data) > self.compress_min_bytes
+        if compressed:
+            data = zlib.compress(data)
+        if len(data) > self.max_bytes:
+            return
+
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO responses "
+            "(key, value, compressed, size, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, data, int(compressed), len(data), now + self.ttl, now),
+        )
+
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+
+    def sweep(self) -> int:
+        """Drop expired entries, then least recently used ones beyond the bounds"""
+        self._last_sweep = time.monotonic()
+        with self.db.transaction() as conn:
+            expired = conn.execute(
+                "DELETE FROM responses WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+            self.expirations += expired
+
+            entries, total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                return expired
+
+            # Walk from least recently used until both bounds are satisfied
+            evict = []
+            for row in conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at"
+            ):
+                if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                    break
+                evict.append((row["key"],))
+                entries -= 1
+                total_bytes -= row["size"]
+
+            conn.executemany("DELETE FROM responses WHERE key = ?", evict)
+            self.evictions += len(evict)
+        return expired
+
+    def clear(self):
+        """Remove all entries (counters are kept)"""
+        self.db.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters and current size"""
+        entries, total_bytes = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "path": str(self.db.path),
+            "entries": entries,
+            "bytes": total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def create_response_cache(backend: str = RESPONSE_CACHE_BACKEND):
+    """Create response cache for configured backend ("memory" or "sqlite")"""
+    if backend == "sqlite":
+        return SQLiteResponseCache()
+    return ResponseCache()
+
+
+async def run_periodic_sweep(cache):
+    """Background task that sweeps expired entries every sweep_interval seconds"""
+    while True:
+        await asyncio.sleep(cache.sweep_interval)
+        if cache.blocking:
+            await asyncio.to_thread(cache.sweep)
+        else:
+            cache.sweep()
@@ -18,6 +18,7 @@ try:
         DEFAULT_MODEL_SOURCE,
         SETTINGS_FILE,
         SESSIONS_DIR,
+        RSS_FEEDS,
     )
 except ImportError:
     # Fallback values if original config.py is not available
@@ -26,6 +27,7 @@ except ImportError:
     DEFAULT_MODEL_SOURCE = "Ollama (11434)"
     SETTINGS_FILE = Path(__file__).parent.parent.parent / ".settings.json"
     SESSIONS_DIR = Path(__file__).parent.parent.parent / "sessions"
+    RSS_FEEDS = {}
 
 # FastAPI settings
 API_V1_PREFIX = "/api/v1"
@@ -47,9 +49,119 @@ OLLAMA_HOSTS = {
     "Ollama (11434)": "http://localhost:11434",
     "Kiklop (11435)": "http://localhost:11435",
 }
+DEFAULT_OLLAMA_SOURCE = "Ollama (11434)"
+
+# Ollama HTTP client pool (one keep-alive pool per host)
+OLLAMA_CONNECT_TIMEOUT = 5.0  # seconds
+OLLAMA_READ_TIMEOUT = 30 * 60.0  # matches OLLAMA_REQUEST_TIMEOUT=30m on the server
+OLLAMA_MAX_CONNECTIONS = 32
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = 8
+OLLAMA_KEEPALIVE_EXPIRY = 60.0  # seconds
+
+# Admission control in front of Ollama (mirrors the server's
+# OLLAMA_NUM_PARALLEL / OLLAMA_MAX_LOADED_MODELS, see OPTIMIZATION_RESULTS.md)
+SCHEDULER_MAX_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+SCHEDULER_MAX_PER_MODEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+SCHEDULER_MAX_LOADED_MODELS = int(os.getenv("OLLAMA_MAX_LOADED_MODELS", "2"))
+SCHEDULER_MAX_QUEUE = 32  # waiting requests per source before 429
+SCHEDULER_MAX_BYPASS_WAIT = 30.0  # seconds a cold request may be overtaken by warm ones
+SCHEDULER_POSITION_INTERVAL = 1.0  # seconds between SSE queue position updates
+
+# Generation defaults and context-window sizing
+DEFAULT_TEMPERATURE = 0.7
+NUM_CTX_BUCKETS = [1024, 2048, 4096, 8192, 16384, 32768]
+NUM_CTX_REPLY_RESERVE = 512  # tokens left for the reply when num_predict is unset
+CHARS_PER_TOKEN = 3.5  # conservative estimate for mixed Serbian/English text
+TOKENS_PER_MESSAGE = 4  # chat template overhead per message
+
+# Conversation history window
+HISTORY_TOKEN_BUDGET = 3072  # default prompt budget for history + new message
+HISTORY_MODEL_BUDGETS = {}  # per-model overrides, e.g. {"qwen3:14b": 6144}
+HISTORY_SUMMARY_MAX_TOKENS = 256  # num_predict for summary generation
+HISTORY_SUMMARY_SLACK = 0.25  # summarise this much extra so it runs every few turns
+HISTORY_SUMMARY_CACHE_SIZE = 256  # sessions whose rolling summary is kept
+HISTORY_PAGE_SIZE = 50  # messages returned by GET /api/chat/history by default
+HISTORY_MAX_PAGE_SIZE = 500
+
+# Document retrieval (RAG)
+RAG_CHUNK_WORDS = 200  # words per chunk
+RAG_CHUNK_OVERLAP = 40  # words shared by consecutive chunks
+RAG_TOP_K = 5  # chunks put into the prompt
+RAG_CONTEXT_TOKENS = 2048  # upper bound for retrieved context in the prompt
+RAG_MIN_WORDS = 1500  # shorter documents are sent whole
+RAG_MAX_DOCUMENTS = 64  # indexed documents kept in memory
+
+# Semantic (embedding) index over document chunks and saved sessions
+SEMANTIC_INDEX_ENABLED = os.getenv("SEMANTIC_INDEX", "1") == "1"
+EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
+EMBED_SOURCE = "Ollama (11434)"
+EMBED_BATCH_SIZE = 32  # texts per /api/embed request
+EMBED_MAX_CHARS = 4000  # longer texts are truncated before embedding
+
+# Web-grounded enhancement of uncertain answers
+ENHANCE_SEARCH_RESULTS = 3  # web results added to the grounded prompt
+
+# Phrases that mark an unsure answer, per language (matched case-insensitively)
+UNCERTAINTY_PHRASES = {
+    "sr": [
+        "nemam dovoljno informacija",
+        "nije mi poznato",
+        "ne mogu da potvrdim",
+        "ne znam tačno",
+        "nije mi poznat",
+        "ne mogu da pronađem",
+        "nemam informaciju",
+        "nije dostupno",
+        "nije poznato",
+        "nemam podatak",
+    ],
+    "en": [
+        "i don't have enough information",
+        "i do not have enough information",
+        "i'm not sure",
+        "i am not sure",
+        "i don't know",
+        "i cannot confirm",
+        "i can't confirm",
+        "i couldn't find",
+        "as of my knowledge cutoff",
+        "i don't have access to real-time",
+    ],
+}
+# Languages whose phrases are active (comma-separated codes)
+UNCERTAINTY_LANGUAGES = os.getenv("UNCERTAINTY_LANGUAGES", "sr").split(",")
+
+# News aggregation (/api/agents/news), default feeds are RSS_FEEDS
+# JSON object {"name": "url"} merged over the defaults (empty url removes a feed)
+NEWS_FEEDS_FILE = os.getenv("NEWS_FEEDS_FILE")
+NEWS_ARTICLES_PER_FEED = 3
+NEWS_REFRESH_INTERVAL = 600  # seconds between background refreshes
+NEWS_REFRESH_ENABLED = os.getenv("NEWS_REFRESH", "1") == "1"
+NEWS_FETCH_TIMEOUT = 10.0
+
+# Model residency tracking and warm-up
+RESIDENCY_POLL_INTERVAL = 10.0  # seconds between /api/ps polls
+RESIDENCY_EVENT_HISTORY = 200  # load/unload events kept per source
+MODEL_KEEP_ALIVE = "30m"  # keep_alive sent with warm-up requests
+MODEL_PREWARM_ENABLED = os.getenv("MODEL_PREWARM", "0") == "1"
+MODEL_PREWARM_WINDOW = 30 * 60  # pre-warm models used in the last N seconds
+MODEL_PREWARM_MAX = SCHEDULER_MAX_LOADED_MODELS
+
+# SSE streaming settings
+SSE_COALESCE_MAX_BYTES = 256  # flush a frame once this many bytes are buffered
+SSE_COALESCE_MAX_DELAY = 0.05  # ...or once the oldest buffered chunk is this old (s)
+SSE_QUEUE_SIZE = 64  # chunks buffered from Ollama before reads are paused
 
 # Cache settings
 RESPONSE_CACHE_TTL = 300  # 5 minutes in seconds
+RESPONSE_CACHE_MAX_ENTRIES = 512
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64MB
+RESPONSE_CACHE_SWEEP_INTERVAL = 60  # seconds between expired-entry sweeps
+# "memory" (per process) or "sqlite" (persistent, shared by all workers)
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_COMPRESS_MIN_BYTES = 1024  # zlib-compress values larger than this
+# SQLite backend: a hit only rewrites accessed_at when it is older than this
+RESPONSE_CACHE_TOUCH_INTERVAL = 30  # seconds
 MODEL_LIST_CACHE_TTL = 300  # 5 minutes
 
 # Upload settings
@@ -61,6 +173,17 @@ ALLOWED_DOCUMENT_TYPES = [
     "application/epub+zip",
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
 ]
+# Extensions accepted when the browser sends a generic MIME type
+ALLOWED_DOCUMENT_EXTENSIONS = [".pdf", ".txt", ".md", ".epub", ".docx"]
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # uploads are spooled to disk in chunks of this size
+UPLOAD_FORM_OVERHEAD = 64 * 1024  # multipart headers/boundaries allowed on top
+DOCUMENT_CACHE_MAX_BYTES = 512 * 1024 * 1024  # compressed extracted text on disk
+
+# Dialogue settings
+DIALOGUE_TTL = 24 * 3600  # unfinished dialogues idle this long are deleted
+DIALOGUE_COMPLETED_TTL = 30 * 24 * 3600  # completed dialogues are kept this long
+DIALOGUE_CLEANUP_INTERVAL = 3600  # seconds between cleanup runs
+DIALOGUE_PAGE_SIZE = 50
 
 # PWA settings
 PWA_MANIFEST_URL = "/manifest.json"
@@ -70,6 +193,17 @@ PWA_SERVICE_WORKER_URL = "/service-worker.js"
 FRONTEND_DIR = Path(__file__).parent.parent.parent / "frontend"
 STATIC_DIR = Path(__file__).parent.parent / "static"
 
+# Local persistent data (SQLite databases, caches)
+DATA_DIR = Path(
+    os.getenv("OLLAMA_CORE_DATA_DIR", Path(__file__).parent.parent.parent / ".data")
+)
+RESPONSE_CACHE_DB = DATA_DIR / "response_cache.sqlite3"
+VECTOR_INDEX_DIR = DATA_DIR / "vectors"
+DOCUMENT_CACHE_DIR = DATA_DIR / "documents"
+CHAT_HISTORY_DB = DATA_DIR / "chat_history.sqlite3"
+DIALOGUE_DB = DATA_DIR / "dialogues.sqlite3"
+SQLITE_BUSY_TIMEOUT = 10.0  # seconds to wait for another worker's write lock
+
 # Theme colors (dark mode default)
 THEME_COLORS = {
     "dark": {
@@ -97,3 +231,4 @@ THEME_COLORS = {
 # Create necessary directories
 STATIC_DIR.mkdir(exist_ok=True)
 SESSIONS_DIR.mkdir(exist_ok=True)
+DATA_DIR.mkdir(exist_ok=True)
@@ -0,0 +1,71 @@
+"""
+SQLite helpers shared by the persistent stores
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+
+from .config import SQLITE_BUSY_TIMEOUT
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """
+    Open a SQLite connection in WAL mode
+
+    WAL lets readers in other worker processes proceed while one process
+    writes; busy_timeout makes concurrent writers wait instead of failing.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT * 1000)}")
+    return conn
+
+
+class Database:
+    """Per-thread SQLite connections to one database file"""
+
+    def __init__(self, path: Path, schema: str = ""):
+        self.path = path
+        self.schema = schema
+        self._local = threading.local()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connection for the current thread (created and migrated on first use)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.path)
+            if self.schema:
+                conn.executescript(self.schema)
+            self._local.conn = conn
+        return conn
+
+    def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        """Execute a single statement"""
+        return self.conn.execute(sql, params)
+
+    def transaction(self):
+        """Context manager wrapping statements in BEGIN IMMEDIATE ... COMMIT"""
+        return _Transaction(self.conn)
+
+
+class _Transaction:
+    """Explicit write transaction (connections run in autocommit mode)"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
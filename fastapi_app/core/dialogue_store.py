@@ -0,0 +1,282 @@
+"""
+Persistent dialogue state (SQLite), shared by all workers
+"""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from .config import (
+    DIALOGUE_DB,
+    DIALOGUE_TTL,
+    DIALOGUE_COMPLETED_TTL,
+    DIALOGUE_CLEANUP_INTERVAL,
+)
+from .db import Database
+
+DIALOGUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dialogues (
+    dialogue_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    topic TEXT,
+    dialogue_type TEXT NOT NULL,
+    participant1 TEXT NOT NULL,
+    participant2 TEXT NOT NULL,
+    current_turn TEXT NOT NULL,
+    max_rounds INTEGER NOT NULL,
+    rounds_completed INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    context TEXT NOT NULL,
+    message_count INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dialogues_user ON dialogues (user_id, updated_at);
+CREATE INDEX IF NOT EXISTS dialogues_updated ON dialogues (completed, updated_at);
+CREATE TABLE IF NOT EXISTS dialogue_messages (
+    dialogue_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    model TEXT,
+    persona TEXT,
+    timestamp REAL NOT NULL,
+    PRIMARY KEY (dialogue_id, seq)
+) WITHOUT ROWID;
+"""
+
+# Columns stored as JSON text
+JSON_FIELDS = ("participant1", "participant2", "context")
+# Columns update() may change
+STATE_FIELDS = ("topic", "current_turn", "rounds_completed", "completed", "context")
+
+
+class DialogueConflictError(Exception):
+    """Raised when another request advanced the dialogue first"""
+
+
+def _encode(field: str, value: Any) -> Any:
+    if field in JSON_FIELDS:
+        return json.dumps(value, ensure_ascii=False)
+    if field == "completed":
+        return int(bool(value))
+    return value
+
+
+def _dialogue(row) -> Dict[str, Any]:
+    """Dialogue state from a dialogues row"""
+    dialogue = dict(row)
+    for field in JSON_FIELDS:
+        dialogue[field] = json.loads(dialogue[field])
+    dialogue["completed"] = bool(dialogue["completed"])
+    return dialogue
+
+
+class DialogueStore:
+    """
+    Dialogue state and messages that survive restarts
+
+    The state row holds participants, the turn pointer and round counters;
+    messages are keyed by (dialogue_id, seq), so appending a turn is one
+    insert plus one row update. Listing a user's dialogues uses the
+    (user_id, updated_at) index instead of scanning every dialogue.
+    """
+
+    def __init__(
+        self,
+        path: Path = DIALOGUE_DB,
+        ttl: float = DIALOGUE_TTL,
+        completed_ttl: float = DIALOGUE_COMPLETED_TTL,
+        cleanup_interval: float = DIALOGUE_CLEANUP_INTERVAL,
+    ):
+        self.db = Database(path, DIALOGUE_SCHEMA)
+        self.ttl = ttl
+        self.completed_ttl = completed_ttl
+        self.cleanup_interval = cleanup_interval
+
+    def create(
+        self,
+        dialogue_id: str,
+        user_id: str,
+        state: Dict[str, Any],
+        messages: List[Dict[str, Any]],
+    ):
+        """Store a new dialogue with its opening messages"""
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO dialogues (dialogue_id, user_id, topic, dialogue_type, "
+                "participant1, participant2, current_turn, max_rounds, "
+                "rounds_completed, completed, context, message_count, "
+                "created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    dialogue_id,
+                    user_id,
+                    state["topic"],
+                    state["dialogue_type"],
+                    _encode("participant1", state["participant1"]),
+                    _encode("participant2", state["participant2"]),
+                    state["current_turn"],
+                    state["max_rounds"],
+                    state.get("rounds_completed", 0),
+                    _encode("completed", state.get("completed", False)),
+                    _encode("context", state.get("context", {})),
+                    0,
+                    now,
+                    now,
+                ),
+            )
+            for message in messages:
+                self._append(conn, dialogue_id, message, now)
+
+    def get(self, dialogue_id: str) -> Optional[Dict[str, Any]]:
+        """Dialogue state with all messages, or None"""
+        row = self.db.execute(
+            "SELECT * FROM dialogues WHERE dialogue_id = ?", (dialogue_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        dialogue = _dialogue(row)
+        dialogue["messages"] = self.messages(dialogue_id)
+        return dialogue
+
+    def messages(self, dialogue_id: str) -> List[Dict[str, Any]]:
+        """Messages of a dialogue, oldest first"""
+        rows = self.db.execute(
+            "SELECT role, content, model, persona, timestamp FROM dialogue_messages "
+            "WHERE dialogue_id = ? ORDER BY seq",
+            (dialogue_id,),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def append(
+        self,
+        dialogue_id: str,
+        message: Dict[str, Any],
+        expected_rounds: Optional[int] = None,
+        **changes,
+    ) -> int:
+        """
+        Append a message and apply state changes in one transaction
+
+        With expected_rounds the append only succeeds if rounds_completed
+        still has that value, so two workers generating the same round
+        cannot both record it. Returns the new message count.
+        """
+        now = time.time()
+        with self.db.transaction() as conn:
+            if expected_rounds is not None:
+                row = conn.execute(
+                    "SELECT rounds_completed FROM dialogues WHERE dialogue_id = ?",
+                    (dialogue_id,),
+                ).fetchone()
+                if row is None or row["rounds_completed"] != expected_rounds:
+                    raise DialogueConflictError(dialogue_id)
+            count = self._append(conn, dialogue_id, message, now)
+            self._update(conn, dialogue_id, changes, now)
+        return count
+
+    def update(self, dialogue_id: str, **changes):
+        """Change state fields (see STATE_FIELDS)"""
+        with self.db.transaction() as conn:
+            self._update(conn, dialogue_id, changes, time.time())
+
+    def list_for_user(
+        self, user_id: str, limit: int, offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """A user's dialogues (without messages), most recently active first"""
+        rows = self.db.execute(
+            "SELECT * FROM dialogues WHERE user_id = ? "
+            "ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+            (user_id, limit, offset),
+        ).fetchall()
+        return [_dialogue(row) for row in rows]
+
+    def delete(self, dialogue_id: str) -> bool:
+        """Delete a dialogue; True if it existed"""
+        with self.db.transaction() as conn:
+            return self._delete(conn, [dialogue_id]) > 0
+
+    def cleanup(self) -> List[str]:
+        """Delete idle unfinished and old completed dialogues; returns their ids"""
+        now = time.time()
+        with self.db.transaction() as conn:
+            rows = conn.execute(
+                "SELECT dialogue_id FROM dialogues "
+                "WHERE (completed = 0 AND updated_at < ?) "
+                "OR (completed = 1 AND updated_at < ?)",
+                (now - self.ttl, now - self.completed_ttl),
+            ).fetchall()
+            expired = [row["dialogue_id"] for row in rows]
+            self._delete(conn, expired)
+        return expired
+
+    @staticmethod
+    def _append(conn, dialogue_id: str, message: Dict[str, Any], now: float) -> int:
+        row = conn.execute(
+            "SELECT message_count FROM dialogues WHERE dialogue_id = ?",
+            (dialogue_id,),
+        ).fetchone()
+        if row is None:
+            raise KeyError(dialogue_id)
+        seq = row["message_count"]
+        conn.execute(
+            "INSERT INTO dialogue_messages "
+            "(dialogue_id, seq, role, content, model, persona, timestamp) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                dialogue_id,
+                seq,
+                message["role"],
+                message["content"],
+                message.get("model"),
+                message.get("persona"),
+                message.get("timestamp", now),
+            ),
+        )
+        conn.execute(
+            "UPDATE dialogues SET message_count = ?, updated_at = ? "
+            "WHERE dialogue_id = ?",
+            (seq + 1, now, dialogue_id),
+        )
+        return seq + 1
+
+    @staticmethod
+    def _update(conn, dialogue_id: str, changes: Dict[str, Any], now: float):
+        unknown = set(changes) - set(STATE_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot update dialogue fields: {sorted(unknown)}")
+        assignments = [f"{field} = ?" for field in changes] + ["updated_at = ?"]
+        params = [_encode(field, value) for field, value in changes.items()]
+        conn.execute(
+            f"UPDATE dialogues SET {', '.join(assignments)} WHERE dialogue_id = ?",
+            (*params, now, dialogue_id),
+        )
+
+    @staticmethod
+    def _delete(conn, dialogue_ids: List[str]) -> int:
+        deleted = 0
+        for dialogue_id in dialogue_ids:
+            conn.execute(
+                "DELETE FROM dialogue_messages WHERE dialogue_id = ?", (dialogue_id,)
+            )
+            deleted += conn.execute(
+                "DELETE FROM dialogues WHERE dialogue_id = ?", (dialogue_id,)
+            ).rowcount
+        return deleted
+
+
+async def run_periodic_cleanup(store: DialogueStore, on_expired: Callable[[str], None]):
+    """Background task that deletes expired dialogues every cleanup_interval seconds"""
+    while True:
+        for dialogue_id in await run_in_threadpool(store.cleanup):
+            await run_in_threadpool(on_expired, dialogue_id)
+        await asyncio.sleep(store.cleanup_interval)
+
+
+dialogue_store = DialogueStore()
@@ -0,0 +1,138 @@
+"""
+Content-addressed cache of text extracted from uploaded documents
+"""
+
+import json
+import os
+import tempfile
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .config import DOCUMENT_CACHE_DIR, DOCUMENT_CACHE_MAX_BYTES
+
+# Bump when extraction changes so stale text is not served
+EXTRACTOR_VERSION = 2
+# Hex digits of SHA-256 kept for document ids (same as text-derived ids)
+DOCUMENT_ID_LENGTH = 32
+
+
+class DocumentCache:
+    """
+    Extracted text stored zlib-compressed on disk, one file per fingerprint
+
+    Reads touch the file's mtime, so eviction (oldest mtime first, once the
+    total size exceeds max_bytes) is least-recently-used. Files are written
+    atomically, so several workers can share the directory.
+    """
+
+    def __init__(
+        self,
+        directory: Path = DOCUMENT_CACHE_DIR,
+        max_bytes: int = DOCUMENT_CACHE_MAX_BYTES,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.v{EXTRACTOR_VERSION}.json.z"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached {"text", "name", "content_type"} for key"""
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(zlib.decompress(data))
+
+    def put(
+        self,
+        key: str,
+        text: str,
+        name: Optional[str] = None,
+        content_type: Optional[str] = None,
+    ):
+        """Store extracted text for key"""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = zlib.compress(
+            json.dumps(
+                {"text": text, "name": name, "content_type": content_type},
+                ensure_ascii=False,
+            ).encode("utf-8")
+        )
+
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            # Rewriting an existing key only changes the total by the difference
+            self._total_bytes = (
+                self._scan_total()
+                if self._total_bytes is None
+                else self._total_bytes + len(data) - replaced
+            )
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _files(self):
+        return [p for p in self.directory.glob("*/*.json.z") if p.is_file()]
+
+    def _scan_total(self) -> int:
+        return sum(p.stat().st_size for p in self._files())
+
+    def _evict(self):
+        """Remove least recently used files until under max_bytes (lock held)"""
+        entries = []
+        for path in self._files():
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        self._total_bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache statistics"""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total() if self.directory.exists() else 0
+            total = self._total_bytes
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+        }
+
+
+document_cache = DocumentCache()
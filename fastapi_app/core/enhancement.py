@@ -0,0 +1,86 @@
+"""
+Web-grounded answer enhancement, started speculatively while the answer streams
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .config import ENHANCE_SEARCH_RESULTS
+from .uncertainty import UncertaintyDetector
+
+SearchFunction = Callable[[str, int], Awaitable[List[Dict[str, Any]]]]
+
+
+class Enhancement:
+    """
+    Watches a response stream and runs the web search as soon as it looks uncertain
+
+    feed() each chunk as it arrives: the first uncertainty indicator starts
+    the search in the background, so its latency overlaps the rest of the
+    generation. results() then returns the usable search results (or None).
+    """
+
+    def __init__(
+        self,
+        query: str,
+        search: SearchFunction,
+        num_results: int = ENHANCE_SEARCH_RESULTS,
+    ):
+        self.query = query
+        self.search = search
+        self.num_results = num_results
+        self.triggered_at: Optional[int] = None  # response length when triggered
+        self.detector = UncertaintyDetector()
+        self._length = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def triggered(self) -> bool:
+        return self._task is not None
+
+    @property
+    def phrase(self) -> Optional[str]:
+        """Phrase that triggered the search"""
+        return self.detector.matches[0] if self.detector.matches else None
+
+    def feed(self, chunk: str) -> bool:
+        """Process a response chunk; True when this chunk triggered the search"""
+        self._length += len(chunk)
+        if self.triggered or not self.query:
+            return False
+        if not self.detector.feed(chunk):
+            return False
+        self.triggered_at = self._length
+        self._task = asyncio.create_task(self.search(self.query, self.num_results))
+        return True
+
+    async def results(self) -> Optional[List[Dict[str, Any]]]:
+        """Search results once the search finishes (None if not triggered or failed)"""
+        if self._task is None:
+            return None
+        try:
+            results = await self._task
+        except Exception:
+            return None
+        results = [r for r in results or [] if "error" not in r]
+        return results or None
+
+    def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+def grounded_messages(
+    messages: List[Dict[str, str]], query: str, results: List[Dict[str, Any]]
+) -> List[Dict[str, str]]:
+    """Prompt for the second, web-grounded answer"""
+    context = "\n".join(
+        f"{i + 1}. {r.get('title', '')}: {r.get('snippet', '')} ({r.get('link', '')})"
+        for i, r in enumerate(results)
+    )
+    return messages + [
+        {
+            "role": "user",
+            "content": f"{query}\n\nWeb search context:\n{context}",
+        }
+    ]
@@ -0,0 +1,108 @@
+"""
+Generation options and automatic context-window sizing shared by all entry points
+"""
+
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from .config import (
+    DEFAULT_TEMPERATURE,
+    NUM_CTX_BUCKETS,
+    NUM_CTX_REPLY_RESERVE,
+    CHARS_PER_TOKEN,
+    TOKENS_PER_MESSAGE,
+)
+
+
+class GenerationOptions(BaseModel):
+    """Per-request Ollama options; unset fields are chosen automatically"""
+
+    temperature: Optional[float] = None
+    top_p: Optional[float] = None
+    top_k: Optional[int] = None
+    repeat_penalty: Optional[float] = None
+    seed: Optional[int] = None
+    num_predict: Optional[int] = None
+    num_ctx: Optional[int] = None
+    num_thread: Optional[int] = None
+    stop: Optional[List[str]] = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for text (no tokenizer needed)"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    """Rough token count for a list of chat messages"""
+    return sum(
+        estimate_tokens(m.get("content", "")) + TOKENS_PER_MESSAGE for m in messages
+    )
+
+
+def pick_num_ctx(
+    prompt_tokens: int,
+    reply_tokens: int = NUM_CTX_REPLY_RESERVE,
+    current: Optional[int] = None,
+) -> int:
+    """
+    Smallest context bucket that fits prompt + reply
+
+    If the model is already loaded with a context (current) that fits, it
+    is reused: Ollama reloads the model whenever num_ctx changes, which
+    costs far more than the extra KV-cache.
+    """
+    needed = prompt_tokens + reply_tokens
+    if current and current >= needed:
+        return current
+    for bucket in NUM_CTX_BUCKETS:
+        if bucket >= needed:
+            return bucket
+    return NUM_CTX_BUCKETS[-1]
+
+
+def cpu_cores() -> int:
+    """CPU cores available to this process"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def pick_num_thread(concurrent_models: int = 1) -> int:
+    """Threads per model runner: host cores split between concurrently running models"""
+    return max(1, cpu_cores() // max(1, concurrent_models))
+
+
+def build_options(
+    messages: List[Dict[str, str]],
+    overrides: Optional[Dict[str, Any]] = None,
+    concurrent_models: int = 1,
+    runner: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Ollama options for messages: explicit overrides plus automatic num_ctx/num_thread
+
+    runner holds the options the model is currently loaded with (if it is
+    resident); they are reused where possible so requests do not force a
+    reload of the model.
+    """
+    runner = runner or {}
+    options: Dict[str, Any] = {"temperature": DEFAULT_TEMPERATURE}
+    options.update({k: v for k, v in (overrides or {}).items() if v is not None})
+
+    if "num_ctx" not in options:
+        options["num_ctx"] = pick_num_ctx(
+            estimate_prompt_tokens(messages),
+            options.get("num_predict") or NUM_CTX_REPLY_RESERVE,
+            runner.get("num_ctx"),
+        )
+    if "num_thread" not in options:
+        options["num_thread"] = runner.get("num_thread") or pick_num_thread(
+            concurrent_models
+        )
+
+    return options
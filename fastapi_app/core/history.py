@@ -0,0 +1,302 @@
+"""
+Token-budgeted conversation history with incremental rolling summaries
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .config import (
+    HISTORY_TOKEN_BUDGET,
+    HISTORY_MODEL_BUDGETS,
+    HISTORY_SUMMARY_MAX_TOKENS,
+    HISTORY_SUMMARY_SLACK,
+    HISTORY_SUMMARY_CACHE_SIZE,
+)
+from .generation import estimate_prompt_tokens
+from .ollama_client import chat_with_model
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation. Update the existing "
+    "summary with the new turns. Keep facts, names, numbers, decisions and "
+    "open questions; drop small talk. Answer with the updated summary only, "
+    "in the language of the conversation."
+)
+
+
+def history_budget(model: str) -> int:
+    """Prompt token budget for model"""
+    return HISTORY_MODEL_BUDGETS.get(model, HISTORY_TOKEN_BUDGET)
+
+
+def summary_prompt(
+    previous: Optional[str], turns: List[Dict[str, Any]]
+) -> List[Dict[str, str]]:
+    """Messages asking a model to fold turns into the previous summary"""
+    transcript = "\n\n".join(f"{m['role'].upper()}: {m['content']}" for m in turns)
+    return [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+        {
+            "role": "user",
+            "content": f"Existing summary:\n{previous or '(none)'}\n\nNew turns:\n{transcript}",
+        },
+    ]
+
+
+class HistoryPlan:
+    """Result of fitting a history into a budget, before summarisation"""
+
+    def __init__(self, pinned, recent, pending, split, summary):
+        self.pinned = pinned  # leading system messages, always kept
+        self.recent = recent  # newest turns that fit the budget verbatim
+        self.pending = pending  # turns that must be folded into the summary
+        self.split = split  # turn index where recent starts
+        self.summary = summary  # summary of turns before pending
+
+
+class HistoryManager:
+    """
+    Packs the most recent turns into a token budget
+
+    Older turns are replaced by a rolling summary kept per session. The
+    summary remembers how many turns it covers, so each call only
+    summarises the turns that newly fell out of the window (O(new tokens)).
+    The window is moved HISTORY_SUMMARY_SLACK further than strictly
+    needed, so a summary is produced every few turns instead of every turn.
+
+    Callers that load history from storage can ask resume_point() which
+    turns the summary already covers and pass only the pinned messages and
+    the turns after them, with offset set to the number of turns left out.
+    """
+
+    def __init__(self, max_sessions: int = HISTORY_SUMMARY_CACHE_SIZE):
+        self.max_sessions = max_sessions
+        # key -> (pinned count, covered turn count, fingerprint, summary)
+        self._summaries: "OrderedDict[str, Tuple[int, int, str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resume_point(self, key: str) -> Tuple[int, int]:
+        """
+        (pinned message count, turns that may be left out) for a session
+
+        The last covered turn is not left out, so the cached summary can
+        still be checked against the history.
+        """
+        with self._lock:
+            entry = self._summaries.get(key)
+        if entry is None:
+            return 0, 0
+        pinned, covered, _, _ = entry
+        return pinned, covered - 1
+
+    def plan(
+        self,
+        key: str,
+        messages: List[Dict[str, Any]],
+        budget: int,
+        offset: int = 0,
+    ) -> HistoryPlan:
+        """
+        Decide which turns are kept verbatim and which need summarising
+
+        messages holds the pinned messages followed by the turns from turn
+        index offset on (see resume_point()).
+        """
+        pinned_count = 0
+        while (
+            pinned_count < len(messages) and messages[pinned_count]["role"] == "system"
+        ):
+            pinned_count += 1
+        pinned = messages[:pinned_count]
+        turns = messages[pinned_count:]
+
+        available = budget - estimate_prompt_tokens(pinned)
+        covered, summary = self._cached(key, turns, offset)
+        if summary:
+            available -= estimate_prompt_tokens([{"content": summary}])
+
+        # Indexes into the loaded turns from here on
+        covered -= offset
+        if estimate_prompt_tokens(turns[covered:]) <= available:
+            return HistoryPlan(pinned, turns[covered:], [], offset + covered, summary)
+
+        # Newest turns that fit in the budget, leaving slack so the next few
+        # turns fit without another summary
+        target = int(available * (1 - HISTORY_SUMMARY_SLACK))
+        split = len(turns)
+        used = 0
+        while split > covered:
+            cost = estimate_prompt_tokens([turns[split - 1]])
+            if used + cost > target and split < len(turns):
+                break
+            used += cost
+            split -= 1
+
+        return HistoryPlan(
+            pinned, turns[split:], turns[covered:split], offset + split, summary
+        )
+
+    def commit(
+        self,
+        key: str,
+        turns_before_recent: List[Dict[str, Any]],
+        summary: str,
+        offset: int = 0,
+        pinned: int = 0,
+    ):
+        """Store summary covering offset left-out turns plus turns_before_recent"""
+        with self._lock:
+            self._summaries[key] = (
+                pinned,
+                offset + len(turns_before_recent),
+                _fingerprint(turns_before_recent, offset),
+                summary,
+            )
+            self._summaries.move_to_end(key)
+            while len(self._summaries) > self.max_sessions:
+                self._summaries.popitem(last=False)
+
+    def forget(self, key: str):
+        """Drop cached summary for a session"""
+        with self._lock:
+            self._summaries.pop(key, None)
+
+    async def pack(
+        self,
+        key: str,
+        messages: List[Dict[str, Any]],
+        budget: int,
+        summarize: Callable[[Optional[str], List[Dict[str, Any]]], Awaitable[str]],
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Fit messages into budget, summarising older turns with an async summarizer"""
+        plan = self.plan(key, messages, budget, offset)
+        if plan.pending:
+            try:
+                summary = await summarize(plan.summary, plan.pending)
+            except Exception:
+                summary = plan.summary
+            else:
+                self._commit_plan(key, messages, plan, summary, offset)
+            plan.summary = summary
+        return self.assemble(plan)
+
+    def pack_sync(
+        self,
+        key: str,
+        messages: List[Dict[str, Any]],
+        budget: int,
+        summarize: Callable[[Optional[str], List[Dict[str, Any]]], str],
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Same as pack() for synchronous callers (Streamlit)"""
+        plan = self.plan(key, messages, budget, offset)
+        if plan.pending:
+            try:
+                summary = summarize(plan.summary, plan.pending)
+            except Exception:
+                summary = plan.summary
+            else:
+                self._commit_plan(key, messages, plan, summary, offset)
+            plan.summary = summary
+        return self.assemble(plan)
+
+    @staticmethod
+    def assemble(plan: HistoryPlan) -> List[Dict[str, Any]]:
+        """Pinned system messages + summary + recent turns"""
+        packed = list(plan.pinned)
+        if plan.summary:
+            packed.append(
+                {
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation:\n{plan.summary}",
+                }
+            )
+        packed.extend(plan.recent)
+        return packed
+
+    def _commit_plan(
+        self,
+        key: str,
+        messages: List[Dict[str, Any]],
+        plan: HistoryPlan,
+        summary: str,
+        offset: int,
+    ):
+        """Store summary covering the turns before plan's recent ones"""
+        turns = self._turns(messages)
+        self.commit(
+            key,
+            turns[: plan.split - offset],
+            summary,
+            offset=offset,
+            pinned=len(messages) - len(turns),
+        )
+
+    def _cached(
+        self, key: str, turns: List[Dict[str, Any]], offset: int = 0
+    ) -> Tuple[int, Optional[str]]:
+        """
+        Cached (covered, summary) if it still matches the history's prefix
+
+        turns start at turn index offset; without a usable summary the
+        left-out turns are simply dropped (covered = offset).
+        """
+        with self._lock:
+            entry = self._summaries.get(key)
+        if entry is None:
+            return offset, None
+        _, covered, fingerprint, summary = entry
+        loaded = covered - offset
+        if (
+            loaded < 1
+            or loaded > len(turns)
+            or _fingerprint(turns[:loaded], offset) != fingerprint
+        ):
+            # History was edited or replaced; start over
+            self.forget(key)
+            return offset, None
+        return covered, summary
+
+    @staticmethod
+    def _turns(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Messages after the leading system messages"""
+        index = 0
+        while index < len(messages) and messages[index]["role"] == "system":
+            index += 1
+        return messages[index:]
+
+
+def _fingerprint(turns: List[Dict[str, Any]], offset: int = 0) -> str:
+    """
+    Cheap identity of a covered prefix: count plus digest of its last turn
+
+    turns are the covered turns from turn index offset on.
+    """
+    if not turns:
+        return ""
+    last = turns[-1]
+    digest = hashlib.sha1(f"{last['role']}\0{last['content']}".encode("utf-8"))
+    return f"{offset + len(turns)}:{digest.hexdigest()}"
+
+
+def model_summarizer(model: str, source: str, pool=None):
+    """Async summarizer that uses model itself to update a rolling summary"""
+
+    async def summarize(previous: Optional[str], turns: List[Dict[str, Any]]) -> str:
+        chunks = []
+        async for chunk in chat_with_model(
+            model,
+            summary_prompt(previous, turns),
+            source,
+            pool=pool,
+            options={"num_predict": HISTORY_SUMMARY_MAX_TOKENS, "temperature": 0.2},
+        ):
+            chunks.append(chunk)
+        return "".join(chunks).strip()
+
+    return summarize
+
+
+history_manager = HistoryManager()
@@ -0,0 +1,150 @@
+"""
+Persistent chat history (SQLite, append-only, paginated)
+"""
+
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import CHAT_HISTORY_DB
+from .db import Database
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    session_key TEXT PRIMARY KEY,
+    message_count INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chat_messages (
+    session_key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    model_name TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session_key, seq)
+) WITHOUT ROWID;
+"""
+
+
+def _message(row) -> Dict[str, Any]:
+    """API representation of a chat_messages row"""
+    return {
+        "seq": row["seq"],
+        "role": row["role"],
+        "content": row["content"],
+        "model_name": row["model_name"],
+        "created_at": row["created_at"],
+    }
+
+
+class ChatHistoryStore:
+    """
+    Chat messages per session, shared by all worker processes
+
+    Messages are keyed by (session_key, seq), so a page of the newest
+    messages is a single range scan of the primary key regardless of how
+    long the session is. Appends only insert; the per-session message
+    count is kept in chat_sessions so it never needs a COUNT(*).
+    """
+
+    def __init__(self, path: Path = CHAT_HISTORY_DB):
+        self.db = Database(path, HISTORY_SCHEMA)
+
+    def append(
+        self,
+        session_key: str,
+        role: str,
+        content: str,
+        model_name: Optional[str] = None,
+    ) -> int:
+        """Append a message and return the session's new message count"""
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT message_count FROM chat_sessions WHERE session_key = ?",
+                (session_key,),
+            ).fetchone()
+            seq = row["message_count"] if row else 0
+            conn.execute(
+                "INSERT INTO chat_messages "
+                "(session_key, seq, role, content, model_name, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (session_key, seq, role, content, model_name, now),
+            )
+            if row:
+                conn.execute(
+                    "UPDATE chat_sessions SET message_count = ?, updated_at = ? "
+                    "WHERE session_key = ?",
+                    (seq + 1, now, session_key),
+                )
+            else:
+                conn.execute(
+                    "INSERT INTO chat_sessions "
+                    "(session_key, message_count, created_at, updated_at) "
+                    "VALUES (?, 1, ?, ?)",
+                    (session_key, now, now),
+                )
+        return seq + 1
+
+    def count(self, session_key: str) -> int:
+        """Number of messages in a session"""
+        row = self.db.execute(
+            "SELECT message_count FROM chat_sessions WHERE session_key = ?",
+            (session_key,),
+        ).fetchone()
+        return row["message_count"] if row else 0
+
+    def page(
+        self, session_key: str, limit: int, before: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Up to limit messages older than seq `before` (newest if None),
+        returned oldest first
+        """
+        if before is None:
+            rows = self.db.execute(
+                "SELECT * FROM chat_messages WHERE session_key = ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (session_key, limit),
+            ).fetchall()
+        else:
+            rows = self.db.execute(
+                "SELECT * FROM chat_messages WHERE session_key = ? AND seq < ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (session_key, before, limit),
+            ).fetchall()
+        return [_message(row) for row in reversed(rows)]
+
+    def messages(
+        self, session_key: str, start: int = 0, end: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Messages with start <= seq < end (whole session by default), oldest first"""
+        if end is None:
+            rows = self.db.execute(
+                "SELECT * FROM chat_messages WHERE session_key = ? AND seq >= ? "
+                "ORDER BY seq",
+                (session_key, start),
+            ).fetchall()
+        else:
+            rows = self.db.execute(
+                "SELECT * FROM chat_messages "
+                "WHERE session_key = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (session_key, start, end),
+            ).fetchall()
+        return [_message(row) for row in rows]
+
+    def clear(self, session_key: str) -> bool:
+        """Delete a session; True if it existed"""
+        with self.db.transaction() as conn:
+            conn.execute(
+                "DELETE FROM chat_messages WHERE session_key = ?", (session_key,)
+            )
+            deleted = conn.execute(
+                "DELETE FROM chat_sessions WHERE session_key = ?", (session_key,)
+            ).rowcount
+        return deleted > 0
+
+
+history_store = ChatHistoryStore()
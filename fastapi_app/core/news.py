@@ -0,0 +1,161 @@
+"""
+News aggregation: concurrent conditional feed fetches, in-memory snapshot, background refresh
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from .config import (
+    RSS_FEEDS,
+    NEWS_FEEDS_FILE,
+    NEWS_ARTICLES_PER_FEED,
+    NEWS_REFRESH_INTERVAL,
+    NEWS_FETCH_TIMEOUT,
+)
+from fetch import fetch
+
+
+def configured_feeds() -> Dict[str, str]:
+    """Default feeds merged with NEWS_FEEDS_FILE (an empty url removes a feed)"""
+    feeds = dict(RSS_FEEDS)
+    if NEWS_FEEDS_FILE:
+        with open(NEWS_FEEDS_FILE, "r", encoding="utf-8") as f:
+            feeds.update(json.load(f))
+    return {name: url for name, url in feeds.items() if url}
+
+
+def parse_articles(content: bytes, limit: int) -> List[Dict[str, str]]:
+    """Newest entries of an RSS/Atom document"""
+    import feedparser
+
+    feed = feedparser.parse(content)
+    if feed.bozo and not feed.entries:
+        raise ValueError(f"Invalid feed: {feed.bozo_exception}")
+    return [
+        {
+            "title": entry.get("title", ""),
+            "summary": entry.get("summary", "Nema sažetka"),
+            "link": entry.get("link", ""),
+            "published": entry.get("published", "Datum nije dostupan"),
+        }
+        for entry in feed.entries[:limit]
+    ]
+
+
+class Feed:
+    """One feed with the response its articles were parsed from"""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.response: Optional[Any] = None
+        self.articles: Optional[List[Dict[str, str]]] = None
+        self.fetched_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.not_modified = 0
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "url": self.url,
+            "articles": len(self.articles or []),
+            "fetched_at": self.fetched_at,
+            "error": self.error,
+            "not_modified": self.not_modified,
+        }
+
+
+class NewsAggregator:
+    """
+    Keeps a snapshot of the latest articles from all feeds
+
+    refresh() fetches every feed concurrently through the shared fetch
+    layer, whose HTTP cache revalidates with If-None-Match /
+    If-Modified-Since; an unchanged feed comes back as the cached response
+    and is not parsed again. A failing feed keeps its previous articles.
+    Requests are served from the snapshot; run() refreshes it in the
+    background.
+    """
+
+    def __init__(
+        self,
+        feeds: Dict[str, str],
+        articles_per_feed: int = NEWS_ARTICLES_PER_FEED,
+        refresh_interval: float = NEWS_REFRESH_INTERVAL,
+        timeout: float = NEWS_FETCH_TIMEOUT,
+    ):
+        self.feeds: Dict[str, Feed] = {
+            name: Feed(name, url) for name, url in feeds.items()
+        }
+        self.articles_per_feed = articles_per_feed
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.updated_at: Optional[float] = None
+        self._refreshing: Optional[asyncio.Task] = None
+
+    def add_feed(self, name: str, url: str) -> Feed:
+        """Add or replace a feed (fetched on the next refresh)"""
+        self.feeds[name] = Feed(name, url)
+        return self.feeds[name]
+
+    def remove_feed(self, name: str) -> bool:
+        return self.feeds.pop(name, None) is not None
+
+    async def refresh(self):
+        """Refresh all feeds concurrently (concurrent callers share one refresh)"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh_all())
+        await asyncio.shield(self._refreshing)
+
+    async def _refresh_all(self):
+        await asyncio.gather(
+            *(self._refresh_feed(feed) for feed in list(self.feeds.values()))
+        )
+        self.updated_at = time.time()
+
+    async def _refresh_feed(self, feed: Feed):
+        try:
+            response = await asyncio.wait_for(fetch(feed.url), self.timeout)
+            if response.status_code >= 400:
+                raise ValueError(f"HTTP {response.status_code}")
+            if response is feed.response:
+                # Fresh or revalidated (304) cache entry: nothing new to parse
+                feed.not_modified += 1
+            else:
+                # feedparser is CPU-bound: keep it off the event loop
+                feed.articles = await asyncio.to_thread(
+                    parse_articles, response.content, self.articles_per_feed
+                )
+                feed.response = response
+            feed.fetched_at = time.time()
+            feed.error = None
+        except Exception as e:
+            feed.error = str(e) or type(e).__name__
+
+    def snapshot(self) -> Dict[str, List[Dict[str, str]]]:
+        """Articles per feed (same shape as agents.get_top_news)"""
+        news = {}
+        for name, feed in self.feeds.items():
+            if feed.articles is not None:
+                news[name] = feed.articles
+            elif feed.error is not None:
+                news[name] = [{"error": f"Greška prilikom dohvatanja vesti iz {name}"}]
+        return news
+
+    async def run(self):
+        """Background refresh loop"""
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "updated_at": self.updated_at,
+            "refresh_interval": self.refresh_interval,
+            "feeds": [feed.info() for feed in self.feeds.values()],
+        }
+
+
+news_aggregator = NewsAggregator(configured_feeds())
@@ -2,154 +2,254 @@
 Ollama client wrapper with caching and streaming support
 """
 
+import asyncio
 import json
 import time
-import subprocess
-import ollama
-from functools import lru_cache
-from typing import List, Dict, Any, Generator, Optional
+import httpx
+from typing import List, Dict, Any, AsyncGenerator, Optional
 
-from .config import OLLAMA_HOSTS, RESPONSE_CACHE_TTL, MODEL_LIST_CACHE_TTL
+from .config import (
+    OLLAMA_HOSTS,
+    DEFAULT_OLLAMA_SOURCE,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_READ_TIMEOUT,
+    OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+    OLLAMA_KEEPALIVE_EXPIRY,
+    MODEL_LIST_CACHE_TTL,
+)
+from .cache import create_response_cache, make_cache_key
+from .scheduler import Ticket, get_scheduler
+from .residency import get_residency
+from .generation import build_options
 
-# Response cache
-response_cache = {}
-cache_timestamps = {}
+# Response cache (backend selected by RESPONSE_CACHE_BACKEND)
+response_cache = create_response_cache()
+
+# Model list cache: source -> (timestamp, models)
+models_cache: Dict[str, tuple] = {}
+
+
+class OllamaError(Exception):
+    """Error reported by an Ollama server"""
 
 
 def get_ollama_host(source: str) -> str:
     """Get Ollama host URL for given source"""
-    return OLLAMA_HOSTS.get(source, OLLAMA_HOSTS["Ollama (11434)"])
+    return OLLAMA_HOSTS.get(source, OLLAMA_HOSTS[DEFAULT_OLLAMA_SOURCE])
+
+
+class OllamaClient:
+    """Async client for a single Ollama host backed by a keep-alive connection pool"""
+
+    def __init__(self, host: str):
+        self.host = host
+        self._client = httpx.AsyncClient(
+            base_url=host,
+            timeout=httpx.Timeout(OLLAMA_READ_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    async def list_models(self) -> List[str]:
+        """Get names of models installed on this host"""
+        response = await self._client.get("/api/tags")
+        response.raise_for_status()
+        return [m["name"] for m in response.json().get("models", [])]
+
+    async def running_models(self) -> List[Dict[str, Any]]:
+        """Get models currently loaded in memory (/api/ps)"""
+        response = await self._client.get("/api/ps")
+        response.raise_for_status()
+        return response.json().get("models", [])
+
+    async def load_model(
+        self, model: str, keep_alive: str, options: Optional[Dict[str, Any]] = None
+    ):
+        """Load a model into memory without generating (empty chat request)"""
+        payload = {"model": model, "messages": [], "keep_alive": keep_alive}
+        if options:
+            payload["options"] = options
+        response = await self._client.post("/api/chat", json=payload)
+        if response.status_code >= 400:
+            raise OllamaError(_error_detail(response))
+
+    async def embed(self, model: str, inputs: List[str]) -> List[List[float]]:
+        """Get embeddings for a batch of texts (/api/embed)"""
+        response = await self._client.post(
+            "/api/embed", json={"model": model, "input": inputs}
+        )
+        if response.status_code >= 400:
+            raise OllamaError(_error_detail(response))
+        return response.json()["embeddings"]
+
+    async def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Optional[Dict[str, Any]] = None,
+        stream: bool = True,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Chat with a model, yielding content chunks as they arrive
+
+        Ollama streams newline-delimited JSON objects; each line is decoded
+        as soon as it is received so the event loop is never blocked.
+        """
+        payload = {"model": model, "messages": messages, "stream": stream}
+        if options:
+            payload["options"] = options
+
+        async with self._client.stream("POST", "/api/chat", json=payload) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise OllamaError(_error_detail(response))
+
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise OllamaError(chunk["error"])
+                content = chunk.get("message", {}).get("content")
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    break
+
+    async def aclose(self):
+        """Close pooled connections"""
+        await self._client.aclose()
+
+
+def _error_detail(response: httpx.Response) -> str:
+    """Extract error message from an Ollama error response"""
+    try:
+        return response.json().get("error", response.text)
+    except ValueError:
+        return response.text or f"HTTP {response.status_code}"
 
 
-@lru_cache(maxsize=1)
-def get_models_cached(source: str) -> List[str]:
-    """Get list of available models from Ollama (cached)"""
-    import os
+class OllamaClientPool:
+    """One OllamaClient per configured source, created lazily and reused"""
 
-    # Set OLLAMA_HOST environment variable
-    original_host = os.environ.get("OLLAMA_HOST")
-    os.environ["OLLAMA_HOST"] = get_ollama_host(source)
+    def __init__(self, hosts: Dict[str, str]):
+        self.hosts = hosts
+        self._clients: Dict[str, OllamaClient] = {}
 
-    try:
-        response = ollama.list()
-        if hasattr(response, "models"):
-            return [m.model for m in response.models]
-        elif isinstance(response, dict) and "models" in response:
-            return [m["name"] for m in response["models"]]
-        return []
-    finally:
-        # Restore original OLLAMA_HOST
-        if original_host is not None:
-            os.environ["OLLAMA_HOST"] = original_host
-        else:
-            os.environ.pop("OLLAMA_HOST", None)
-
-
-def get_models(source: str = "Ollama (11434)") -> List[str]:
+    def get(self, source: str = DEFAULT_OLLAMA_SOURCE) -> OllamaClient:
+        """Get client for given source (unknown sources fall back to default host)"""
+        host = get_ollama_host(source)
+        client = self._clients.get(host)
+        if client is None:
+            client = OllamaClient(host)
+            self._clients[host] = client
+        return client
+
+    async def aclose(self):
+        """Close all clients"""
+        clients = list(self._clients.values())
+        self._clients = {}
+        for client in clients:
+            await client.aclose()
+
+
+ollama_pool = OllamaClientPool(OLLAMA_HOSTS)
+
+
+def get_ollama_pool() -> OllamaClientPool:
+    """Dependency returning the shared Ollama client pool"""
+    return ollama_pool
+
+
+async def get_models(
+    source: str = DEFAULT_OLLAMA_SOURCE, pool: Optional[OllamaClientPool] = None
+) -> List[str]:
     """Get list of models with cache TTL"""
-    cache_key = f"models_{source}"
     current_time = time.time()
 
-    if cache_key in cache_timestamps:
-        if current_time - cache_timestamps[cache_key] < MODEL_LIST_CACHE_TTL:
-            return get_models_cached(source)
+    cached = models_cache.get(source)
+    if cached and current_time - cached[0] < MODEL_LIST_CACHE_TTL:
+        return cached[1]
 
-    # Refresh cache
-    get_models_cached.cache_clear()
-    models = get_models_cached(source)
-    cache_timestamps[cache_key] = current_time
+    pool = pool or ollama_pool
+    models = await pool.get(source).list_models()
+    models_cache[source] = (current_time, models)
 
     return models
 
 
-def chat_with_model(
+async def chat_with_model(
     model: str,
     messages: List[Dict[str, str]],
-    source: str = "Ollama (11434)",
+    source: str = DEFAULT_OLLAMA_SOURCE,
     stream: bool = True,
-) -> Generator[str, None, None]:
+    pool: Optional[OllamaClientPool] = None,
+    ticket: Optional[Ticket] = None,
+    options: Optional[Dict[str, Any]] = None,
+) -> AsyncGenerator[str, None]:
     """
     Chat with Ollama model with streaming support
 
-    Returns generator yielding response chunks
-    """
-    import os
-
-    # Set OLLAMA_HOST
-    original_host = os.environ.get("OLLAMA_HOST")
-    os.environ["OLLAMA_HOST"] = get_ollama_host(source)
+    The request waits for admission by the source's scheduler (pass a
+    ticket obtained from get_scheduler(source).enqueue() to report queue
+    position before the first chunk). Raises QueueFullError when the
+    queue is full. options overrides generation options; num_ctx and
+    num_thread are sized automatically unless given.
 
-    try:
-        if stream:
-            response = ollama.chat(
-                model=model,
-                messages=messages,
-                stream=True,
-                options={"num_ctx": 1024, "temperature": 0.7, "num_threads": 4},
-            )
-
-            for chunk in response:
-                if "message" in chunk and "content" in chunk["message"]:
-                    yield chunk["message"]["content"]
-        else:
-            response = ollama.chat(
-                model=model,
-                messages=messages,
-                stream=False,
-                options={"num_ctx": 1024, "temperature": 0.7, "num_threads": 4},
-            )
-            yield response["message"]["content"]
-
-    finally:
-        # Restore original OLLAMA_HOST
-        if original_host is not None:
-            os.environ["OLLAMA_HOST"] = original_host
-        else:
-            os.environ.pop("OLLAMA_HOST", None)
-
-
-def get_cached_response(model: str, messages: List[Dict[str, str]]) -> Optional[str]:
+    Returns async generator yielding response chunks
+    """
+    pool = pool or ollama_pool
+    scheduler = get_scheduler(source)
+    residency = get_residency(source, pool)
+    residency.record_use(model)
+
+    async with scheduler.slot(model, ticket):
+        request_options = build_options(
+            messages,
+            options,
+            concurrent_models=scheduler.active_models,
+            runner=residency.runner(model),
+        )
+        residency.record_runner(model, request_options)
+
+        async for chunk in pool.get(source).chat(
+            model, messages, options=request_options, stream=stream
+        ):
+            yield chunk
+
+
+async def get_cached_response(
+    model: str,
+    messages: List[Dict[str, str]],
+    options: Optional[Dict[str, Any]] = None,
+) -> Optional[str]:
     """Get cached response if available"""
-    cache_key = json.dumps([model, messages], sort_keys=True)
-    current_time = time.time()
-
-    if cache_key in response_cache:
-        cached_time, response = response_cache[cache_key]
-        if current_time - cached_time < RESPONSE_CACHE_TTL:
-            return response
-
-    return None
+    key = make_cache_key(model, messages, options)
+    if response_cache.blocking:
+        return await asyncio.to_thread(response_cache.get, key)
+    return response_cache.get(key)
 
 
-def cache_response(model: str, messages: List[Dict[str, str]], response: str):
-    """Cache response with timestamp"""
-    cache_key = json.dumps([model, messages], sort_keys=True)
-    response_cache[cache_key] = (time.time(), response)
+async def cache_response(
+    model: str,
+    messages: List[Dict[str, str]],
+    response: str,
+    options: Optional[Dict[str, Any]] = None,
+):
+    """Cache response (expires after RESPONSE_CACHE_TTL)"""
+    key = make_cache_key(model, messages, options)
+    if response_cache.blocking:
+        await asyncio.to_thread(response_cache.set, key, response)
+    else:
+        response_cache.set(key, response)
 
 
 def clear_response_cache():
     """Clear response cache"""
-    global response_cache, cache_timestamps
-    response_cache = {}
-    cache_timestamps = {}
-
-
-# Uncertainty detection phrases (Serbian)
-UNCERTAINTY_INDICATORS = [
-    "nemam dovoljno informacija",
-    "nije mi poznato",
-    "ne mogu da potvrdim",
-    "ne znam tačno",
-    "nije mi poznat",
-    "ne mogu da pronađem",
-    "nemam informaciju",
-    "nije dostupno",
-    "nije poznato",
-    "nemam podatak",
-]
-
-
-def contains_uncertainty(response: str) -> bool:
-    """Check if response contains uncertainty indicators"""
-    response_lower = response.lower()
-    return any(indicator in response_lower for indicator in UNCERTAINTY_INDICATORS)
+    global models_cache
+    response_cache.clear()
+    models_cache = {}
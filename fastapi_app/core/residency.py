@@ -0,0 +1,181 @@
+"""
+Model residency tracking: which models Ollama holds in memory, warm-up and pre-warm policy
+"""
+
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import (
+    RESIDENCY_POLL_INTERVAL,
+    RESIDENCY_EVENT_HISTORY,
+    MODEL_KEEP_ALIVE,
+    MODEL_PREWARM_ENABLED,
+    MODEL_PREWARM_WINDOW,
+    MODEL_PREWARM_MAX,
+)
+from .generation import build_options
+from .scheduler import get_scheduler
+
+
+class ModelResidency:
+    """
+    Tracks resident models for one source by polling Ollama's /api/ps
+
+    Load and unload events are recorded with timestamps. Usage of each
+    model is recorded so the optional pre-warm policy can keep the most
+    used models of the last MODEL_PREWARM_WINDOW seconds loaded.
+    """
+
+    def __init__(self, source: str, get_client: Callable[[], Any]):
+        self.source = source
+        self.get_client = get_client
+        self.resident: Dict[str, Dict[str, Any]] = {}
+        # Options each resident model's runner was loaded with (num_ctx, num_thread)
+        self.runner_options: Dict[str, Dict[str, Any]] = {}
+        self.events: deque = deque(maxlen=RESIDENCY_EVENT_HISTORY)
+        self.usage: deque = deque()
+        self.last_poll = 0.0
+        self.reachable = True
+
+    def is_resident(self, model: str) -> bool:
+        """Whether model was loaded at the last poll (or warmed since)"""
+        return model in self.resident
+
+    def record_use(self, model: str):
+        """Record that a request used model"""
+        self.usage.append((time.time(), model))
+        self._trim_usage()
+
+    def record_runner(self, model: str, options: Dict[str, Any]):
+        """Remember the runner options a model was last called with"""
+        self.runner_options[model] = {
+            "num_ctx": options.get("num_ctx"),
+            "num_thread": options.get("num_thread"),
+        }
+
+    def runner(self, model: str) -> Optional[Dict[str, Any]]:
+        """Runner options of a resident model, None if not loaded"""
+        if not self.is_resident(model):
+            return None
+        return self.runner_options.get(model)
+
+    def popular_models(self, window: float = MODEL_PREWARM_WINDOW) -> List[str]:
+        """Models used in the last window seconds, most used first"""
+        self._trim_usage(window)
+        counts = Counter(model for _, model in self.usage)
+        return [model for model, _ in counts.most_common()]
+
+    async def poll(self):
+        """Refresh resident models and record load/unload events"""
+        try:
+            running = await self.get_client().running_models()
+        except Exception:
+            self.reachable = False
+            return
+        self.reachable = True
+        now = time.time()
+        self.last_poll = now
+
+        current = {}
+        for entry in running:
+            name = entry.get("name") or entry.get("model")
+            previous = self.resident.get(name)
+            current[name] = {
+                "loaded_at": previous["loaded_at"] if previous else now,
+                "expires_at": entry.get("expires_at"),
+                "size": entry.get("size"),
+                "size_vram": entry.get("size_vram"),
+            }
+            if previous is None:
+                self._event(name, "load", now)
+
+        for name in self.resident.keys() - current.keys():
+            self._event(name, "unload", now)
+            self.runner_options.pop(name, None)
+
+        self.resident = current
+
+    async def warm(self, model: str, keep_alive: str = MODEL_KEEP_ALIVE) -> float:
+        """Load model into memory (through the scheduler), returns seconds taken"""
+        start = time.time()
+        scheduler = get_scheduler(self.source)
+        async with scheduler.slot(model):
+            # Same num_ctx/num_thread a chat would pick, so the runner is reused
+            options = build_options(
+                [],
+                concurrent_models=scheduler.active_models,
+                runner=self.runner(model),
+            )
+            await self.get_client().load_model(model, keep_alive, options)
+        self.record_runner(model, options)
+        now = time.time()
+        if model not in self.resident:
+            self.resident[model] = {
+                "loaded_at": now,
+                "expires_at": None,
+                "size": None,
+                "size_vram": None,
+            }
+            self._event(model, "load", now)
+        return now - start
+
+    async def prewarm(self):
+        """Load the most used models that are not resident (only while idle)"""
+        if get_scheduler(self.source).active:
+            return
+        for model in self.popular_models()[:MODEL_PREWARM_MAX]:
+            if not self.is_resident(model):
+                try:
+                    await self.warm(model)
+                except Exception:
+                    pass
+                return
+
+    def info(self) -> Dict[str, Any]:
+        """Resident models and recent load/unload events"""
+        return {
+            "source": self.source,
+            "reachable": self.reachable,
+            "last_poll": self.last_poll,
+            "resident": self.resident,
+            "runner_options": self.runner_options,
+            "events": list(self.events),
+            "popular": self.popular_models(),
+            "prewarm_enabled": MODEL_PREWARM_ENABLED,
+        }
+
+    def _event(self, model: str, event: str, timestamp: float):
+        """Append load/unload event"""
+        self.events.append({"model": model, "event": event, "timestamp": timestamp})
+
+    def _trim_usage(self, window: float = MODEL_PREWARM_WINDOW):
+        """Drop usage records older than window"""
+        cutoff = time.time() - window
+        while self.usage and self.usage[0][0] < cutoff:
+            self.usage.popleft()
+
+
+# One tracker per model source
+residency_trackers: Dict[str, ModelResidency] = {}
+
+
+def get_residency(source: str, pool) -> ModelResidency:
+    """Get residency tracker for source, registering it with the source's scheduler"""
+    tracker = residency_trackers.get(source)
+    if tracker is None:
+        tracker = ModelResidency(source, lambda: pool.get(source))
+        residency_trackers[source] = tracker
+        get_scheduler(source).is_resident = tracker.is_resident
+    return tracker
+
+
+async def run_residency_monitor(trackers: List[ModelResidency]):
+    """Background task polling resident models and applying the pre-warm policy"""
+    while True:
+        for tracker in trackers:
+            await tracker.poll()
+            if MODEL_PREWARM_ENABLED and tracker.reachable:
+                await tracker.prewarm()
+        await asyncio.sleep(RESIDENCY_POLL_INTERVAL)
@@ -0,0 +1,234 @@
+"""
+Document chunking and lexical (BM25) retrieval for document questions
+"""
+
+import hashlib
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import (
+    RAG_CHUNK_WORDS,
+    RAG_CHUNK_OVERLAP,
+    RAG_TOP_K,
+    RAG_CONTEXT_TOKENS,
+    RAG_MAX_DOCUMENTS,
+    RAG_MIN_WORDS,
+)
+from .document_cache import document_cache
+from .generation import estimate_tokens
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+WORD_RE = re.compile(r"\S+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens"""
+    return TOKEN_RE.findall(text.lower())
+
+
+def document_id_for(text: str) -> str:
+    """Content-derived document id"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def chunk_text(
+    text: str, chunk_words: int = RAG_CHUNK_WORDS, overlap: int = RAG_CHUNK_OVERLAP
+) -> List[str]:
+    """Split text into overlapping chunks of chunk_words words (original formatting kept)"""
+    spans = [m.span() for m in WORD_RE.finditer(text)]
+    if not spans:
+        return []
+
+    step = max(1, chunk_words - overlap)
+    chunks = []
+    for start in range(0, len(spans), step):
+        end = min(start + chunk_words, len(spans))
+        chunks.append(text[spans[start][0] : spans[end - 1][1]])
+        if end == len(spans):
+            break
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over a list of chunks (pure Python inverted index)"""
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+
+        for index, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((index, tf))
+
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+    def idf(self, term: str) -> float:
+        """Inverse document frequency (BM25+ style, never negative)"""
+        df = len(self.postings.get(term, ()))
+        n = len(self.lengths)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = RAG_TOP_K) -> List[Tuple[int, float]]:
+        """Top-k (chunk index, score) pairs for query"""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for index, tf in postings:
+                norm = self.k1 * (
+                    1 - self.b + self.b * self.lengths[index] / self.avg_length
+                )
+                scores[index] = scores.get(index, 0.0) + idf * tf * (self.k1 + 1) / (
+                    tf + norm
+                )
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def fuse_rankings(*rankings: List[int], k: int = 60) -> List[Tuple[int, float]]:
+    """Reciprocal rank fusion of several rankings of chunk indices"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, index in enumerate(ranking):
+            scores[index] = scores.get(index, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class Document:
+    """An indexed document"""
+
+    def __init__(self, document_id: str, text: str, name: Optional[str] = None):
+        self.id = document_id
+        self.name = name or document_id
+        self.created = time.time()
+        self.words = len(WORD_RE.findall(text))
+        self.chunks = chunk_text(text)
+        self.index = BM25Index(self.chunks)
+
+    def retrieve(
+        self,
+        query: str,
+        k: int = RAG_TOP_K,
+        max_tokens: int = RAG_CONTEXT_TOKENS,
+        semantic: Optional[List[int]] = None,
+    ) -> List[Tuple[int, str]]:
+        """
+        Top-k relevant chunks within max_tokens, in document order
+
+        semantic is an optional embedding-similarity ranking of chunk
+        indices (core/semantic.py), fused with the BM25 ranking.
+        """
+        hits = self.index.search(query, k)
+        if semantic:
+            hits = fuse_rankings([index for index, _ in hits], semantic)[:k]
+        if not hits:
+            # Nothing matched lexically: fall back to the beginning of the document
+            hits = [(i, 0.0) for i in range(min(k, len(self.chunks)))]
+
+        selected = []
+        used = 0
+        for index, _ in hits:
+            cost = estimate_tokens(self.chunks[index])
+            if selected and used + cost > max_tokens:
+                break
+            selected.append(index)
+            used += cost
+        return [(index, self.chunks[index]) for index in sorted(selected)]
+
+    def info(self) -> Dict[str, Any]:
+        """Document metadata"""
+        return {
+            "document_id": self.id,
+            "name": self.name,
+            "words": self.words,
+            "chunks": len(self.chunks),
+            "created": self.created,
+        }
+
+
+class DocumentStore:
+    """
+    Indexed documents addressed by id (LRU, bounded by RAG_MAX_DOCUMENTS)
+
+    Documents evicted from memory (or indexed by another worker) are
+    re-indexed on demand from loader, if one is given.
+    """
+
+    def __init__(
+        self,
+        max_documents: int = RAG_MAX_DOCUMENTS,
+        loader: Optional[Callable[[str], Optional[Tuple[str, Optional[str]]]]] = None,
+    ):
+        self.max_documents = max_documents
+        self.loader = loader
+        self._documents: "OrderedDict[str, Document]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(
+        self, text: str, name: Optional[str] = None, document_id: Optional[str] = None
+    ) -> Document:
+        """Index text (no-op if a document with the same id is already indexed)"""
+        document_id = document_id or document_id_for(text)
+        existing = self._cached(document_id)
+        if existing is not None:
+            return existing
+
+        document = Document(document_id, text, name)
+        with self._lock:
+            self._documents[document_id] = document
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+        return document
+
+    def get(self, document_id: str) -> Optional[Document]:
+        """Get indexed document by id"""
+        document = self._cached(document_id)
+        if document is None and self.loader is not None:
+            loaded = self.loader(document_id)
+            if loaded is not None:
+                text, name = loaded
+                document = self.add(text, name, document_id)
+        return document
+
+    def _cached(self, document_id: str) -> Optional[Document]:
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is not None:
+                self._documents.move_to_end(document_id)
+            return document
+
+    def remove(self, document_id: str) -> bool:
+        """Forget a document"""
+        with self._lock:
+            return self._documents.pop(document_id, None) is not None
+
+
+def load_extracted_document(document_id: str) -> Optional[Tuple[str, Optional[str]]]:
+    """Text and name of an uploaded document from the extraction cache"""
+    cached = document_cache.get(document_id)
+    if cached is None:
+        return None
+    return cached["text"], cached["name"]
+
+
+def format_excerpts(chunks: List[Tuple[int, str]]) -> str:
+    """Retrieved chunks as numbered excerpts for the prompt"""
+    return "\n\n".join(f"[Excerpt {index + 1}]\n{chunk}" for index, chunk in chunks)
+
+
+document_store = DocumentStore(loader=load_extracted_document)
+
+
+def needs_retrieval(text: str) -> bool:
+    """Whether text is long enough to be retrieved from instead of sent whole"""
+    return len(WORD_RE.findall(text)) >= RAG_MIN_WORDS
@@ -0,0 +1,214 @@
+"""
+Model-aware admission control for requests sent to Ollama
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from .config import (
+    SCHEDULER_MAX_PARALLEL,
+    SCHEDULER_MAX_PER_MODEL,
+    SCHEDULER_MAX_LOADED_MODELS,
+    SCHEDULER_MAX_QUEUE,
+    SCHEDULER_MAX_BYPASS_WAIT,
+)
+
+
+class QueueFullError(Exception):
+    """Raised when the wait queue is full; carries a Retry-After estimate"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Too many requests queued for the model server")
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A request's place in the scheduler queue"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.enqueued_at = time.monotonic()
+        self.admitted_at: Optional[float] = None
+        self.granted = asyncio.Event()
+        self.released = False
+
+
+class ModelScheduler:
+    """
+    Per-model and global concurrency limits with a bounded wait queue
+
+    Requests for models that are already loaded (running, recently used or
+    reported resident) are admitted ahead of ones that would force Ollama
+    to swap models. A request that has waited SCHEDULER_MAX_BYPASS_WAIT
+    seconds can no longer be overtaken, so cold models are not starved.
+    """
+
+    def __init__(
+        self,
+        max_parallel: int = SCHEDULER_MAX_PARALLEL,
+        max_per_model: int = SCHEDULER_MAX_PER_MODEL,
+        max_loaded_models: int = SCHEDULER_MAX_LOADED_MODELS,
+        max_queue: int = SCHEDULER_MAX_QUEUE,
+        max_bypass_wait: float = SCHEDULER_MAX_BYPASS_WAIT,
+    ):
+        self.max_parallel = max_parallel
+        self.max_per_model = max_per_model
+        self.max_loaded_models = max_loaded_models
+        self.max_queue = max_queue
+        self.max_bypass_wait = max_bypass_wait
+
+        # Optional hook reporting whether Ollama currently holds a model in RAM
+        self.is_resident: Optional[Callable[[str], bool]] = None
+
+        self._running: Dict[str, int] = {}
+        self._waiting: List[Ticket] = []
+        self._recent: "OrderedDict[str, float]" = OrderedDict()
+        self._avg_duration = 30.0
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def active(self) -> int:
+        """Number of requests currently being generated"""
+        return sum(self._running.values())
+
+    @property
+    def active_models(self) -> int:
+        """Number of distinct models currently being generated"""
+        return len(self._running)
+
+    def check_capacity(self):
+        """Raise QueueFullError if a new request could not be queued right now"""
+        if len(self._waiting) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(self.retry_after())
+
+    def enqueue(self, model: str) -> Ticket:
+        """Queue a request for model; raises QueueFullError when the queue is full"""
+        self.check_capacity()
+
+        ticket = Ticket(model)
+        self._waiting.append(ticket)
+        self._dispatch()
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based position among waiting requests (0 once admitted)"""
+        if ticket.granted.is_set():
+            return 0
+        order = self._dispatch_order(time.monotonic())
+        return order.index(ticket) + 1 if ticket in order else 0
+
+    def release(self, ticket: Ticket):
+        """Free the ticket's slot (or leave the queue); safe to call twice"""
+        if ticket.released:
+            return
+        ticket.released = True
+
+        if ticket.granted.is_set():
+            self._running[ticket.model] -= 1
+            if not self._running[ticket.model]:
+                del self._running[ticket.model]
+            self._touch(ticket.model)
+            duration = time.monotonic() - ticket.admitted_at
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+        elif ticket in self._waiting:
+            self._waiting.remove(ticket)
+
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(
+        self, model: str, ticket: Optional[Ticket] = None
+    ) -> AsyncIterator[Ticket]:
+        """Wait for admission (using an existing ticket if given), release on exit"""
+        ticket = ticket or self.enqueue(model)
+        try:
+            await ticket.granted.wait()
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up"""
+        waiting = len(self._waiting) + 1
+        return max(1, int(self._avg_duration * waiting / self.max_parallel))
+
+    def stats(self) -> Dict[str, Any]:
+        """Current load and counters"""
+        return {
+            "running": dict(self._running),
+            "waiting": len(self._waiting),
+            "max_parallel": self.max_parallel,
+            "max_per_model": self.max_per_model,
+            "max_loaded_models": self.max_loaded_models,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_duration": round(self._avg_duration, 2),
+        }
+
+    def _is_warm(self, model: str) -> bool:
+        """Whether admitting model is unlikely to force a model load"""
+        if model in self._running or model in self._recent:
+            return True
+        return bool(self.is_resident and self.is_resident(model))
+
+    def _can_start(self, model: str) -> bool:
+        """Check global, per-model and loaded-model limits"""
+        if self.active >= self.max_parallel:
+            return False
+        if self._running.get(model, 0) >= self.max_per_model:
+            return False
+        if model not in self._running and len(self._running) >= self.max_loaded_models:
+            return False
+        return True
+
+    def _dispatch_order(self, now: float) -> List[Ticket]:
+        """Starving tickets first (FIFO), then warm models, then cold ones"""
+        starving, warm, cold = [], [], []
+        for ticket in self._waiting:
+            if now - ticket.enqueued_at >= self.max_bypass_wait:
+                starving.append(ticket)
+            elif self._is_warm(ticket.model):
+                warm.append(ticket)
+            else:
+                cold.append(ticket)
+        return starving + warm + cold
+
+    def _dispatch(self):
+        """Admit as many waiting tickets as the limits allow"""
+        now = time.monotonic()
+        for ticket in self._dispatch_order(now):
+            if self._can_start(ticket.model):
+                self._waiting.remove(ticket)
+                self._running[ticket.model] = self._running.get(ticket.model, 0) + 1
+                ticket.admitted_at = now
+                ticket.granted.set()
+                self.admitted += 1
+            elif now - ticket.enqueued_at >= self.max_bypass_wait:
+                # Hold capacity for the starving request
+                break
+
+    def _touch(self, model: str):
+        """Remember model as recently used (bounded by max_loaded_models)"""
+        self._recent[model] = time.monotonic()
+        self._recent.move_to_end(model)
+        while len(self._recent) > self.max_loaded_models:
+            self._recent.popitem(last=False)
+
+
+# One scheduler per model source (each source is a separate Ollama server)
+schedulers: Dict[str, ModelScheduler] = {}
+
+
+def get_scheduler(source: str) -> ModelScheduler:
+    """Get scheduler for given source"""
+    scheduler = schedulers.get(source)
+    if scheduler is None:
+        scheduler = ModelScheduler()
+        schedulers[source] = scheduler
+    return scheduler
@@ -0,0 +1,221 @@
+"""
+Embedding-based semantic search over document chunks and saved sessions
+"""
+
+import asyncio
+import hashlib
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import (
+    EMBED_BATCH_SIZE,
+    EMBED_MAX_CHARS,
+    EMBED_MODEL,
+    EMBED_SOURCE,
+    RAG_TOP_K,
+    SEMANTIC_INDEX_ENABLED,
+    VECTOR_INDEX_DIR,
+)
+from .ollama_client import OllamaClientPool, ollama_pool
+from .scheduler import get_scheduler
+from .vector_index import VectorIndex, np
+
+# (id, text, meta) triples to embed
+Item = Tuple[str, str, Dict[str, Any]]
+
+
+def content_hash(text: str) -> str:
+    """Short hash used to detect changed texts"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class SemanticIndex:
+    """
+    Vector index fed by the Ollama embedding endpoint
+
+    Embedding runs in background tasks (scheduled through the model
+    scheduler like any other model call) so uploads and saves return
+    immediately; texts already embedded with the same content are skipped.
+    """
+
+    def __init__(
+        self,
+        model: str = EMBED_MODEL,
+        source: str = EMBED_SOURCE,
+        pool: OllamaClientPool = ollama_pool,
+    ):
+        self.model = model
+        self.source = source
+        self.pool = pool
+        self.enabled = SEMANTIC_INDEX_ENABLED and np is not None
+        self.last_error: Optional[str] = None
+        self.embedded = 0
+        self._index: Optional[VectorIndex] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @property
+    def index(self) -> VectorIndex:
+        if self._index is None:
+            name = re.sub(r"[^\w.-]", "_", self.model)
+            self._index = VectorIndex(VECTOR_INDEX_DIR, name)
+        return self._index
+
+    async def embed(self, texts: List[str], scheduled: bool = True) -> "np.ndarray":
+        """
+        Embeddings for texts, in batches of EMBED_BATCH_SIZE
+
+        Bulk indexing waits for a scheduler slot; single query embeddings
+        (scheduled=False) skip it, since the calling chat request may
+        already hold the only slot.
+        """
+        client = self.pool.get(self.source)
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            batch = [
+                text[:EMBED_MAX_CHARS]
+                for text in texts[start : start + EMBED_BATCH_SIZE]
+            ]
+            if scheduled:
+                async with get_scheduler(self.source).slot(self.model):
+                    vectors.extend(await client.embed(self.model, batch))
+            else:
+                vectors.extend(await client.embed(self.model, batch))
+        return np.asarray(vectors, dtype=np.float32)
+
+    async def add(self, items: List[Item]) -> int:
+        """Embed and append items whose content is not indexed yet"""
+        pending = []
+        for item_id, text, meta in items:
+            meta = {**meta, "hash": content_hash(text)}
+            existing = self.index.get_meta(item_id)
+            if text.strip() and (
+                existing is None or existing.get("hash") != meta["hash"]
+            ):
+                pending.append((item_id, text, meta))
+        if not pending:
+            return 0
+
+        vectors = await self.embed([text for _, text, _ in pending])
+        await asyncio.to_thread(
+            self.index.append,
+            [item_id for item_id, _, _ in pending],
+            vectors,
+            [meta for _, _, meta in pending],
+        )
+        self.embedded += len(pending)
+        return len(pending)
+
+    async def sync(self, prefix: str, items: List[Item]) -> int:
+        """Make the rows under prefix match items (drop stale ids, embed new ones)"""
+        wanted = {item_id for item_id, _, _ in items}
+        stale = [
+            item_id for item_id in self.index.items(prefix) if item_id not in wanted
+        ]
+        if stale:
+            await asyncio.to_thread(self.index.remove, stale)
+        return await self.add(items)
+
+    async def remove(self, prefix: str):
+        """Drop all rows under prefix"""
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self.index.remove, (), prefix)
+
+    async def search(
+        self, query: str, k: int = RAG_TOP_K, prefix: Optional[str] = None
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """Top-k (id, score, meta) for query; empty when unavailable"""
+        if not self.enabled or not len(self.index):
+            return []
+        try:
+            vector = (await self.embed([query], scheduled=False))[0]
+        except Exception as e:
+            self.last_error = str(e)
+            return []
+        return await asyncio.to_thread(self.index.search, vector, k, prefix)
+
+    def schedule(self, prefix: str, items: List[Item]):
+        """Index items in the background (replaces a pending run for the same prefix)"""
+        if not self.enabled:
+            return
+        previous = self._tasks.get(prefix)
+        if previous is not None and not previous.done():
+            if prefix.startswith("doc:"):
+                return  # documents are content-addressed, nothing changes
+            previous.cancel()
+        task = asyncio.create_task(self.sync(prefix, items))
+        self._tasks[prefix] = task
+        task.add_done_callback(lambda task: self._task_done(prefix, task))
+
+    def _task_done(self, prefix: str, task: asyncio.Task):
+        if self._tasks.get(prefix) is task:
+            del self._tasks[prefix]
+        if not task.cancelled() and task.exception() is not None:
+            self.last_error = str(task.exception())
+
+    def stats(self) -> Dict[str, Any]:
+        """Index statistics"""
+        stats = {
+            "enabled": self.enabled,
+            "model": self.model,
+            "pending": len(self._tasks),
+            "embedded": self.embedded,
+            "last_error": self.last_error,
+        }
+        if self.enabled:
+            stats["vectors"] = len(self.index)
+            stats["dimension"] = self.index.dim
+        return stats
+
+
+def document_prefix(document_id: str) -> str:
+    return f"doc:{document_id}:"
+
+
+def document_items(document) -> List[Item]:
+    """Chunks of an indexed document (core/retrieval.py) as index items"""
+    prefix = document_prefix(document.id)
+    return [
+        (f"{prefix}{index}", chunk, {"document_id": document.id, "chunk": index})
+        for index, chunk in enumerate(document.chunks)
+    ]
+
+
+def session_prefix(filename: str) -> str:
+    return f"session:{filename}:"
+
+
+def session_items(filename: str, messages: List[Dict[str, Any]]) -> List[Item]:
+    """Messages of a saved session as index items"""
+    prefix = session_prefix(filename)
+    return [
+        (
+            f"{prefix}{index}",
+            message.get("content", ""),
+            {
+                "filename": filename,
+                "index": index,
+                "role": message.get("role"),
+                "preview": message.get("content", "")[:200],
+            },
+        )
+        for index, message in enumerate(messages)
+        if isinstance(message.get("content"), str)
+    ]
+
+
+def index_document(document):
+    """Embed document chunks in the background"""
+    semantic_index.schedule(document_prefix(document.id), document_items(document))
+
+
+async def rank_chunks(document, query: str, k: int = RAG_TOP_K) -> List[int]:
+    """Chunk indices of document ranked by embedding similarity ([] until embedded)"""
+    prefix = document_prefix(document.id)
+    if not semantic_index.enabled or f"{prefix}0" not in semantic_index.index:
+        return []
+    hits = await semantic_index.search(query, k, prefix=prefix)
+    return [meta["chunk"] for _, _, meta in hits]
+
+
+semantic_index = SemanticIndex()
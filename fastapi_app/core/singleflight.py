@@ -0,0 +1,113 @@
+"""
+Single-flight deduplication of identical in-flight generations
+"""
+
+import asyncio
+from typing import AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional
+
+
+class Flight:
+    """One in-progress generation: chunks produced so far plus live updates"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    async def run(self, source: AsyncIterator[str]):
+        """Drive the upstream generator, publishing every chunk to subscribers"""
+        try:
+            async for chunk in source:
+                async with self._changed:
+                    self.chunks.append(chunk)
+                    self._changed.notify_all()
+        except BaseException as e:
+            self.error = e
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncGenerator[str, None]:
+        """Replay chunks produced so far, then follow live chunks until done"""
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda: index < len(self.chunks) or self.done
+                )
+                pending = self.chunks[index:]
+                index = len(self.chunks)
+                finished = self.done
+
+            for chunk in pending:
+                yield chunk
+
+            if finished and not pending:
+                if self.error is not None:
+                    if isinstance(self.error, asyncio.CancelledError):
+                        raise RuntimeError("Generation was cancelled")
+                    raise self.error
+                return
+
+
+class SingleFlight:
+    """
+    Share one upstream generation between all callers using the same key
+
+    The first caller (leader) starts the generation in a background task;
+    callers arriving while it runs (followers) get the chunks produced so
+    far replayed and then receive live chunks. The generation is cancelled
+    only when its last subscriber goes away.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def in_flight(self, key: str) -> bool:
+        """Check whether a generation for key is currently running"""
+        return key in self._flights
+
+    async def stream(
+        self, key: str, factory: Callable[[], AsyncIterator[str]]
+    ) -> AsyncGenerator[str, None]:
+        """Stream chunks for key, starting the generation via factory if needed"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(flight.run(factory()))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        flight.subscribers += 1
+        try:
+            async for chunk in flight.subscribe():
+                yield chunk
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def stats(self) -> Dict[str, int]:
+        """Leader/follower counters and number of running generations"""
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
+
+    def _forget(self, key: str, flight: Flight):
+        """Remove flight from the registry if it is still the current one"""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,90 @@
+"""
+Async streaming helpers for Server-Sent Events
+"""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, AsyncGenerator, Dict
+
+from .config import SSE_COALESCE_MAX_BYTES, SSE_COALESCE_MAX_DELAY, SSE_QUEUE_SIZE
+
+_END = object()
+
+
+def sse_event(data: Dict[str, Any]) -> str:
+    """Format a dict as a single SSE data frame"""
+    return f"data: {json.dumps(data)}\n\n"
+
+
+def ndjson_line(data: Dict[str, Any]) -> str:
+    """Format a dict as one line of newline-delimited JSON"""
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+
+async def coalesce_chunks(
+    chunks: AsyncIterator[str],
+    max_bytes: int = SSE_COALESCE_MAX_BYTES,
+    max_delay: float = SSE_COALESCE_MAX_DELAY,
+    queue_size: int = SSE_QUEUE_SIZE,
+) -> AsyncGenerator[str, None]:
+    """
+    Merge small chunks into larger frames on a byte/time budget
+
+    A reader task pulls from the upstream iterator into a bounded queue, so
+    a slow client pauses reads from Ollama (backpressure) instead of
+    buffering the whole generation in memory. A frame is emitted when the
+    buffered text reaches max_bytes or the oldest buffered chunk is
+    max_delay seconds old. Closing this generator cancels the reader and
+    with it the upstream request.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def reader():
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk)
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(_END)
+
+    reader_task = asyncio.create_task(reader())
+    buffer = []
+    buffered_bytes = 0
+    deadline = 0.0
+
+    try:
+        while True:
+            timeout = max(0.0, deadline - loop.time()) if buffer else None
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield "".join(buffer)
+                buffer, buffered_bytes = [], 0
+                continue
+
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            if not buffer:
+                deadline = loop.time() + max_delay
+            buffer.append(item)
+            buffered_bytes += len(item.encode("utf-8"))
+
+            if buffered_bytes >= max_bytes:
+                yield "".join(buffer)
+                buffer, buffered_bytes = [], 0
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        reader_task.cancel()
+        try:
+            await reader_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        if hasattr(chunks, "aclose"):
+            await chunks.aclose()
@@ -0,0 +1,102 @@
+"""
+Streaming uncertainty detection: Aho-Corasick phrase matching over response chunks
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .config import UNCERTAINTY_PHRASES, UNCERTAINTY_LANGUAGES
+
+
+def uncertainty_phrases(languages: Iterable[str] = UNCERTAINTY_LANGUAGES) -> List[str]:
+    """Configured phrases for languages (unknown codes are ignored)"""
+    phrases = []
+    for language in languages:
+        phrases.extend(UNCERTAINTY_PHRASES.get(language.strip(), []))
+    return phrases
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over lower-cased phrases
+
+    scan() takes the automaton state explicitly, so one matcher can be
+    shared by any number of concurrent streams.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases = sorted({p.lower() for p in phrases if p})
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for index, phrase in enumerate(self.phrases):
+            state = 0
+            for char in phrase:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(index)
+
+        # Breadth-first failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = (
+                    self._output[next_state] + self._output[self._fail[next_state]]
+                )
+
+    def scan(self, state: int, text: str) -> Tuple[int, List[str]]:
+        """Advance state over text; returns the new state and phrases completed in text"""
+        goto, fail, output = self._goto, self._fail, self._output
+        matches = []
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                matches.extend(self.phrases[i] for i in output[state])
+        return state, matches
+
+
+default_matcher = PhraseMatcher(uncertainty_phrases())
+
+
+class UncertaintyDetector:
+    """
+    Per-stream detector: feed() chunks as they arrive
+
+    State carries across chunk boundaries, so a phrase split between two
+    chunks is still found, and each character is examined once.
+    """
+
+    def __init__(self, matcher: Optional[PhraseMatcher] = None):
+        self.matcher = matcher or default_matcher
+        self.matches: List[str] = []
+        self._state = 0
+
+    @property
+    def uncertain(self) -> bool:
+        return bool(self.matches)
+
+    def feed(self, chunk: str) -> List[str]:
+        """Phrases completed by this chunk"""
+        self._state, matches = self.matcher.scan(self._state, chunk)
+        self.matches.extend(matches)
+        return matches
+
+
+def contains_uncertainty(text: str, matcher: Optional[PhraseMatcher] = None) -> bool:
+    """Check if a complete response contains uncertainty phrases"""
+    return bool((matcher or default_matcher).scan(0, text)[1])
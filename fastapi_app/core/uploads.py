@@ -0,0 +1,112 @@
+"""
+Spooled document uploads: streamed to a temp file with size/type checks
+"""
+
+import hashlib
+import os
+import tempfile
+from typing import List, Optional
+
+from fastapi import HTTPException, UploadFile, status
+
+from .config import (
+    ALLOWED_DOCUMENT_EXTENSIONS,
+    ALLOWED_DOCUMENT_TYPES,
+    MAX_UPLOAD_SIZE,
+    UPLOAD_CHUNK_SIZE,
+)
+from .document_cache import DOCUMENT_ID_LENGTH
+
+
+class SpooledUpload:
+    """
+    An upload written to a private temp file
+
+    Use as a context manager; the file is removed on exit. document_id is
+    the content fingerprint computed while streaming (see
+    core/document_cache.py).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        filename: str,
+        content_type: Optional[str],
+        size: int,
+        digest: str,
+    ):
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.document_id = digest[:DOCUMENT_ID_LENGTH]
+
+    def close(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def check_document_type(
+    filename: Optional[str],
+    content_type: Optional[str],
+    allowed_types: List[str] = ALLOWED_DOCUMENT_TYPES,
+):
+    """Reject uploads that are neither an allowed MIME type nor extension (415)"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if content_type in allowed_types or extension in ALLOWED_DOCUMENT_EXTENSIONS:
+        return
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail=f"Unsupported document type: {content_type or extension or 'unknown'}",
+    )
+
+
+def too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds the {MAX_UPLOAD_SIZE // (1024 * 1024)}MB upload limit",
+    )
+
+
+async def spool_upload(
+    file: UploadFile,
+    max_size: int = MAX_UPLOAD_SIZE,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> SpooledUpload:
+    """
+    Stream an upload to a temp file, hashing as it goes
+
+    At most chunk_size bytes are held in memory. Raises 415 for
+    disallowed types (before reading) and 413 as soon as max_size is
+    exceeded.
+    """
+    check_document_type(file.filename, file.content_type)
+    if file.size is not None and file.size > max_size:
+        raise too_large()
+
+    suffix = os.path.splitext(file.filename or "")[1]
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="upload_")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await file.read(chunk_size):
+                size += len(chunk)
+                if size > max_size:
+                    raise too_large()
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(
+        path, file.filename, file.content_type, size, digest.hexdigest()
+    )
@@ -0,0 +1,243 @@
+"""
+Append-only vector index: memory-mapped float32 matrix with a sidecar id map
+"""
+
+import fcntl
+import json
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # semantic search is optional
+    np = None
+
+
+class VectorIndex:
+    """
+    Unit-normalised embeddings stored as rows of a raw float32 file
+
+    <name>.f32 holds the matrix, <name>.ids.jsonl one {"id", "meta", "row"}
+    line per vector plus {"delete": ...} tombstones. Appends only write the
+    new rows (the matrix is never rewritten) under an exclusive file lock,
+    so several workers can share the index. Each id line names its matrix
+    row, so vectors left without an id line by a crash are skipped instead
+    of shifting every later row. Readers memory-map the matrix and pick up
+    rows appended by other processes on the next search.
+    """
+
+    def __init__(self, directory: Path, name: str):
+        if np is None:
+            raise RuntimeError("numpy is required for the vector index")
+        directory.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = directory / f"{name}.f32"
+        self.ids_path = directory / f"{name}.ids.jsonl"
+        self.lock_path = directory / f"{name}.lock"
+
+        self.dim: Optional[int] = None
+        self.ids: List[str] = []
+        self.metas: List[Dict[str, Any]] = []
+        self.alive: List[bool] = []
+        self.vector_rows: List[int] = []  # matrix row of each id line
+        self._rows: Dict[str, int] = {}
+        self._ids_offset = 0
+        self._matrix = None
+        # Reentrant: append/remove hold it while calling refresh()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self.refresh()
+            return sum(self.alive)
+
+    def __contains__(self, item_id: str) -> bool:
+        return self.get_meta(item_id) is not None
+
+    def get_meta(self, item_id: str) -> Optional[Dict[str, Any]]:
+        """Metadata of a live row"""
+        with self._lock:
+            self.refresh()
+            row = self._rows.get(item_id)
+            if row is None or not self.alive[row]:
+                return None
+            return self.metas[row]
+
+    def items(self, prefix: str = "") -> Dict[str, Dict[str, Any]]:
+        """Live ids starting with prefix and their metadata"""
+        with self._lock:
+            self.refresh()
+            return {
+                item_id: self.metas[row]
+                for item_id, row in self._rows.items()
+                if item_id.startswith(prefix) and self.alive[row]
+            }
+
+    def append(
+        self,
+        ids: Sequence[str],
+        vectors: "np.ndarray",
+        metas: Optional[Sequence[Dict[str, Any]]] = None,
+    ):
+        """Append rows (vectors are normalised so dot product == cosine)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        metas = metas or [{} for _ in ids]
+
+        with self._lock, self._file_lock():
+            self.refresh()
+            if self.dim is not None and vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match index ({self.dim})"
+                )
+
+            # Vectors first: a row only becomes visible once its id line exists.
+            # A partial row left by a crashed write is cut off first.
+            row_bytes = vectors.shape[1] * 4
+            with open(self.vectors_path, "ab") as f:
+                first_row = f.tell() // row_bytes
+                if f.tell() != first_row * row_bytes:
+                    f.truncate(first_row * row_bytes)
+                f.write(vectors.tobytes())
+            with open(self.ids_path, "a", encoding="utf-8") as f:
+                for offset, (item_id, meta) in enumerate(zip(ids, metas)):
+                    f.write(
+                        json.dumps(
+                            {
+                                "id": item_id,
+                                "meta": meta,
+                                "dim": vectors.shape[1],
+                                "row": first_row + offset,
+                            },
+                            ensure_ascii=False,
+                        )
+                        + "\n"
+                    )
+            self.refresh()
+
+    def remove(self, ids: Sequence[str] = (), prefix: Optional[str] = None):
+        """Hide rows by exact id and/or id prefix (tombstone; vectors stay on disk)"""
+        if not ids and prefix is None:
+            return
+        with self._lock, self._file_lock():
+            with open(self.ids_path, "a", encoding="utf-8") as f:
+                f.write(
+                    json.dumps(
+                        {"delete": list(ids), "prefix": prefix}, ensure_ascii=False
+                    )
+                    + "\n"
+                )
+            self.refresh()
+
+    def refresh(self):
+        """Load id lines appended since the last call (by any process)"""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        if not self.ids_path.exists():
+            return
+        with open(self.ids_path, "r", encoding="utf-8") as f:
+            f.seek(self._ids_offset)
+            while True:
+                line = f.readline()
+                if not line.endswith("\n"):
+                    break  # partial line still being written
+                record = json.loads(line)
+                self._ids_offset = f.tell()
+                if "delete" in record:
+                    self._apply_tombstone(record["delete"], record["prefix"])
+                    continue
+
+                self.dim = self.dim or record["dim"]
+                previous = self._rows.get(record["id"])
+                if previous is not None:
+                    self.alive[previous] = False
+                self._rows[record["id"]] = len(self.ids)
+                # Lines written before rows were recorded follow the id order
+                self.vector_rows.append(record.get("row", len(self.ids)))
+                self.ids.append(record["id"])
+                self.metas.append(record["meta"])
+                self.alive.append(True)
+
+    def _apply_tombstone(self, ids: List[str], prefix: Optional[str]):
+        for item_id in ids:
+            row = self._rows.get(item_id)
+            if row is not None:
+                self.alive[row] = False
+        if prefix is not None:
+            for item_id, row in self._rows.items():
+                if item_id.startswith(prefix):
+                    self.alive[row] = False
+
+    def search(
+        self,
+        query: "np.ndarray",
+        k: int = 5,
+        prefix: Optional[str] = None,
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """Top-k (id, cosine score, meta), optionally only ids starting with prefix"""
+        matrix = self.matrix()
+        if matrix is None or not len(matrix):
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        with self._lock:
+            entries = [
+                index
+                for index, item_id in enumerate(self.ids)
+                if self.alive[index]
+                and self.vector_rows[index] < len(matrix)
+                and (prefix is None or item_id.startswith(prefix))
+            ]
+            if not entries:
+                return []
+            rows = np.fromiter(
+                (self.vector_rows[index] for index in entries), dtype=np.int64
+            )
+            hits = [(self.ids[index], self.metas[index]) for index in entries]
+
+        # Full-matrix product when most rows qualify, gather only the subset otherwise
+        if len(rows) > len(matrix) // 2:
+            scores = (matrix @ query)[rows]
+        else:
+            scores = matrix[rows] @ query
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(hits[i][0], float(scores[i]), hits[i][1]) for i in top]
+
+    def matrix(self) -> Optional["np.ndarray"]:
+        """Memory-mapped view of all complete rows"""
+        with self._lock:
+            self.refresh()
+            if self.dim is None or not self.vectors_path.exists():
+                return None
+
+            row_bytes = self.dim * 4
+            rows = self.vectors_path.stat().st_size // row_bytes
+            if self._matrix is None or len(self._matrix) != rows:
+                if rows == 0:
+                    return None
+                self._matrix = np.memmap(
+                    self.vectors_path,
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(rows, self.dim),
+                )
+            return self._matrix
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared with other worker processes"""
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
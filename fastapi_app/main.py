@@ -4,8 +4,9 @@ FastAPI main application
 
 import os
 import time
+import asyncio
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -16,8 +17,18 @@ from fastapi_app.core.config import (
     DESCRIPTION,
     FRONTEND_DIR,
     STATIC_DIR,
+    MODEL_SOURCES,
+    MAX_UPLOAD_SIZE,
+    UPLOAD_FORM_OVERHEAD,
+    NEWS_REFRESH_ENABLED,
 )
 from fastapi_app.api import auth, chat, agents, sessions, export, dialogue
+from fastapi_app.core.ollama_client import ollama_pool, response_cache
+from fastapi_app.core.cache import run_periodic_sweep
+from fastapi_app.core.scheduler import QueueFullError
+from fastapi_app.core.residency import get_residency, run_residency_monitor
+from fastapi_app.core.news import news_aggregator
+from fastapi_app.core.dialogue_store import dialogue_store, run_periodic_cleanup
 
 
 @asynccontextmanager
@@ -30,14 +41,33 @@ async def lifespan(app: FastAPI):
     FRONTEND_DIR.mkdir(exist_ok=True)
     STATIC_DIR.mkdir(exist_ok=True)
 
+    # Background maintenance tasks
+    residency = [get_residency(source, ollama_pool) for source in MODEL_SOURCES]
+    background_tasks = [
+        asyncio.create_task(run_periodic_sweep(response_cache)),
+        asyncio.create_task(run_residency_monitor(residency)),
+        asyncio.create_task(
+            run_periodic_cleanup(dialogue_store, dialogue.forget_dialogue)
+        ),
+    ]
+    if NEWS_REFRESH_ENABLED:
+        background_tasks.append(asyncio.create_task(news_aggregator.run()))
+
     yield
 
     # Shutdown
     print(f"Shutting down {PROJECT_NAME}")
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await ollama_pool.aclose()
+    await agents.close_fetch_clients()
 
 
 # Create FastAPI app
-app = FastAPI(title=PROJECT_NAME, version=VERSION, description=DESCRIPTION)
+app = FastAPI(
+    title=PROJECT_NAME, version=VERSION, description=DESCRIPTION, lifespan=lifespan
+)
 
 # CORS middleware
 app.add_middleware(
@@ -48,6 +78,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def upload_size_limit(request: Request, call_next):
+    """Reject oversized multipart uploads before the body is read"""
+    content_type = request.headers.get("content-type", "")
+    content_length = request.headers.get("content-length")
+    if (
+        content_type.startswith("multipart/form-data")
+        and content_length
+        and content_length.isdigit()
+        and int(content_length) > MAX_UPLOAD_SIZE + UPLOAD_FORM_OVERHEAD
+    ):
+        return JSONResponse(
+            status_code=413,
+            content={
+                "detail": f"File exceeds the {MAX_UPLOAD_SIZE // (1024 * 1024)}MB upload limit"
+            },
+        )
+    return await call_next(request)
+
+
 # Mount static files
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
@@ -221,6 +272,16 @@ async def api_info():
 
 
 # Error handlers
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request: Request, exc: QueueFullError):
+    """Model server queue is full: ask the client to retry later"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc: HTTPException):
     """Custom 404 handler"""
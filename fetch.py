@@ -0,0 +1,316 @@
+"""
+Zajednički async HTTP sloj za web agente - pool konekcija, timeout-i, limit veličine i HTTP keš
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from config import (
+    FETCH_CONNECT_TIMEOUT,
+    FETCH_READ_TIMEOUT,
+    FETCH_MAX_BYTES,
+    FETCH_MAX_CONNECTIONS,
+    FETCH_MAX_KEEPALIVE,
+    FETCH_CACHE_MAX_ENTRIES,
+    FETCH_CACHE_MAX_BYTES,
+    FETCH_USER_AGENT,
+)
+
+
+class FetchResponse:
+    """Odgovor (moguće skraćen na max_bytes) - sličan requests.Response"""
+
+    def __init__(self, url, status_code, headers, content, truncated=False, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.truncated = truncated
+        self.from_cache = from_cache
+
+    @property
+    def encoding(self):
+        content_type = self.headers.get("content-type", "")
+        for param in content_type.split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "charset" and value:
+                return value.strip('"')
+        return "utf-8"
+
+    @property
+    def text(self):
+        try:
+            return self.content.decode(self.encoding, errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class HttpCache:
+    """
+    LRU keš GET odgovora koji poštuje HTTP semantiku
+
+    Svežina: Cache-Control max-age / Expires, inače TTL koji zada pozivalac.
+    no-store se ne kešira. Zastareli unosi sa ETag/Last-Modified se
+    proveravaju uslovnim zahtevom (304 = koristi keširani sadržaj).
+    """
+
+    def __init__(self, max_entries=FETCH_CACHE_MAX_ENTRIES, max_bytes=FETCH_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url, params, headers):
+        raw = json.dumps([url, sorted((params or {}).items()), sorted((headers or {}).items())], default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """(odgovor, svež, validatori) ili None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry["response"], time.time() < entry["expires"], entry["validators"]
+
+    def put(self, key, response, default_ttl):
+        """Sačuvaj odgovor ako je kešabilan"""
+        ttl = freshness_lifetime(response.headers, default_ttl)
+        validators = {}
+        if response.headers.get("etag"):
+            validators["If-None-Match"] = response.headers["etag"]
+        if response.headers.get("last-modified"):
+            validators["If-Modified-Since"] = response.headers["last-modified"]
+        if ttl is None or (ttl <= 0 and not validators):
+            return
+        if response.truncated or len(response.content) > self.max_bytes:
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {
+                "response": response,
+                "expires": time.time() + max(ttl, 0),
+                "validators": validators,
+            }
+            self.total_bytes += len(response.content)
+            while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def refresh(self, key, headers, default_ttl):
+        """304 Not Modified: produži svežinu keširanog odgovora"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            ttl = freshness_lifetime(headers, default_ttl) or 0
+            entry["expires"] = time.time() + max(ttl, 0)
+            self.revalidated += 1
+            return entry["response"]
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= len(entry["response"].content)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+            }
+
+
+def freshness_lifetime(headers, default_ttl):
+    """Koliko sekundi je odgovor svež (None = ne kešira se)"""
+    cache_control = {}
+    for directive in headers.get("cache-control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            cache_control[name.lower()] = value.strip('"')
+
+    if "no-store" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return 0
+    if "max-age" in cache_control:
+        try:
+            return int(cache_control["max-age"]) - int(headers.get("age", 0) or 0)
+        except ValueError:
+            return 0
+    if headers.get("expires"):
+        try:
+            return parsedate_to_datetime(headers["expires"]).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return 0
+    return default_ttl
+
+
+http_cache = HttpCache()
+
+# Jedan klijent (pool konekcija po hostu) po event loop-u
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client():
+    """httpx.AsyncClient za trenutni event loop"""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(FETCH_READ_TIMEOUT, connect=FETCH_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=FETCH_MAX_CONNECTIONS,
+                                    max_keepalive_connections=FETCH_MAX_KEEPALIVE),
+                headers={"User-Agent": FETCH_USER_AGENT},
+                follow_redirects=True,
+            )
+            _clients[loop] = client
+            # Zatvoreni loop-ovi (npr. asyncio.run) ne treba da ostanu u mapi
+            for old_loop in [l for l in _clients if l.is_closed()]:
+                del _clients[old_loop]
+        return client
+
+
+async def close_clients():
+    """Zatvori klijent trenutnog event loop-a (gašenje aplikacije)"""
+    with _clients_lock:
+        client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def fetch(url, method="GET", headers=None, params=None, json_data=None,
+                max_bytes=FETCH_MAX_BYTES, cache_ttl=0):
+    """
+    HTTP zahtev sa timeout-ima i limitom veličine odgovora
+
+    GET odgovori se keširaju (cache_ttl je podrazumevana svežina kada server
+    ne pošalje Cache-Control/Expires; 0 = samo ako server dozvoli).
+    Greške konekcije i timeout-i se prosleđuju kao httpx izuzeci.
+    """
+    method = method.upper()
+    request_headers = dict(headers or {})
+    key = None
+    cached = None
+
+    if method == "GET":
+        key = http_cache.key(url, params, headers)
+        cached = http_cache.get(key)
+        if cached is not None:
+            response, fresh, validators = cached
+            if fresh:
+                http_cache.hits += 1
+                return response
+            request_headers.update(validators)
+
+    client = get_client()
+    async with client.stream(method, url, headers=request_headers, params=params, json=json_data) as response:
+        if response.status_code == 304 and cached is not None:
+            refreshed = http_cache.refresh(key, response.headers, cache_ttl)
+            if refreshed is not None:
+                return refreshed
+
+        # Čitaj do max_bytes, ostatak se ne preuzima
+        body = bytearray()
+        truncated = False
+        async for chunk in response.aiter_bytes():
+            body += chunk
+            if len(body) > max_bytes:
+                del body[max_bytes:]
+                truncated = True
+                break
+
+        result = FetchResponse(str(response.url), response.status_code, dict(response.headers),
+                               bytes(body), truncated=truncated)
+
+    if key is not None and result.status_code == 200:
+        http_cache.put(key, result, cache_ttl)
+    return result
+
+
+class StreamedResponse:
+    """Odgovor koji se čita u delovima (bez keša); čitanje staje na max_bytes"""
+
+    def __init__(self, response, max_bytes):
+        self._response = response
+        self.url = str(response.url)
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self.truncated = False
+
+    @property
+    def encoding(self):
+        return self._response.charset_encoding or "utf-8"
+
+    async def iter_bytes(self):
+        async for chunk in self._response.aiter_bytes():
+            remaining = self.max_bytes - self.bytes_read
+            if len(chunk) >= remaining:
+                self.truncated = len(chunk) > remaining
+                self.bytes_read += remaining
+                if remaining:
+                    yield chunk[:remaining]
+                return
+            self.bytes_read += len(chunk)
+            yield chunk
+
+
+@asynccontextmanager
+async def open_stream(url, headers=None, params=None, max_bytes=FETCH_MAX_BYTES):
+    """
+    GET čiji se odgovor obrađuje dok stiže
+
+    Ako pozivalac prekine čitanje (ili se dostigne max_bytes), konekcija se
+    zatvara i ostatak odgovora se ne preuzima.
+    """
+    async with get_client().stream("GET", url, headers=headers, params=params) as response:
+        yield StreamedResponse(response, max_bytes)
+
+
+# Sinhroni pozivi (Streamlit) idu kroz jedan pozadinski event loop
+_background_loop = None
+_background_lock = threading.Lock()
+
+
+def _get_background_loop():
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="fetch-loop", daemon=True).start()
+        return _background_loop
+
+
+def run_sync(coro):
+    """Izvrši korutinu iz sinhronog koda (deli pool konekcija između poziva)"""
+    future = asyncio.run_coroutine_threadsafe(coro, _get_background_loop())
+    return future.result()
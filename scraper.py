@@ -0,0 +1,110 @@
+"""
+Postepeni HTML -> tekst skrejper (parsira stranicu dok se preuzima)
+"""
+
+import asyncio
+import codecs
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+
+from config import SCRAPE_MAX_BYTES, SCRAPE_MAX_CHARS, FETCH_CACHE_TTL
+from fetch import open_stream
+
+# Sadržaj ovih elemenata nije glavni tekst stranice
+SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "iframe", "canvas",
+    "nav", "header", "footer", "aside", "form", "button", "select",
+}
+SCRAPE_CACHE_SIZE = 128
+
+
+class TextExtractor(HTMLParser):
+    """
+    HTMLParser koji skuplja vidljiv tekst dok mu se predaju delovi stranice
+
+    Tekst unutar SKIP_TAGS se preskače tokom parsiranja; kada se skupi
+    max_chars znakova, done postaje True i ostatak se ignoriše.
+    """
+
+    def __init__(self, max_chars=SCRAPE_MAX_CHARS):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts = []
+        self.length = 0
+        self.done = False
+        self.truncated = False
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        pass  # <tag/> nema sadržaj
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.done or self._skip_depth:
+            return
+        text = " ".join(data.split())
+        if not text:
+            return
+        remaining = self.max_chars - self.length
+        if len(text) >= remaining:
+            text = text[:remaining]
+            self.done = True
+            self.truncated = True
+        self.parts.append(text)
+        self.length += len(text) + 1
+
+    def feed(self, data):
+        if not self.done:
+            super().feed(data)
+
+    def text(self):
+        return " ".join(self.parts)
+
+
+_cache = OrderedDict()
+
+
+async def scrape(url, max_bytes=SCRAPE_MAX_BYTES, max_chars=SCRAPE_MAX_CHARS):
+    """
+    Tekst stranice: (tekst, skraćeno)
+
+    Preuzima se najviše max_bytes; preuzimanje staje čim se skupi max_chars
+    znakova teksta. Rezultati se keširaju FETCH_CACHE_TTL sekundi.
+    """
+    key = (url, max_bytes, max_chars)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] > time.time():
+        _cache.move_to_end(key)
+        return cached[1], cached[2]
+
+    parser = TextExtractor(max_chars)
+    async with open_stream(url, max_bytes=max_bytes) as response:
+        if response.status_code >= 400:
+            raise ValueError(f"HTTP {response.status_code}")
+        try:
+            decoder = codecs.getincrementaldecoder(response.encoding)(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        async for chunk in response.iter_bytes():
+            # Parsiranje je CPU posao - van event loop-a
+            await asyncio.to_thread(parser.feed, decoder.decode(chunk))
+            if parser.done:
+                break
+        else:
+            parser.feed(decoder.decode(b"", final=True))
+            parser.close()
+        truncated = parser.truncated or response.truncated
+
+    result = parser.text(), truncated
+    _cache[key] = (time.time() + FETCH_CACHE_TTL, *result)
+    while len(_cache) > SCRAPE_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
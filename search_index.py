@@ -0,0 +1,155 @@
+"""
+Pretraga punog teksta kroz sačuvane sesije i dijaloge (SQLite FTS5)
+
+Svaka poruka je jedan red u FTS5 indeksu, sa metapodacima (izvor, ključ,
+redni broj, uloga, model, vreme) u običnoj tabeli. Indeks se ažurira
+inkrementalno: pri dopisivanju se dodaju samo nove poruke, pa pretraga
+nikad ne čita JSON fajlove. Rezultati se rangiraju po bm25, a isečak oko
+pogotka daje snippet().
+"""
+
+from config import SEARCH_DB, SEARCH_PAGE_SIZE, SEARCH_SNIPPET_TOKENS
+from fastapi_app.core.db import Database
+
+SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT,
+    model TEXT,
+    created REAL,
+    title TEXT,
+    UNIQUE (source, key, seq)
+);
+CREATE INDEX IF NOT EXISTS messages_created ON messages (created);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+SNIPPET_START = '['
+SNIPPET_END = ']'
+
+
+def match_expression(query):
+    """
+    FTS5 izraz iz korisničkog upita
+
+    Svaka reč se stavlja pod navodnike (sve reči moraju da se pojave), pa
+    znakovi poput - ili : ne prave sintaksnu grešku. Zvezdica na kraju reči
+    traži prefiks.
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+def message_model(message):
+    """Model koji je napisao poruku (sesije: model_name, dijalozi: model)"""
+    return message.get('model_name') or message.get('model')
+
+
+class MessageSearch:
+    """FTS5 indeks poruka, deljen između Streamlit-a i FastAPI-ja"""
+
+    def __init__(self, path=SEARCH_DB):
+        # Konekcija po thread-u, WAL i busy timeout (fastapi_app/core/db.py)
+        self.db = Database(path, SEARCH_SCHEMA)
+
+    def index(self, source, key, messages, start=0, title='', created=None):
+        """
+        Indeksiraj poruke od rednog broja start nadalje
+
+        Ranije indeksirane poruke sa seq >= start se brišu, pa start=0
+        zamenjuje ceo razgovor, a start=len(stare poruke) samo dopisuje.
+        """
+        rows = []
+        for seq in range(start, len(messages)):
+            message = messages[seq]
+            content = message.get('content')
+            if not isinstance(content, str) or not content:
+                continue
+            rows.append((
+                (source, key, seq, message.get('role'), message_model(message),
+                 message.get('timestamp', created), title),
+                content,
+            ))
+
+        with self.db.transaction() as conn:
+            self._delete(conn, source, key, start)
+            for meta, content in rows:
+                cursor = conn.execute(
+                    "INSERT INTO messages (source, key, seq, role, model, created, title) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    meta,
+                )
+                conn.execute(
+                    "INSERT INTO messages_fts (rowid, content) VALUES (?, ?)",
+                    (cursor.lastrowid, content),
+                )
+        return len(rows)
+
+    def remove(self, source, key=None):
+        """Izbaci razgovor (ili ceo izvor ako key nije dat) iz indeksa"""
+        with self.db.transaction() as conn:
+            self._delete(conn, source, key)
+
+    def search(self, query, source=None, model=None, role=None, since=None,
+               until=None, limit=SEARCH_PAGE_SIZE, offset=0):
+        """Poruke koje sadrže sve reči upita, najrelevantnije prve"""
+        expression = match_expression(query)
+        if not expression:
+            return []
+        conditions = ["messages_fts MATCH ?"]
+        params = [expression]
+        for column, value in (('source', source), ('model', model), ('role', role)):
+            if value is not None:
+                conditions.append(f"m.{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("m.created >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("m.created < ?")
+            params.append(until)
+
+        rows = self.db.execute(
+            "SELECT m.source, m.key, m.seq, m.role, m.model, m.created, m.title, "
+            f"snippet(messages_fts, 0, ?, ?, '…', {int(SEARCH_SNIPPET_TOKENS)}) AS snippet, "
+            "bm25(messages_fts) AS score "
+            "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            f"WHERE {' AND '.join(conditions)} "
+            "ORDER BY score LIMIT ? OFFSET ?",
+            [SNIPPET_START, SNIPPET_END, *params, limit, offset],
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        """Broj indeksiranih poruka po izvoru"""
+        rows = self.db.execute(
+            "SELECT source, COUNT(*) AS messages FROM messages GROUP BY source"
+        ).fetchall()
+        return {row['source']: row['messages'] for row in rows}
+
+    @staticmethod
+    def _delete(conn, source, key=None, start=0):
+        """Obriši redove (i njihove FTS zapise) unutar otvorene transakcije"""
+        where = "source = ?"
+        params = [source]
+        if key is not None:
+            where += " AND key = ? AND seq >= ?"
+            params += [key, start]
+        conn.execute(
+            f"DELETE FROM messages_fts WHERE rowid IN (SELECT id FROM messages WHERE {where})",
+            params,
+        )
+        conn.execute(f"DELETE FROM messages WHERE {where}", params)
+
+
+message_search = MessageSearch()
@@ -2,34 +2,78 @@
 Upravljanje sesijama (Chat History)
 """
 
-import json
 import os
 import time
-from config import SETTINGS_FILE, SESSIONS_DIR
+from pathlib import Path
+from config import SESSIONS_DIR, SESSION_PAGE_SIZE
+from autosave import autosaver
+from catalog import session_catalog
+from session_file import (
+    LEGACY_EXTENSION,
+    SESSION_EXTENSION,
+    append_messages,
+    read_messages,
+    read_tail,
+    write_messages,
+)
 
 
 def load_settings():
-    """Učitaj postavke iz fajla"""
-    try:
-        if os.path.exists(SETTINGS_FILE):
-            with open(SETTINGS_FILE, 'r') as f:
-                return json.load(f)
-    except:
-        pass
-    return {"system_prompt": "", "last_model": "", "file_content": "", "messages": [], "chat_document": ""}
+    """Učitaj postavke (snimak + izmene iz loga, vidi autosave.py)"""
+    return autosaver.load()
 
 
 def save_settings(settings):
-    """Sačuvaj postavke u fajl"""
-    try:
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(settings, f, ensure_ascii=False, indent=2)
-    except:
-        pass
+    """Sačuvaj postavke u pozadini (navedena polja se menjaju, ostala ostaju)"""
+    autosaver.update(settings)
+
+
+def session_filename(filename):
+    """Ime fajla u novom formatu (stari .json nastavak se zamenjuje sa .jsonl)"""
+    stem, extension = os.path.splitext(filename)
+    if extension in (SESSION_EXTENSION, LEGACY_EXTENSION):
+        return stem + SESSION_EXTENSION
+    return filename + SESSION_EXTENSION
+
+
+def session_path(filename):
+    """Putanja sesije; za stari .json naziv i sesiju koja je već prevedena u .jsonl"""
+    filepath = SESSIONS_DIR / filename
+    if not filepath.exists() and filename.endswith(LEGACY_EXTENSION):
+        migrated = SESSIONS_DIR / session_filename(filename)
+        if migrated.exists():
+            return migrated
+    return filepath
+
+
+def stored_prefix(filepath, messages):
+    """
+    Broj poruka u fajlu ako su one početak messages, inače None
+
+    Broj poruka i veličinu fajla daje katalog, a poređenje se radi samo sa
+    poslednjom sačuvanom porukom (čita se od kraja fajla).
+    """
+    if not filepath.exists():
+        return None
+    info = session_catalog.get(filepath.name)
+    if info is None or info['size'] != filepath.stat().st_size:
+        return None
+    count = info['message_count']
+    if count > len(messages):
+        return None
+    if count == 0:
+        return 0
+    tail = read_tail(filepath, 1)
+    return count if tail and tail[0] == messages[count - 1] else None
 
 
 def save_session(messages, filename=None):
-    """Sačuvaj sesiju u fajl"""
+    """
+    Sačuvaj sesiju u fajl
+
+    Ako fajl već sadrži početak razgovora, nove poruke se samo dopisuju.
+    Sesija sačuvana u starom .json formatu se prepisuje kao .jsonl.
+    """
     if not messages:
         return None
 
@@ -38,44 +82,70 @@ def save_session(messages, filename=None):
         timestamp = time.strftime("%Y%m%d_%H%M%S")
         first_msg = next((m['content'] for m in messages if m['role'] == 'user'), "New Chat")
         safe_title = "".join([c if c.isalnum() else "_" for c in first_msg[:30]]).strip("_")
-        filename = f"{timestamp}__{safe_title}.json"
+        filename = f"{timestamp}__{safe_title}{SESSION_EXTENSION}"
 
+    requested = filename
+    filename = session_filename(filename)
     filepath = SESSIONS_DIR / filename
+    # Stari fajl se briše samo ako je baš on sačuvan pod novim imenom
+    legacy_name = Path(filename).with_suffix(LEGACY_EXTENSION).name
+    migrating = requested == legacy_name
 
     # Osiguraj da folder postoji
     SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
 
     try:
-        with open(filepath, 'w') as f:
-            json.dump(messages, f, indent=2)
+        stored = stored_prefix(filepath, messages)
+        if stored is None:
+            write_messages(filepath, messages)
+        else:
+            append_messages(filepath, messages[stored:])
+        session_catalog.update(filename, messages, stored or 0)
+
+        legacy_path = SESSIONS_DIR / legacy_name
+        if migrating and legacy_path.exists():
+            os.remove(legacy_path)
+            session_catalog.remove(legacy_name)
         return filename
-    except Exception as e:
+    except OSError:
         return None
 
 
 def load_session(filename):
     """Učitaj sesiju iz fajla"""
-    filepath = SESSIONS_DIR / filename
     try:
-        with open(filepath, 'r') as f:
-            return json.load(f)
+        return read_messages(session_path(filename))
+    except:
+        return []
+
+
+def load_session_tail(filename, count):
+    """Učitaj samo poslednjih count poruka sesije"""
+    try:
+        return read_tail(session_path(filename), count)
     except:
         return []
 
 
 def get_session_list():
     """Vrati listu sačuvanih sesija"""
-    sessions = []
-    if SESSIONS_DIR.exists():
-        files = sorted(os.listdir(SESSIONS_DIR), reverse=True)
-        for f in files:
-            if f.endswith(".json"):
-                sessions.append(f)
-    return sessions
+    sessions, _ = session_catalog.list(sort='filename', descending=True)
+    return [s['filename'] for s in sessions]
+
+
+def get_session_page(offset=0, limit=SESSION_PAGE_SIZE, sort='created', descending=True):
+    """Strana metapodataka sesija iz kataloga: (sesije, ukupno)"""
+    return session_catalog.list(offset, limit, sort, descending)
+
+
+def get_session_info(filename):
+    """Metapodaci jedne sesije (None ako ne postoji)"""
+    return session_catalog.get(filename)
 
 
 def delete_session(filename):
     """Obriši sesiju"""
-    filepath = SESSIONS_DIR / filename
+    filepath = session_path(filename)
     if filepath.exists():
         os.remove(filepath)
+    session_catalog.remove(filepath.name)
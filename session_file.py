@@ -0,0 +1,91 @@
+"""
+Format fajlova sesija: jedna poruka po liniji (NDJSON)
+
+Nova poruka se dopisuje na kraj fajla bez prepisivanja ostatka, a
+poslednjih N poruka se čita unazad od kraja fajla (seek), bez
+parsiranja cele sesije. Dugačak sadržaj (npr. nalepljeni dokumenti) se
+čuva kompresovan zlib-om u polju content_z (base64). Stari .json fajlovi
+(ceo niz poruka) se i dalje čitaju i prevode se u novi format pri
+sledećem čuvanju.
+"""
+
+import base64
+import json
+import os
+import zlib
+
+from config import SESSION_COMPRESS_MIN_CHARS
+
+SESSION_EXTENSION = '.jsonl'
+LEGACY_EXTENSION = '.json'
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def encode_message(message):
+    """Poruka kao jedna linija fajla"""
+    record = dict(message)
+    content = record.get('content')
+    if isinstance(content, str) and len(content) >= SESSION_COMPRESS_MIN_CHARS:
+        del record['content']
+        packed = zlib.compress(content.encode('utf-8'))
+        record['content_z'] = base64.b64encode(packed).decode('ascii')
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def decode_message(line):
+    """Poruka iz jedne linije fajla"""
+    record = json.loads(line)
+    packed = record.pop('content_z', None)
+    if packed is not None:
+        record['content'] = zlib.decompress(base64.b64decode(packed)).decode('utf-8')
+    return record
+
+
+def is_legacy(path):
+    """Da li je fajl u starom formatu (JSON niz)"""
+    return str(path).endswith(LEGACY_EXTENSION)
+
+
+def read_messages(path):
+    """Sve poruke iz fajla sesije (oba formata)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if is_legacy(path):
+            messages = json.load(f)
+            return messages if isinstance(messages, list) else []
+        return [decode_message(line) for line in f if line.strip()]
+
+
+def read_tail(path, count):
+    """Poslednjih count poruka, čitanjem blokova od kraja fajla"""
+    if count <= 0:
+        return []
+    if is_legacy(path):
+        return read_messages(path)[-count:]
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # count + 1 prelom: prva (moguće odsečena) linija se odbacuje
+        while position > 0 and data.count(b'\n') <= count:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = [line for line in data.split(b'\n') if line.strip()]
+    if position > 0:
+        lines = lines[1:]
+    return [decode_message(line) for line in lines[-count:]]
+
+
+def write_messages(path, messages):
+    """Upiši celu sesiju atomično (privremeni fajl + os.replace)"""
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.writelines(encode_message(m) for m in messages)
+    os.replace(tmp_path, path)
+
+
+def append_messages(path, messages):
+    """Dopiši poruke na kraj sesije"""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.writelines(encode_message(m) for m in messages)
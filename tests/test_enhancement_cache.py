@@ -0,0 +1,64 @@
+"""
+Response caching of answers that triggered web-grounded enhancement
+"""
+
+import asyncio
+import os
+import tempfile
+
+os.environ.setdefault("OLLAMA_CORE_DATA_DIR", tempfile.mkdtemp())
+os.environ.setdefault("SEMANTIC_INDEX", "0")
+os.environ.setdefault("NEWS_REFRESH", "0")
+
+from fastapi_app.api import chat  # noqa: E402
+
+SOURCE = "test-enhancement"
+
+
+class FakeClient:
+    """Ollama client that is unsure unless given web search context"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def list_models(self):
+        return ["m1"]
+
+    async def chat(self, model, messages, options=None, stream=True):
+        self.calls += 1
+        if "Web search context" in messages[-1]["content"]:
+            yield "grounded answer"
+        else:
+            yield "To nije poznato."
+
+
+class FakePool:
+    def __init__(self):
+        self.client = FakeClient()
+
+    def get(self, source):
+        return self.client
+
+
+async def fake_search(query, num_results):
+    return [{"title": "T", "snippet": "S", "link": "http://example.com"}]
+
+
+def test_uncertain_answer_is_not_replayed_from_cache(monkeypatch):
+    """Asking the same uncertain question twice enhances both times"""
+    monkeypatch.setattr(chat, "web_search_async", fake_search)
+
+    async def scenario():
+        pool = FakePool()
+        request = chat.ChatRequest(
+            message="uncertain question", model="m1", source=SOURCE
+        )
+        first = await chat.send_message(request, None, pool)
+        second = await chat.send_message(request, None, pool)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    for response in (first, second):
+        assert response.enhanced
+        assert not response.cached
+        assert response.response == "grounded answer"
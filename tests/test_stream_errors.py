@@ -0,0 +1,81 @@
+"""
+Terminal SSE frames for generations that fail after the response started
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+
+os.environ.setdefault("OLLAMA_CORE_DATA_DIR", tempfile.mkdtemp())
+os.environ.setdefault("SEMANTIC_INDEX", "0")
+os.environ.setdefault("NEWS_REFRESH", "0")
+
+from fastapi_app.api import chat  # noqa: E402
+from fastapi_app.core.ollama_client import OllamaError  # noqa: E402
+from fastapi_app.core.scheduler import QueueFullError, get_scheduler  # noqa: E402
+
+SOURCE = "test-errors"
+
+
+class FailingClient:
+    """Ollama client that fails with error after yielding chunks"""
+
+    def __init__(self, error, chunks=()):
+        self.error = error
+        self.chunks = chunks
+
+    async def chat(self, model, messages, options=None, stream=True):
+        for chunk in self.chunks:
+            yield chunk
+        raise self.error
+
+
+class FakePool:
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, source):
+        return self.client
+
+
+class FakeHTTPRequest:
+    async def is_disconnected(self):
+        return False
+
+
+async def stream_events(message, client):
+    request = chat.ChatRequest(
+        message=message, model="m1", source=SOURCE, enhance=False
+    )
+    response = await chat.stream_message(
+        request, FakeHTTPRequest(), None, FakePool(client)
+    )
+    return [
+        json.loads(event[len("data: ") :]) async for event in response.body_iterator
+    ]
+
+
+def test_ollama_error_ends_stream_with_error_frame():
+    """An Ollama error mid-stream is reported in a final done frame"""
+    events = asyncio.run(
+        stream_events("fails midway", FailingClient(OllamaError("boom"), ["partial"]))
+    )
+    assert "".join(event["chunk"] for event in events[:-1]) in ("", "partial")
+    assert events[-1]["done"] is True
+    assert events[-1]["error"] == "boom"
+
+
+def test_queue_full_after_headers_ends_stream_with_error_frame(monkeypatch):
+    """The queue filling up between check_capacity and enqueue is reported"""
+    scheduler = get_scheduler(SOURCE)
+
+    def enqueue(model):
+        raise QueueFullError(7)
+
+    monkeypatch.setattr(scheduler, "enqueue", enqueue)
+    events = asyncio.run(stream_events("queue race", FailingClient(OllamaError("x"))))
+    assert len(events) == 1
+    assert events[0]["done"] is True
+    assert events[0]["error"] == str(QueueFullError(7))
+    assert events[0]["retry_after"] == 7
@@ -0,0 +1,100 @@
+"""
+Scheduler slot accounting for streamed and deduplicated chat generations
+"""
+
+import asyncio
+import os
+import tempfile
+
+os.environ.setdefault("OLLAMA_CORE_DATA_DIR", tempfile.mkdtemp())
+os.environ.setdefault("SEMANTIC_INDEX", "0")
+os.environ.setdefault("NEWS_REFRESH", "0")
+
+from fastapi_app.api import chat  # noqa: E402
+from fastapi_app.core.scheduler import get_scheduler  # noqa: E402
+
+SOURCE = "test-source"
+
+
+class FakeClient:
+    """Ollama client whose generation waits until released"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.calls = 0
+
+    async def chat(self, model, messages, options=None, stream=True):
+        self.calls += 1
+        yield "first "
+        await self.release.wait()
+        yield "second"
+
+
+class FakePool:
+    def __init__(self):
+        self.client = FakeClient()
+
+    def get(self, source):
+        return self.client
+
+
+class FakeHTTPRequest:
+    async def is_disconnected(self):
+        return False
+
+
+def chat_request(message):
+    return chat.ChatRequest(
+        message=message, model="m1", source=SOURCE, enhance=False
+    )
+
+
+def test_no_slot_held_when_body_never_starts():
+    """A client that disconnects before the SSE body starts leaks nothing"""
+
+    async def scenario():
+        scheduler = get_scheduler(SOURCE)
+        response = await chat.stream_message(
+            chat_request("never streamed"), FakeHTTPRequest(), None, FakePool()
+        )
+        # Starlette never iterates the body; drop it
+        del response
+        await asyncio.sleep(0)
+        return scheduler.active, scheduler.stats()["waiting"]
+
+    assert asyncio.run(scenario()) == (0, 0)
+
+
+def test_leader_disconnect_keeps_slot_for_followers():
+    """The shared generation holds its slot until it finishes, not until the leader leaves"""
+
+    async def scenario():
+        scheduler = get_scheduler(SOURCE)
+        pool = FakePool()
+        request = chat_request("shared question")
+
+        leader = (
+            await chat.stream_message(request, FakeHTTPRequest(), None, pool)
+        ).body_iterator
+        follower = (
+            await chat.stream_message(request, FakeHTTPRequest(), None, pool)
+        ).body_iterator
+        assert "first" in await anext(leader)
+        assert "first" in await anext(follower)
+        assert scheduler.active == 1
+
+        # Leader goes away while the follower is still listening
+        await leader.aclose()
+        await asyncio.sleep(0)
+        active_after_leader = scheduler.active
+
+        pool.client.release.set()
+        rest = "".join([event async for event in follower])
+        await asyncio.sleep(0)
+        return active_after_leader, rest, scheduler.active, pool.client.calls
+
+    active_after_leader, rest, active_after, calls = asyncio.run(scenario())
+    assert active_after_leader == 1
+    assert '"chunk": "second"' in rest
+    assert active_after == 0
+    assert calls == 1